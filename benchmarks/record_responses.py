@@ -0,0 +1,97 @@
+# record_responses.py
+"""
+Record the Price List responses the app needs, for the offline benchmarks and utils/pricing_stub.py.
+
+Every filter a PriceSheet and the Intelligent-Tiering prices look up is requested for each
+region, and every page returned is saved as-is. With --offer, the responses are built from a
+local AmazonS3 offer file (JSON or CSV) in the shape get_products returns, without the network.
+
+Usage: python benchmarks/record_responses.py [--offer index.json] [--output fixture.json] [region ...]
+"""
+import argparse
+import datetime
+import json
+import math
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import utils.catalog as catalog
+import utils.pricing as pricing
+from utils.price_store import region_filters
+from utils.pricing_stub import RecordingPricingClient
+
+DEFAULT_RECORDING = os.path.join(ROOT, 'benchmarks', 'fixtures', 'price_list_responses.json')
+DEFAULT_REGIONS = ['us-east-1', 'eu-west-1']
+
+
+def _format_range(value):
+    return 'Inf' if math.isinf(value) else f"{value:g}"
+
+
+# Function to rebuild a get_products PriceList item from a catalog product
+def product_document(price_catalog, sku):
+    dimensions = {
+        f"{sku}.JRTCKXETXF.{i}": {
+            'rateCode': f"{sku}.JRTCKXETXF.{i}",
+            'beginRange': _format_range(begin),
+            'endRange': _format_range(end),
+            'pricePerUnit': {'USD': repr(rate)},
+            'unit': unit,
+            'description': description,
+        }
+        for i, (begin, end, rate, unit, description) in enumerate(price_catalog.prices[sku])
+    }
+    return {
+        'serviceCode': 'AmazonS3',
+        'product': {'sku': sku, 'attributes': dict(price_catalog.attributes[sku], servicecode='AmazonS3')},
+        'terms': {'OnDemand': {f"{sku}.JRTCKXETXF": {'sku': sku, 'offerTermCode': 'JRTCKXETXF', 'priceDimensions': dimensions}}},
+    }
+
+
+def record_from_offer(path, regions, page_size):
+    price_catalog = catalog.load_offer_file(path)
+    responses = []
+    for region in regions:
+        for filters in region_filters(region):
+            items = [json.dumps(product_document(price_catalog, sku)) for sku in price_catalog.find(filters)]
+            pages = [{'PriceList': items[i:i + page_size]} for i in range(0, len(items), page_size)] or [{'PriceList': []}]
+            responses.append({'filters': filters, 'pages': pages})
+    meta = {'source': os.path.basename(path), 'offer_version': price_catalog.version}
+    return {'meta': meta, 'responses': responses}
+
+
+def record_live(regions):
+    recorder = RecordingPricingClient(pricing.create_pricing_client())
+    pricing.pricing_client.client = recorder
+    filters_list = [filters for region in regions for filters in region_filters(region)]
+    pricing.pricing_client.map(pricing.pricing_client.get_products, filters_list)
+    return recorder.recording({'source': 'Price List API'})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('regions', nargs='*', default=DEFAULT_REGIONS, help='regions to record (default: %(default)s)')
+    parser.add_argument('--offer', help='build the responses from a local offer file instead of the Price List API')
+    parser.add_argument('--output', default=DEFAULT_RECORDING, help='fixture file to write')
+    parser.add_argument('--page-size', type=int, default=pricing.pricing_client.max_results, help='products per page with --offer')
+    args = parser.parse_args(argv)
+
+    if args.offer:
+        recording = record_from_offer(args.offer, args.regions, args.page_size)
+    else:
+        recording = record_live(args.regions)
+    recording['meta'].update({'regions': args.regions, 'recorded_at': datetime.datetime.now(datetime.timezone.utc).isoformat()})
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as fp:
+        json.dump(recording, fp, indent=1)
+    products = sum(len(page['PriceList']) for response in recording['responses'] for page in response['pages'])
+    print(f"Recorded {len(recording['responses'])} filters ({products} products) to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# startup.py
+"""
+Cold-start benchmark for the app pages.
+
+Each page is measured in a fresh interpreter so nothing is already imported:
+- import time: wall time to import every module the page imports at top level
+- first render: wall time for Streamlit's AppTest to run the page script once
+
+Usage: python benchmarks/startup.py [--repeat N] [--output results.json] [page ...]
+"""
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PAGES = [
+    'Home.py',
+    'pages/basics.py',
+    'pages/backup_to_cloud/configuration.py',
+    'pages/hybrid/backup_archive.py',
+    'pages/hybrid/restore_retrieve.py',
+    'pages/data_lake/known_access.py',
+    'pages/data_lake/unknown_access.py',
+]
+
+IMPORT_SNIPPET = '''
+import json, sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+for name in {modules!r}:
+    try:
+        __import__(name)
+    except ImportError:
+        pass
+print(json.dumps({{'import_time': time.perf_counter() - start}}))
+'''
+
+RENDER_SNIPPET = '''
+import json, sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({path!r}, default_timeout=120)
+at.run()
+print(json.dumps({{'first_render_time': time.perf_counter() - start, 'exceptions': len(at.exception)}}))
+'''
+
+
+# Function to list the modules a page imports at module level
+def top_level_imports(path):
+    with open(path, encoding='utf-8') as fp:
+        tree = ast.parse(fp.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+            modules.append(node.module)
+    return modules
+
+
+def run_snippet(snippet):
+    result = subprocess.run([sys.executable, '-c', snippet], cwd=ROOT, capture_output=True, text=True)
+    for line in reversed(result.stdout.splitlines()):
+        if line.startswith('{'):
+            return json.loads(line)
+    raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else 'no output')
+
+
+def measure_page(page, repeat=3):
+    path = os.path.join(ROOT, page)
+    modules = top_level_imports(path)
+    import_times = []
+    render_times = []
+    for _ in range(repeat):
+        import_times.append(run_snippet(IMPORT_SNIPPET.format(root=ROOT, modules=modules))['import_time'])
+        try:
+            render_times.append(run_snippet(RENDER_SNIPPET.format(root=ROOT, path=path))['first_render_time'])
+        except RuntimeError as error:
+            print(f"warning: first render of {page} failed: {error}", file=sys.stderr)
+    return {
+        'page': page,
+        'modules': modules,
+        'import_time': statistics.median(import_times),
+        'first_render_time': statistics.median(render_times) if render_times else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('pages', nargs='*', default=PAGES)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output')
+    args = parser.parse_args(argv)
+
+    results = []
+    for page in args.pages:
+        result = measure_page(page, args.repeat)
+        results.append(result)
+        render = f"{result['first_render_time']:.3f}s" if result['first_render_time'] is not None else 'n/a'
+        print(f"{page:45s} import {result['import_time']:.3f}s  first render {render}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as fp:
+            json.dump(results, fp, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,507 @@
+# suite.py
+"""
+Offline benchmark suite for pricing lookups, cost kernels and page reruns.
+
+Prices are replayed by the pricing stub (utils/pricing_stub.py) from recorded Price List
+responses (benchmarks/fixtures, see record_responses.py), so runs need no network and no
+credentials; --latency, --jitter and --error-rate slow down or fail the replayed calls, and the
+*_network cases always run under NETWORK conditions. Every run is appended to a
+JSON Lines history; with a baseline saved, cases whose median time per call got slower than the
+threshold are flagged and the run exits with status 1.
+
+Usage: python benchmarks/suite.py [--repeat N] [--filter TEXT] [--threshold 0.2] [--save-baseline]
+                                  [--latency MS] [--jitter MS] [--error-rate P]
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import numpy as np
+import utils.pricing_stub as pricing_stub
+from benchmarks.record_responses import DEFAULT_RECORDING
+
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+HISTORY = os.path.join(RESULTS_DIR, 'history.jsonl')
+BASELINE = os.path.join(RESULTS_DIR, 'baseline.json')
+REGION = 'us-east-1'
+SCALES = (1, 1_000, 1_000_000)
+PAGES = ['pages/hybrid/backup_archive.py', 'pages/hybrid/restore_retrieve.py']
+# Price List conditions of the *_network cases: seconds of latency and jitter, throttled share of attempts
+NETWORK = {'latency': 0.05, 'jitter': 0.1, 'error_rate': 0.05, 'max_attempts': 5, 'seed': 0}
+
+CASES = []
+
+
+def case(name, number=1):
+    """
+    Register a benchmark. The decorated function does its setup and returns the callable to time,
+    or None to skip the case; `number` calls are timed together in every repeat.
+    """
+    def register(setup):
+        CASES.append((name, number, setup))
+        return setup
+    return register
+
+
+def install_stub(path=DEFAULT_RECORDING, **kwargs):
+    """
+    Point the shared pricing client at a stub replaying `path` and clear every price cache.
+    A local price catalog (S3_PRICE_CATALOG) would take precedence, so it is turned off.
+    """
+    import utils.pricing as pricing
+
+    os.environ.pop('S3_PRICE_CATALOG', None)
+    stub = pricing_stub.StubPricingClient.from_file(path, **kwargs)
+    pricing.pricing_client.client = stub
+    pricing.price_catalog = None
+    _clear_price_caches()
+    return stub
+
+
+@contextlib.contextmanager
+def network_conditions(**kwargs):
+    # Temporarily swap the stub for one with the given latency and error injection
+    import utils.pricing as pricing
+
+    stub = pricing.pricing_client.client
+    pricing.pricing_client.client = stub.with_conditions(**kwargs)
+    try:
+        yield
+    finally:
+        pricing.pricing_client.client = stub
+        _clear_price_caches()
+
+
+def _clear_price_caches():
+    import utils.price_sheet as price_sheet
+    import utils.pricing as pricing
+
+    pricing.price_cache.clear()
+    price_sheet.price_sheets.clear()
+
+
+def _scenarios(n, seed=0):
+    # n random scenarios over every storage class, the same for every run
+    import utils.price_sheet as price_sheet
+
+    rng = np.random.default_rng(seed)
+    return {
+        'storage_class': rng.integers(0, len(price_sheet.STORAGE_CLASSES), n),
+        'size_gb': rng.lognormal(3, 2, n),
+        'days': rng.integers(1, 366, n),
+        'files': rng.integers(1, 10_000, n),
+        'parts': rng.integers(1, 10_001, n),
+    }
+
+
+# Price List filters and price resolution
+
+@case('filters.add_pricing_filter', number=100_000)
+def bench_add_pricing_filter():
+    import utils.pricing as pricing
+
+    base = pricing.build_price_filter('STANDARD', 'PUT', REGION)
+    return lambda: pricing.add_pricing_filter(base, 'operation', 'PutObject')
+
+
+@case('filters.build_price_filter', number=1_000)
+def bench_build_price_filter():
+    import utils.price_sheet as price_sheet
+    import utils.pricing as pricing
+
+    cells = [(storage_class, dimension) for storage_class in price_sheet.STORAGE_CLASSES
+             for dimension in price_sheet.s3_class_dimensions(storage_class)]
+    return lambda: [pricing.build_price_filter(storage_class, dimension, REGION) for storage_class, dimension in cells]
+
+
+@case('pricing.price_sheet_cold')
+def bench_price_sheet_cold():
+    import utils.price_sheet as price_sheet
+
+    def fetch():
+        _clear_price_caches()
+        return price_sheet.PriceSheet.fetch(REGION)
+    return fetch
+
+
+@case('pricing.price_sheet_cold_network')
+def bench_price_sheet_cold_network():
+    import utils.price_sheet as price_sheet
+
+    def fetch():
+        _clear_price_caches()
+        with network_conditions(**NETWORK):
+            return price_sheet.PriceSheet.fetch(REGION)
+    return fetch
+
+
+@case('pricing.price_store_load')
+def bench_price_store_load():
+    import tempfile
+    import utils.pricing as pricing
+    import utils.price_store as price_store
+    from benchmarks.record_responses import DEFAULT_REGIONS
+
+    # Store the replayed prices of the recorded regions, then time loading them back at startup
+    store = price_store.PriceStore(os.path.join(tempfile.mkdtemp(prefix='s3-price-store-'), 'prices.db'))
+    for region in DEFAULT_REGIONS:
+        prices = {price_store.encode_key(filters): pricing.resolve_price_dimensions(filters)
+                  for filters in price_store.region_filters(region)}
+        store.write_version(region, 'benchmark', None, prices)
+    return store.load_current
+
+
+@case('history.load_and_replay[24 versions]')
+def bench_history_replay():
+    import tempfile
+    import utils.price_history as price_history
+    import utils.price_sheet as price_sheet
+    import utils.price_store as price_store
+    import utils.pricing as pricing
+    import utils.scenarios as scenarios
+    from benchmarks.record_responses import DEFAULT_REGIONS
+
+    # 24 monthly versions of the recorded regions, each 1% cheaper than the month before
+    store = price_store.PriceStore(os.path.join(tempfile.mkdtemp(prefix='s3-price-history-'), 'prices.db'))
+    for region in DEFAULT_REGIONS:
+        prices = {price_store.encode_key(filters): pricing.resolve_price_dimensions(filters)
+                  for filters in price_store.region_filters(region)}
+        for month in range(24):
+            scale = 1.01 ** (24 - month)
+            version = {key: [(begin, end, rate * scale, *rest) for begin, end, rate, *rest in dimensions] if dimensions else dimensions
+                       for key, dimensions in prices.items()}
+            store.write_version(region, f"{2023 + month // 12}{month % 12 + 1:02d}01000000", f"{2023 + month // 12}-{month % 12 + 1:02d}-01",
+                                version)
+    classes = price_sheet.STORAGE_CLASS_NAMES
+
+    def replay():
+        history = price_history.PriceHistory.from_store(store)
+        return history.replay(lambda sheet: scenarios.backup_cost_rows(sheet, classes, 100.0, 365, 30, 13)[scenarios.YEARLY_TOTAL],
+                              columns=classes)
+    return replay
+
+
+@case('pricing.get_s3_pricing_warm', number=10_000)
+def bench_get_s3_pricing_warm():
+    import utils.pricing as pricing
+
+    filters = pricing.build_price_filter('STANDARD_IA', 'storage', REGION)
+    pricing.get_s3_pricing(filters)
+    return lambda: pricing.get_s3_pricing(filters)
+
+
+@case('pricing.get_price_sheet_warm', number=10_000)
+def bench_get_price_sheet_warm():
+    import utils.price_sheet as price_sheet
+
+    price_sheet.get_price_sheet(REGION)
+    return lambda: price_sheet.get_price_sheet(REGION)
+
+
+# Helpers
+
+@case('helper.convert_storage_size', number=100_000)
+def bench_convert_storage_size():
+    import utils.helper as helper
+
+    return lambda: helper.convert_storage_size(1536.0, 'MB', 'GB')
+
+
+@case('helper.convert_storage_size[1000000]')
+def bench_convert_storage_size_array():
+    import utils.helper as helper
+
+    sizes = _scenarios(SCALES[-1])['size_gb']
+    return lambda: helper.convert_storage_size(sizes, 'GB', 'MB')
+
+
+@case('helper.to_precision', number=10_000)
+def bench_to_precision():
+    import utils.helper as helper
+
+    return lambda: helper.to_precision(0.0123456789, 3)
+
+
+# Cost calculations, vectorized over 1, 10^3 and 10^6 scenarios
+
+def _register_kernel_cases(n):
+    @case(f'kernel.backup[{n}]')
+    def bench_backup():
+        import utils.cost_kernel as cost_kernel
+        import utils.price_sheet as price_sheet
+
+        sheet = price_sheet.get_price_sheet(REGION)
+        s = _scenarios(n)
+        # Yearly cost of daily backups kept for `days`, like scenarios.backup_costs
+        def evaluate():
+            stored_gb = s['days'] * s['size_gb']
+            rates = sheet.blended_storage_rate(price_sheet.STORAGE_CLASSES, stored_gb[:, None])
+            rate = np.take_along_axis(rates, s['storage_class'][:, None], axis=1)[:, 0]
+            costs = cost_kernel.cost_components(sheet.table, s['storage_class'], size_gb=s['size_gb'], days=s['days'],
+                                                objects=1, put_parts=s['parts'], removed=True, storage_rate=rate)
+            return costs.total * 365
+        return evaluate
+
+    @case(f'kernel.retrieval[{n}]')
+    def bench_retrieval():
+        import utils.cost_kernel as cost_kernel
+        import utils.price_sheet as price_sheet
+
+        sheet = price_sheet.get_price_sheet(REGION)
+        s = _scenarios(n)
+        return lambda: cost_kernel.cost_components(sheet.table, s['storage_class'], get_requests=s['files'],
+                                                   retrieved_gb=s['size_gb'], restore_requests=s['files']).total
+
+    @case(f'kernel.lifecycle[{n}]')
+    def bench_lifecycle():
+        import utils.cost_kernel as cost_kernel
+        import utils.price_sheet as price_sheet
+
+        sheet = price_sheet.get_price_sheet(REGION)
+        s = _scenarios(n)
+        target = np.minimum(s['storage_class'] + 1, len(price_sheet.STORAGE_CLASSES) - 1)
+        # Keep the data in its class for `days`, then transition it for the rest of the year, like scenarios.transition_costs
+        def evaluate():
+            source = cost_kernel.cost_components(sheet.table, s['storage_class'], size_gb=s['size_gb'], days=s['days'], removed=True)
+            moved = cost_kernel.cost_components(sheet.table, target, size_gb=s['size_gb'], days=365 - s['days'],
+                                                transition_requests=s['files'])
+            return source.total + moved.total
+        return evaluate
+
+
+for scale in SCALES:
+    _register_kernel_cases(scale)
+
+
+@case('multipart.plan_uploads[1000000]')
+def bench_plan_uploads():
+    import utils.multipart as multipart
+    import utils.price_sheet as price_sheet
+
+    sheet = price_sheet.get_price_sheet(REGION)
+    sizes_mb = np.random.default_rng(0).lognormal(2, 3, 1_000_000)
+    return lambda: multipart.plan_uploads(sizes_mb, part_size_mb=64).costs(sheet, price_sheet.STORAGE_CLASS_NAMES)
+
+
+@case('object_sizes.transition_costs[10^10 objects]', number=100)
+def bench_size_histogram():
+    import utils.inventory as inventory
+    import utils.object_sizes as object_sizes
+    import utils.price_sheet as price_sheet
+    import utils.scenarios as scenarios
+
+    sheet = price_sheet.get_price_sheet(REGION)
+    # 10^10 objects spread over every power-of-two size bin of an inventory summary, mostly small ones
+    counts = 1e10 * np.random.default_rng(0).dirichlet(np.linspace(4, 0.1, inventory.SIZE_BINS))
+    sizes = object_sizes.SizeHistogram.from_bytes(counts, counts * inventory.SIZE_EDGES[1:] * 0.75)
+    return lambda: scenarios.transition_costs(sheet, 'S3 Standard', 'S3 Glacier Instant Retrieval', sizes.total_objects,
+                                              sizes.total_gb, 30, 365, sizes=sizes)
+
+
+@case('scenarios.backup_costs', number=100)
+def bench_backup_costs():
+    import utils.price_sheet as price_sheet
+    import utils.scenarios as scenarios
+
+    sheet = price_sheet.get_price_sheet(REGION)
+    return lambda: scenarios.backup_costs(sheet, price_sheet.STORAGE_CLASS_NAMES, 100.0, 365, 30, 13)
+
+
+@case('scenarios.retrieval_costs', number=100)
+def bench_retrieval_costs():
+    import utils.price_sheet as price_sheet
+    import utils.scenarios as scenarios
+
+    sheet = price_sheet.get_price_sheet(REGION)
+    return lambda: scenarios.retrieval_costs(sheet, price_sheet.STORAGE_CLASS_NAMES, 1000, 100.0)
+
+
+@case('scenarios.lifecycle_costs[3y]', number=10)
+def bench_lifecycle_costs():
+    import utils.price_sheet as price_sheet
+    import utils.scenarios as scenarios
+
+    sheet = price_sheet.get_price_sheet(REGION)
+    rule_chain = [('S3 Standard', 0), ('S3 Standard - Infrequent Access', 30), ('S3 Glacier Deep Archive', 180)]
+    return lambda: scenarios.lifecycle_costs(sheet, rule_chain, 10_000, 0.001, 3 * 365, 2 * 365, 0.001)
+
+
+@case('batch.evaluate_scenario[1000]')
+def bench_batch():
+    import utils.batch as batch
+    import utils.price_sheet as price_sheet
+
+    sheets = {REGION: price_sheet.get_price_sheet(REGION)}
+    kinds = [
+        {'type': 'backup', 'size': 100, 'unit': 'GB', 'frequency': 'Daily', 'storage_classes': price_sheet.STORAGE_CLASS_NAMES},
+        {'type': 'retrieval', 'size': 10, 'unit': 'GB', 'files': 100, 'storage_classes': price_sheet.STORAGE_CLASS_NAMES},
+        {'type': 'transition', 'source': 'S3 Standard', 'target': 'S3 Glacier Deep Archive', 'objects': 1000,
+         'size': 1, 'unit': 'MB', 'days': 30, 'forecast': 365},
+    ]
+    scenario_list = [dict(kinds[i % len(kinds)], id=i, region=REGION) for i in range(1000)]
+    return lambda: batch._evaluate_chunk(scenario_list, sheets)
+
+
+# Full page reruns through Streamlit's AppTest harness
+
+def _register_page_case(page):
+    @case(f'page.rerun[{os.path.basename(page)}]')
+    def bench_page():
+        try:
+            from streamlit.testing.v1 import AppTest
+        except ImportError:
+            return None
+
+        at = AppTest.from_file(os.path.join(ROOT, page), default_timeout=120)
+        at.run()
+        if at.exception:
+            raise RuntimeError(f"{page} raised {at.exception[0].value}")
+        return at.run
+
+
+for page in PAGES:
+    _register_page_case(page)
+
+
+def time_case(fn, number, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        timings.append((time.perf_counter() - start) / number)
+    return {'number': number, 'repeat': repeat, 'median': statistics.median(timings), 'min': min(timings)}
+
+
+def run_suite(repeat=5, name_filter=None):
+    """
+    Returns:
+    ({case: timings}, [skipped cases], {failed case: error message})
+    """
+    results = {}
+    skipped = []
+    failed = {}
+    for name, number, setup in CASES:
+        if name_filter and name_filter not in name:
+            continue
+        # The pricing code logs every lookup to stdout; keep it out of the report
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            try:
+                fn = setup()
+                if fn is None:
+                    skipped.append(name)
+                    continue
+                fn()
+                results[name] = time_case(fn, number, repeat)
+            except Exception as error:
+                # e.g. throttling injected with --error-rate that outlasted every retry
+                failed[name] = f"{type(error).__name__}: {error}"
+                _clear_price_caches()
+    return results, skipped, failed
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(results, baseline, threshold):
+    """
+    Ratio of the median time per call to the baseline for every case in both; a case regressed
+    when the ratio is above 1 + threshold.
+    """
+    comparison = {}
+    for name, result in results.items():
+        if name in baseline:
+            ratio = result['median'] / baseline[name]['median']
+            comparison[name] = {'ratio': ratio, 'regressed': ratio > 1 + threshold}
+    return comparison
+
+
+def _format_seconds(seconds):
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:8.2f} {unit}"
+    return f"{seconds / 1e-9:8.2f} ns"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5, help='timed repeats per case; the median is reported')
+    parser.add_argument('--filter', help='only run cases whose name contains this text')
+    parser.add_argument('--recording', default=DEFAULT_RECORDING, help='recorded Price List responses to replay')
+    parser.add_argument('--latency', type=float, default=0.0, help='milliseconds added to every Price List call')
+    parser.add_argument('--jitter', type=float, default=0.0, help='up to this many extra milliseconds per call')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of Price List attempts that are throttled')
+    parser.add_argument('--max-attempts', type=int, default=5, help='attempts per call before a throttling error surfaces')
+    parser.add_argument('--history', default=HISTORY, help='JSON Lines file every run is appended to')
+    parser.add_argument('--baseline', default=BASELINE, help='baseline to compare against')
+    parser.add_argument('--save-baseline', action='store_true', help='save this run as the new baseline')
+    parser.add_argument('--threshold', type=float, default=0.2, help='slowdown over the baseline flagged as a regression')
+    args = parser.parse_args(argv)
+
+    network = {'latency': args.latency / 1000, 'jitter': args.jitter / 1000, 'error_rate': args.error_rate, 'max_attempts': args.max_attempts}
+    stub = install_stub(args.recording, seed=0, **network)
+    results, skipped, failed = run_suite(args.repeat, args.filter)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as fp:
+            baseline = json.load(fp)['results']
+    comparison = compare(results, baseline, args.threshold)
+
+    for name, result in results.items():
+        line = f"{name:45s} {_format_seconds(result['median'])}/call  (min {_format_seconds(result['min']).strip()})"
+        if name in comparison:
+            line += f"  x{comparison[name]['ratio']:.2f} vs baseline"
+            if comparison[name]['regressed']:
+                line += "  REGRESSION"
+        print(line)
+    for name in skipped:
+        print(f"{name:45s} skipped (streamlit is not installed)")
+    for name, error in failed.items():
+        print(f"{name:45s} FAILED {error}")
+
+    run = {
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'recording': os.path.relpath(args.recording, ROOT),
+        'network': network,
+        'price_list_calls': stub.stats(),
+        'results': results,
+        'skipped': skipped,
+        'failed': failed,
+        'regressions': sorted(name for name, item in comparison.items() if item['regressed']),
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.history)), exist_ok=True)
+    with open(args.history, 'a', encoding='utf-8') as fp:
+        fp.write(json.dumps(run) + '\n')
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as fp:
+            json.dump(run, fp, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+
+    if run['regressions']:
+        print(f"{len(run['regressions'])} regression(s) over {args.threshold:.0%}: {', '.join(run['regressions'])}", file=sys.stderr)
+        return 1
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
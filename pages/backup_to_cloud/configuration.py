@@ -1,18 +1,22 @@
 import streamlit as st
 import utils.helper as helper
+import utils.multipart as multipart
 import utils.pricing as pricing
-import streamlit_shadcn_ui as ui
+import utils.price_sheet as price_sheet
+import utils.telemetry as telemetry
+import utils.warmup as warmup
 import pandas as pd
-import plotly.express as px  # interactive charts
-import math
 from st_pages import show_pages_from_config, add_page_title, add_indentation
 
 add_indentation()
+trace = telemetry.begin_page('configuration')
+logger = telemetry.get_logger('configuration')
 
 # st.set_page_config(page_title="Backup to Cloud", page_icon="☁️", layout="wide")
 st.title("Scenario #1: Backup to Cloud")
 st.sidebar.selectbox("Select a Region:", pricing.region_code, key='home_region')
-print(st.session_state['home_region'])
+warmup.sidebar_warmup(st.session_state['home_region'])
+logger.debug("Region: %s", st.session_state['home_region'])
 # Collect input parameters
 form = st.form("input")
 home_region = st.session_state['home_region']
@@ -29,32 +33,57 @@ with form:
         deduplication = st.slider("% Data Deduplication", 0, 100, 25)
     with multipart_col:
         multipart_size = st.slider("Multipart Upload Size", 32, 1024, 64)
+    files = st.number_input("Number of backup files", min_value=1, value=1, help="The data is split evenly between the files")
+    inventory_manifest = st.text_input("Or take the file sizes from an S3 Inventory report (local path of its manifest.json)")
     selected_storage_class = st.multiselect("Target storage classes for comparision", list(pricing.s3_storage_classes))
 
 submitted = form.form_submit_button("Submit")
-print(selected_storage_class)
+logger.debug("Storage classes: %s", selected_storage_class)
 if submitted:
     if not selected_storage_class: 
         st.error("Please select at least one storage class")
     else:
-        total_size = size * ((100 - deduplication) / 100)
+        # Chart and card components are only imported once there is a result to render
+        import streamlit_shadcn_ui as ui
+        import plotly.express as px  # interactive charts
 
-        # Create df for costing
-        df = pd.DataFrame(columns=selected_storage_class, index=['PUT Request Cost'])
-        total_size_MB = helper.convert_storage_size(total_size, unit, 'MB')
-        total_requests = math.ceil(total_size_MB/multipart_size)
+        # Plan the upload of every file within the multipart upload limits (5 MB - 5 GB parts, 10,000 parts per file)
+        if inventory_manifest:
+            import utils.inventory as inventory
+
+            with st.spinner("Reading inventory..."):
+                counts, size_bytes = inventory.summarize_inventory(inventory_manifest, workers=1).size_histogram()
+            plan = multipart.plan_histogram(counts, size_bytes * ((100 - deduplication) / 100), multipart_size)
+            total_size = round(helper.convert_storage_size(size_bytes.sum() * ((100 - deduplication) / 100), 'B', unit), 3)
+        else:
+            total_size = size * ((100 - deduplication) / 100)
+            total_size_MB = helper.convert_storage_size(total_size, unit, 'MB')
+            plan = multipart.plan_uploads(total_size_MB / files, files, multipart_size)
+
+        sheet = price_sheet.get_price_sheet(home_region)
+        unpriced = sheet.unpriced(selected_storage_class, ['PUT'])
+        if unpriced:
+            st.warning(f"No PUT prices found in {home_region} for {', '.join(unpriced)}; they are left out of the comparison.")
+        selected_storage_class = [storage_class for storage_class in selected_storage_class if storage_class not in unpriced]
+        if not selected_storage_class:
+            st.error(f"No PUT prices found in {home_region} for the selected storage classes")
+            telemetry.end_page(trace)
+            st.stop()
+        costs = plan.costs(sheet, selected_storage_class)
+        request_rows = [multipart.SINGLE_PUTS, multipart.CREATE_REQUESTS, multipart.UPLOAD_PART_REQUESTS, multipart.COMPLETE_REQUESTS]
+        total_requests = int(costs.iloc[:, 0][request_rows].sum())
         cols = st.columns(2)
         with cols[0]:
             ui.metric_card(title="Total size after deduplication", content=f'{total_size} {unit}', description="Total size * (100 - deduplication %)", key="card1")
         with cols[1]:
-            ui.metric_card(title="Total number of PUT requests", content=f"{total_requests}", description="Total size after deduplication / MPU size", key="card2")
+            ui.metric_card(title="Total number of PUT requests", content=f"{total_requests:,}", description="Single PUTs, and CreateMultipartUpload, UploadPart and CompleteMultipartUpload of multipart uploads", key="card2")
 
-        for storage_class in selected_storage_class:
-            storage_class_code =  pricing.s3_storage_classes[storage_class]
-            cost_per_put = pricing.get_s3_put_cost(storage_class_code, home_region)
-            print(total_requests)
-            cost = total_requests * cost_per_put
-            df[storage_class] = [cost]
+        st.dataframe(costs.iloc[:, 0][request_rows + [multipart.TOO_LARGE]].rename('Requests').map('{:,.0f}'.format), use_container_width=True)
+        if costs.loc[multipart.TOO_LARGE].iloc[0]:
+            st.warning("Files over 5 TB cannot be uploaded to S3 and are left out.")
+
+        # Create df for costing
+        df = costs.loc[[multipart.PUT_REQUEST_COST]]
 
         df_reset = df.reset_index()
         df_long = pd.melt(df_reset, id_vars=['index'], var_name='Storage Class', value_name='Cost')
@@ -64,9 +93,11 @@ if submitted:
         st.dataframe(df_wo_index, use_container_width=True, hide_index=True)
         #Print chart
         fig = px.bar(df_long, x='index', y='Cost', color='Storage Class', barmode='group', labels={'Cost': 'Cost (USD)'})
-        print(df_long)
+        logger.debug("PUT request costs:\n%s", df_long)
         fig.update_yaxes(tickformat=".6f")
         fig.update_yaxes(tickprefix="$")
         fig.update_xaxes(title_text="Cost Comparision between S3 Storage Classes")
 
-        st.plotly_chart(fig, use_container_width=True)
\ No newline at end of file
+        st.plotly_chart(fig, use_container_width=True)
+
+telemetry.end_page(trace)
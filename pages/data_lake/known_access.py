@@ -1,16 +1,21 @@
 import streamlit as st
 import utils.pricing as pricing
+import utils.price_sheet as price_sheet
+import utils.scenarios as scenarios
+import utils.telemetry as telemetry
+import utils.lifecycle as lifecycle
 from st_pages import show_pages_from_config, add_indentation, add_page_title
-import streamlit_shadcn_ui as ui
 import pandas as pd
 import numpy as np
 import utils.helper as helper
-import plotly.express as px  # interactive charts
+import utils.object_sizes as object_sizes
+import utils.warmup as warmup
 
 STORAGE_COST = "Storage cost per GB-month"
 TRANSITION_COST = "Transition request cost per 1000 request"
 TOTAL_COST = 'Total cost'
 TOTAL_TRANSITION_COST = "Total transition request cost"
+EARLY_DELETION_COST = "Pro-rated fee for transitioning before the minimum storage duration"
 COST_INCURRED = "Cost incurred"
 CALCULATIONS = "Calculations"
 AVG_OBJ_SIZE = "Average object size"
@@ -18,6 +23,7 @@ TOTAL_OBJ_COUNT = "Total number of objects"
 DAYS_AFT_CREATION = "Days after object creation"
 TOTAL_SIZE = "Total size of objects (GB)"
 S3_INT = "S3 Intelligent-Tiering"
+SIZE_HISTOGRAM_INFO = "Objects smaller than 128 KB are billed as 128 KB in S3 Standard-IA, S3 One Zone-IA and S3 Glacier Instant Retrieval, and every object in S3 Glacier Flexible Retrieval and S3 Glacier Deep Archive adds 32 KB at the class rate and 8 KB at the S3 Standard rate. Pricing every object size of the inventory applies these per object rather than to the average size."
 S3_INT_WARNING = "Note: For S3 Intelligent-Tiering, this scenario only takes into account the storage cost in the Frequent Access Tier. Refer to the next module for a more complete scenario."
 
 def validate_target_selection():
@@ -33,6 +39,38 @@ def validate_target_selection():
     else:
         st.session_state.error_message = None
 
+def inventory_options():
+    with st.expander("Derive object count and size from an S3 Inventory report"):
+        st.text_input("Local path of the inventory manifest.json", key='inventory_manifest')
+        if st.button("Analyze inventory") and st.session_state.inventory_manifest:
+            import utils.inventory as inventory
+
+            with st.spinner("Reading inventory..."):
+                summary = inventory.summarize_inventory(st.session_state.inventory_manifest, workers=1)
+            source = price_sheet.STORAGE_CLASSES[price_sheet.CLASS_INDEX[st.session_state.source]]
+            objects, size_bytes = summary.by_class().get(source, (0, 0))
+            if objects:
+                st.session_state.num = int(objects)
+                st.session_state.size = max(1, round(helper.convert_storage_size(size_bytes / objects, 'B', 'KB')))
+                st.session_state.unit = 'KB'
+                st.session_state.size_histogram = object_sizes.SizeHistogram.from_inventory(summary, source)
+            else:
+                st.warning(f"The inventory has no objects in {st.session_state.source}")
+            st.dataframe(pd.DataFrame(
+                [(storage_class, objects, helper.convert_storage_size(size_bytes, 'B', 'GB'))
+                 for storage_class, (objects, size_bytes) in summary.by_class().items()],
+                columns=['Storage class', TOTAL_OBJ_COUNT, TOTAL_SIZE]
+            ), hide_index=True)
+        if st.session_state.get('size_histogram') is not None:
+            st.checkbox("Price each object size of the inventory instead of the average size", value=True, key='use_size_histogram',
+                        help=SIZE_HISTOGRAM_INFO)
+
+# Function to get the inventory size histogram when it is used, else None to price the average object size
+def selected_size_histogram():
+    if st.session_state.get('use_size_histogram') and st.session_state.get('size_histogram') is not None:
+        return st.session_state.size_histogram
+    return None
+
 def access_form():
 
     with st.form('access'):
@@ -52,18 +90,11 @@ def access_form():
         access_submitted = st.form_submit_button("Submit")
     return access_submitted
 
-def get_access_pricing():
-    df = pd.DataFrame(columns=[st.session_state.source, st.session_state.target], index=[STORAGE_COST, TRANSITION_COST])
-    source_storage_class_code = pricing.s3_storage_classes[st.session_state.source]
-    target_storage_class_code =  pricing.s3_storage_classes[st.session_state.target]
-    
-    # Get source pricing
-    df[st.session_state.source] = [pricing.get_s3_storage_cost(source_storage_class_code, home_region), np.nan]
-    df[st.session_state.target] = [pricing.get_s3_storage_cost(target_storage_class_code, home_region), pricing.get_s3_transition_cost(target_storage_class_code, home_region)]
-    print(df)
-    return df
-
+@telemetry.timed('page.access_components')
 def access_components():
+    # Charts are only imported once there is a result to render
+    import plotly.express as px  # interactive charts
+
     cols = st.columns(3)
     with cols[0]:
         st.metric(label=f"{AVG_OBJ_SIZE}", value=f"{st.session_state.size} {st.session_state.unit}")
@@ -72,22 +103,29 @@ def access_components():
     with cols[2]:
         st.metric(label="Days after object creation", value=f"{st.session_state.days}")
 
-    df = get_access_pricing()
-
     total_size_transitioned = st.session_state.size * st.session_state.num
     total_size_transitioned_gb = helper.convert_storage_size(total_size_transitioned, st.session_state.unit, 'GB')
+
+    sheet = price_sheet.get_price_sheet(home_region)
+    error = (price_sheet.validate_priced(sheet, [st.session_state.source], ['storage'])
+             or price_sheet.validate_priced(sheet, [st.session_state.target], ['storage', 'transition']))
+    if error is not None:
+        st.error(error)
+        return
+    costs = scenarios.transition_costs(sheet, st.session_state.source, st.session_state.target, st.session_state.num,
+                                       total_size_transitioned_gb, st.session_state.days, st.session_state.forecast,
+                                       sizes=selected_size_histogram())
     remaining_days = st.session_state.forecast - st.session_state.days
-    print("here", total_size_transitioned_gb)
     SOURCE_STORAGE_COST = f"{st.session_state.source} storage cost until {st.session_state.days} days"
     TARGET_STORAGE_COST = f"{st.session_state.target} storage cost for remaining {remaining_days} days"
-    
-    cost_df = pd.DataFrame(columns=[COST_INCURRED], index=[SOURCE_STORAGE_COST, TARGET_STORAGE_COST, TOTAL_TRANSITION_COST, TOTAL_COST])
 
-   # Get total cost incurred after transitioning
-    cost_df.loc[SOURCE_STORAGE_COST] = (df.loc[STORAGE_COST, st.session_state.source] / 30) * st.session_state.days * total_size_transitioned_gb
-    cost_df.loc[TARGET_STORAGE_COST] = (df.loc[STORAGE_COST, st.session_state.target] / 30) * (remaining_days) * total_size_transitioned_gb
-    cost_df.loc[TOTAL_TRANSITION_COST] = df.loc[TRANSITION_COST, st.session_state.target] * st.session_state.num
-    cost_df.loc[TOTAL_COST] = cost_df.loc[[SOURCE_STORAGE_COST, TARGET_STORAGE_COST, TOTAL_TRANSITION_COST], COST_INCURRED].sum()
+    # Total cost incurred after transitioning: source until the transition day, then target until the forecast ends
+    cost_df = pd.DataFrame(columns=[COST_INCURRED], index=[SOURCE_STORAGE_COST, TARGET_STORAGE_COST, TOTAL_TRANSITION_COST, EARLY_DELETION_COST, TOTAL_COST])
+    cost_df.loc[SOURCE_STORAGE_COST] = costs['source_storage']
+    cost_df.loc[TARGET_STORAGE_COST] = costs['target_storage']
+    cost_df.loc[TOTAL_TRANSITION_COST] = costs['transition']
+    cost_df.loc[EARLY_DELETION_COST] = costs['early_deletion']
+    cost_df.loc[TOTAL_COST] = costs['total']
 
     cost_df = cost_df[COST_INCURRED].map(lambda x: f'${x:.5f}')
 
@@ -106,13 +144,18 @@ def access_components():
         transition_equation = fr'''$
             \scriptsize\text{{{TOTAL_TRANSITION_COST}}} = \frac{{\text{{{TRANSITION_COST}}}}}{{\text{{1000 requests}}}} \times \text{{{TOTAL_OBJ_COUNT}}}
             $'''
+        early_deletion_equation = fr'''$
+            \scriptsize\text{{{EARLY_DELETION_COST}}} = \frac{{\text{{{STORAGE_COST}}}\, (\text{{{st.session_state.source}}})}}{{\text{{30 days in a month}}}} * \max(\text{{{helper.get_prorated(st.session_state.source)}}} - \text{{{st.session_state.days}}} \text{{ days}}, 0) * \text{{{TOTAL_SIZE}}}
+            $'''
         total_equation = fr'''$
-            \scriptsize\text{{{TOTAL_COST}}} = \text{{{SOURCE_STORAGE_COST}}} + \text{{{TARGET_STORAGE_COST}}} + \text{{{TOTAL_TRANSITION_COST}}}
+            \scriptsize\text{{{TOTAL_COST}}} = \text{{{SOURCE_STORAGE_COST}}} + \text{{{TARGET_STORAGE_COST}}} + \text{{{TOTAL_TRANSITION_COST}}} + \text{{Pro-rated fee}}
             $'''
         st.write(source_equation)
         st.write(target_equation)
         st.write(transition_equation)
+        st.write(early_deletion_equation)
         st.write(total_equation)
+        st.caption(SIZE_HISTOGRAM_INFO)
     
     if st.session_state.target == S3_INT or st.session_state.source == S3_INT:
         st.info(S3_INT_WARNING)
@@ -120,7 +163,7 @@ def access_components():
     # Original storage container
     ORIGINAL_STORAGE_COST = f"{st.session_state.source} storage cost for {st.session_state.forecast} days"
     original_df = pd.DataFrame(columns=[COST_INCURRED], index=[ORIGINAL_STORAGE_COST])
-    original_df.loc[ORIGINAL_STORAGE_COST] = (df.loc[STORAGE_COST, st.session_state.source] / 30) * st.session_state.forecast * total_size_transitioned_gb
+    original_df.loc[ORIGINAL_STORAGE_COST] = costs['original_storage']
     original_df = original_df.map(lambda x: f'${x:.5f}')
     
     with st.container(border=True):
@@ -135,17 +178,96 @@ def access_components():
     transition_total_cost = cost_df.loc[TOTAL_COST]
     original_total_cost = original_df.at[ORIGINAL_STORAGE_COST, COST_INCURRED]
     comparison_df = pd.DataFrame({COST_INCURRED: [transition_total_cost, original_total_cost]}, index=['Lifecycle Total Cost', 'Original Total Cost'])
-    fig = px.bar(comparison_df, x=comparison_df.index, y=COST_INCURRED, title='Comparison of Values')
-    fig.update_yaxes(tickprefix="$")
-    fig.update_xaxes(title_text="Cost Comparision")
-    st.plotly_chart(fig, use_container_width=True)
+    with telemetry.span('page.chart'):
+        fig = px.bar(comparison_df, x=comparison_df.index, y=COST_INCURRED, title='Comparison of Values')
+        fig.update_yaxes(tickprefix="$")
+        fig.update_xaxes(title_text="Cost Comparision")
+        st.plotly_chart(fig, use_container_width=True)
+
+def simulation_form():
+    with st.form('simulation'):
+        st.write("### Simulate continuous ingestion over multiple years")
+        st.caption("Objects of the average size above are uploaded to the source class every day and follow the selected transition.")
+        ingest_col, years_col, expire_col = st.columns(3)
+        with ingest_col:
+            st.number_input("Objects uploaded per day", value=100000, min_value=1, key='daily_objects')
+        with years_col:
+            st.slider("Years to simulate", 1, 10, 5, key='sim_years')
+        with expire_col:
+            st.number_input("Expire objects after (days, 0 to keep)", value=0, min_value=0, key='expiration')
+        simulate_col, optimize_col = st.columns(2)
+        with simulate_col:
+            simulation_submitted = st.form_submit_button("Simulate")
+        with optimize_col:
+            optimization_submitted = st.form_submit_button("Find the cheapest lifecycle policy")
+    return simulation_submitted, optimization_submitted
+
+@telemetry.timed('page.simulation_components')
+def simulation_components():
+    import plotly.express as px  # interactive charts
+
+    rule_chain = [(st.session_state.source, 0), (st.session_state.target, max(st.session_state.days, 1))]
+    expiration_days = st.session_state.expiration or None
+    error = lifecycle.validate_rule_chain(rule_chain, expiration_days)
+    if error is not None:
+        st.error(error)
+        return
+
+    object_size_gb = selected_size_histogram() or helper.convert_storage_size(st.session_state.size, st.session_state.unit, 'GB')
+    sheet = price_sheet.get_price_sheet(home_region)
+    error = price_sheet.validate_priced(sheet, [name for name, _ in rule_chain])
+    if error is not None:
+        st.error(error)
+        return
+    with telemetry.span('cost.lifecycle'):
+        result = lifecycle.simulate_lifecycle(sheet, rule_chain, st.session_state.daily_objects, object_size_gb,
+                                              st.session_state.sim_years * 365, expiration_days)
+
+    components_df = pd.DataFrame({COST_INCURRED: result.components()})
+    components_df.loc[TOTAL_COST] = result.total
+    st.dataframe(components_df[COST_INCURRED].map(lambda x: f'${x:.2f}'), use_container_width=True)
+
+    with telemetry.span('page.chart'):
+        monthly = result.monthly_cost()
+        monthly_df = pd.DataFrame(monthly, columns=price_sheet.STORAGE_CLASS_NAMES)
+        monthly_df = monthly_df.loc[:, monthly_df.sum() > 0]
+        monthly_df.index.name = 'Month'
+        monthly_long = pd.melt(monthly_df.reset_index(), id_vars=['Month'], var_name='Storage Class', value_name='Cost')
+        fig = px.area(monthly_long, x='Month', y='Cost', color='Storage Class', labels={'Cost': 'Cost (USD)'})
+        fig.update_yaxes(tickprefix="$")
+        st.plotly_chart(fig, use_container_width=True)
+
+@telemetry.timed('page.optimization_components')
+def optimization_components():
+    import utils.lifecycle_optimizer as lifecycle_optimizer
+
+    object_size_gb = selected_size_histogram() or helper.convert_storage_size(st.session_state.size, st.session_state.unit, 'GB')
+    sheet = price_sheet.get_price_sheet(home_region)
+    unpriced = sheet.unpriced(list(pricing.s3_storage_classes.keys()))
+    if unpriced:
+        st.warning(f"No prices found in {home_region} for {', '.join(unpriced)}; they are left out of the search.")
+    if len(unpriced) == len(pricing.s3_storage_classes):
+        return
+    with st.spinner("Searching lifecycle policies..."):
+        policy = lifecycle_optimizer.optimize_lifecycle(
+            sheet, st.session_state.daily_objects, object_size_gb, st.session_state.sim_years * 365,
+            expiration_options=[st.session_state.expiration or None], workers=1
+        )
+    st.write("#### Cheapest lifecycle policy")
+    st.write("\n".join(f"1. {step}" for step in policy.describe()))
+    st.caption(f"{policy.policies:,} candidate policies compared from {policy.segments:,} simulated segments")
+    components_df = pd.DataFrame({COST_INCURRED: policy.result.components()})
+    components_df.loc[TOTAL_COST] = policy.total
+    st.dataframe(components_df[COST_INCURRED].map(lambda x: f'${x:.2f}'), use_container_width=True)
 
 if __name__ == "__main__":
     add_page_title(layout="wide")
     add_indentation()
+    trace = telemetry.begin_page('known_access')
     # st.set_page_config(page_title="Hybrid Cloud", page_icon="☁️", layout="wide")
     # st.title("Scenario #3: Data Lake")
     st.sidebar.selectbox("Select a Region:", pricing.region_code, key='home_region')
+    warmup.sidebar_warmup(st.session_state['home_region'])
 
     home_region = st.session_state['home_region']
 
@@ -163,6 +285,7 @@ if __name__ == "__main__":
         with target_col:
             allowed_class = pricing.s3_storage_classes_waterfall[st.session_state.source]
             st.selectbox("Target storage class", list(allowed_class), index=0, key='target')
+    inventory_options()
     access_submitted = access_form()
 
     if access_submitted:
@@ -172,4 +295,11 @@ if __name__ == "__main__":
         else:
             access_components()
 
-    print(st.session_state)
\ No newline at end of file
+    simulation_submitted, optimization_submitted = simulation_form()
+    if simulation_submitted:
+        simulation_components()
+    if optimization_submitted:
+        optimization_components()
+
+    telemetry.get_logger('known_access').debug("Session state: %s", dict(st.session_state))
+    telemetry.end_page(trace)
\ No newline at end of file
@@ -1,5 +1,9 @@
 import streamlit as st
 import utils.pricing as pricing
+import utils.helper as helper
+import utils.intelligent_tiering as intelligent_tiering
+import utils.telemetry as telemetry
+import utils.warmup as warmup
 from st_pages import show_pages_from_config, add_indentation, add_page_title
 import pandas as pd
 
@@ -57,6 +61,9 @@ TRANSITION = {
 DAYS = f"Days till transition"
 PERCENTAGE = f"% in "
 COST_INCURRED = "Cost incurred"
+STORAGE_COST = "Storage cost per GB-month"
+MONITORING_COST = "Monitoring & automation"
+MONITORING_INFO = f"Monitoring and automation is charged per 1,000 objects each month. Objects smaller than 128 KB are not monitored, are always billed at the Frequent Access tier rate and pay no monitoring fee."
 
 def archive_options():
     cols = st.columns(2)
@@ -77,6 +84,32 @@ def archive_options():
     if st.session_state.activate_archive and st.session_state.activate_deep:
         st.warning(ARCHIVE_AND_DEEP_ARCHIVE_WARNING)
 
+def access_log_options():
+    with st.expander("Derive the percentages from S3 server access logs"):
+        st.text_input("Local directory containing S3 server access log files", key='log_directory')
+        if st.button("Analyze logs") and st.session_state.log_directory:
+            import utils.access_logs as access_logs
+
+            with st.spinner("Reading access logs..."):
+                summary = access_logs.summarize_logs(st.session_state.log_directory, workers=1)
+            schedule = intelligent_tiering.transition_schedule(
+                archive_days=st.session_state.archive_transition if st.session_state.activate_archive else None,
+                deep_days=st.session_state.deep_transition if st.session_state.activate_deep else None,
+                bypass_instant=st.session_state.disable_instant
+            )
+            percentages = summary.tier_percentages(schedule)
+            # Rounded shares may be off by one; settle the difference in the Frequent Access tier
+            percentages['frequent'] += 100 - sum(percentages.values())
+            for item, percentage in percentages.items():
+                st.session_state[item] = percentage
+            cols = st.columns(3)
+            with cols[0]:
+                st.metric(label="Days of logs analyzed", value=f"{summary.days_covered}")
+            with cols[1]:
+                st.metric(label="GET requests per day", value=f"{summary.daily_get_rate:,.0f}")
+            with cols[2]:
+                st.metric(label="PUT requests per day", value=f"{summary.daily_put_rate:,.0f}")
+
 def access_form():
     with st.form('access'):
         num_col, size_col, unit_col = st.columns([2, 2, 1])
@@ -86,6 +119,7 @@ def access_form():
             st.number_input("Average size of object", value=1, key='size', min_value=1)
         with unit_col:
             st.selectbox("Unit", ['KB', 'MB', 'GB', 'TB'], index=1, key='unit')
+        st.slider("Months to forecast", 1, 36, 12, key='forecast')
 
         fa_col, ia_col, ai_col, a_col, da_col= st.columns(5)
         with fa_col:
@@ -98,6 +132,15 @@ def access_form():
             st.number_input(PERCENTAGE + ARCHIVE_ACCESS_TIER, min_value=0, step=1, help=OPTIONAL + get_tip_archive(), key='archive', disabled=not st.session_state.activate_archive)
         with da_col:
             st.number_input(PERCENTAGE + DEEP_ARCHIVE_ACCESS_TIER, min_value=0, step=1, help=OPTIONAL + get_tip_deep(), key='deep', disabled=not st.session_state.activate_deep)
+        with st.expander("Uncertainty (Monte Carlo)"):
+            st.checkbox("Simulate the cost with uncertain inputs", key='mc_enabled')
+            trials_col, spread_col = st.columns(2)
+            with trials_col:
+                st.number_input("Number of trials", min_value=1000, max_value=5000000, value=100000, step=10000, key='mc_trials')
+            with spread_col:
+                st.slider("Uncertainty of each tier percentage (± points)", 0, 50, 10, key='mc_tier_spread')
+            st.slider("Number of objects variation (%)", -90, 200, (-10, 10), key='mc_objects_range')
+            st.slider("Average object size variation (%)", -90, 200, (0, 0), key='mc_size_range')
         access_submitted = st.form_submit_button("Submit")
     return access_submitted
 
@@ -136,17 +179,98 @@ def metric_component():
                 st.metric(label=f"{ACCESS_TIERS[item]}", value=f"{st.session_state[TRANSITION[item]]} days")
 
 def get_int_pricing():
-    df = pd.DataFrame(columns=[COST_INCURRED], index=st.session_state.tiers)
-    for item in st.session_state.tiers:
-        df.loc[ACCESS_TIERS[item]] = pricing.get_s3_int_storage_cost(item, st.session_state[TRANSITION[item]])
+    prices = intelligent_tiering.get_int_prices(home_region)
+    tiers = st.session_state.tiers
+    df = pd.DataFrame({STORAGE_COST: [prices.storage[intelligent_tiering.TIER_INDEX[item]] for item in tiers]},
+                      index=[ACCESS_TIERS[item] for item in tiers])
+    return prices, df
+
+@telemetry.timed('page.access_components')
+def access_components():
+    import plotly.express as px  # interactive charts
+
+    prices, df = get_int_pricing()
+    schedule = intelligent_tiering.transition_schedule(
+        archive_days=st.session_state.archive_transition if st.session_state.activate_archive else None,
+        deep_days=st.session_state.deep_transition if st.session_state.activate_deep else None,
+        bypass_instant=st.session_state.disable_instant
+    )
+    fractions = {item: st.session_state[item] / 100 for item in st.session_state.tiers}
+    object_size_gb = helper.convert_storage_size(st.session_state.size, st.session_state.unit, 'GB')
+    # Every selected tier is listed with its price, so each must have one
+    error = intelligent_tiering.validate_int_priced(prices, dict.fromkeys(fractions, 1.0), schedule,
+                                                    object_size_gb >= intelligent_tiering.MONITORING_THRESHOLD_GB)
+    if error:
+        st.error(error)
+        return
+    st.dataframe(df.map(lambda x: f'${x:.5f}'), use_container_width=True)
+
+    with telemetry.span('cost.intelligent_tiering'):
+        result = intelligent_tiering.simulate_intelligent_tiering(prices, fractions, st.session_state.num, object_size_gb,
+                                                                  st.session_state.forecast * intelligent_tiering.DAYS_PER_MONTH, schedule)
+
+    cols = st.columns(3)
+    with cols[0]:
+        st.metric(label=TOTAL_OBJECTS, value=f"{st.session_state.num}")
+    with cols[1]:
+        st.metric(label=TOTAL_SIZE, value=f"{st.session_state.num * st.session_state.size} {st.session_state.unit}")
+    with cols[2]:
+        st.metric(label=f"Total cost for {st.session_state.forecast} months", value=f"${result.total:,.2f}")
+    st.info(MONITORING_INFO)
+
+    with telemetry.span('page.dataframe'):
+        monthly_df = pd.DataFrame(result.monthly_cost(), columns=[ACCESS_TIERS[item] for item in intelligent_tiering.TIERS] + [MONITORING_COST])
+        monthly_df = monthly_df.loc[:, monthly_df.sum() > 0]
+        monthly_df.index = monthly_df.index + 1
+        monthly_df.index.name = 'Month'
+        st.dataframe(monthly_df.map(lambda x: f'${x:.2f}'), use_container_width=True)
+
+    with telemetry.span('page.chart'):
+        monthly_long = pd.melt(monthly_df.reset_index(), id_vars=['Month'], var_name='Tier', value_name='Cost')
+        fig = px.bar(monthly_long, x='Month', y='Cost', color='Tier', labels={'Cost': 'Cost (USD)'})
+        fig.update_yaxes(tickprefix="$")
+        st.plotly_chart(fig, use_container_width=True)
+
+    if st.session_state.mc_enabled:
+        monte_carlo_components(schedule)
+
+@telemetry.timed('page.monte_carlo_components')
+def monte_carlo_components(schedule):
+    import plotly.express as px  # interactive charts
+    import utils.monte_carlo as monte_carlo
+
+    spread = st.session_state.mc_tier_spread
+    fractions = {item: monte_carlo.from_range(max(st.session_state[item] - spread, 0) / 100, (st.session_state[item] + spread) / 100,
+                                              'triangular', st.session_state[item] / 100)
+                 for item in st.session_state.tiers}
+    objects_low, objects_high = st.session_state.mc_objects_range
+    size_low, size_high = st.session_state.mc_size_range
+    object_size_gb = helper.convert_storage_size(st.session_state.size, st.session_state.unit, 'GB')
+    prices = intelligent_tiering.get_int_prices(home_region)
+    error = intelligent_tiering.validate_int_priced(prices, dict.fromkeys(fractions, 1.0), schedule)
+    if error:
+        st.error(error)
+        return
+    with st.spinner("Running trials..."):
+        result = monte_carlo.intelligent_tiering_monte_carlo(
+            prices, fractions,
+            monte_carlo.from_range(st.session_state.num * (1 + objects_low / 100), st.session_state.num * (1 + objects_high / 100), 'triangular', st.session_state.num),
+            monte_carlo.from_range(object_size_gb * (1 + size_low / 100), object_size_gb * (1 + size_high / 100), 'triangular', object_size_gb),
+            st.session_state.forecast * intelligent_tiering.DAYS_PER_MONTH, schedule, trials=st.session_state.mc_trials
+        )
+    st.write(f"### Cost for {st.session_state.forecast} months over {result.trials:,} trials")
+    st.dataframe(result.percentiles().map(lambda x: f'${x:,.2f}'), use_container_width=True)
+    fig = px.bar(result.histogram_frame(['Total']), x='Cost', y='Trials', labels={'Cost': 'Total cost (USD)'})
+    fig.update_xaxes(tickprefix="$")
+    st.plotly_chart(fig, use_container_width=True)
 
-# def access_components():
 
-    
 if __name__ == "__main__":
     add_page_title(layout="wide")
     add_indentation()
+    trace = telemetry.begin_page('unknown_access')
     st.sidebar.selectbox("Select a Region:", pricing.region_code, key='home_region')
+    warmup.sidebar_warmup(st.session_state['home_region'])
     home_region = st.session_state['home_region']
 
     if "diable_instant" not in st.session_state:
@@ -160,6 +284,7 @@ if __name__ == "__main__":
         st.session_state.frequent_transition = 0
 
     archive_options()
+    access_log_options()
     access_submitted = access_form()
     
     if access_submitted:
@@ -168,4 +293,6 @@ if __name__ == "__main__":
             st.error(f"{st.session_state.error_message}")
         else:
             metric_component()
-            # access_components()
+            access_components()
+
+    telemetry.end_page(trace)
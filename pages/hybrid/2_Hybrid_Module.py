@@ -2,11 +2,15 @@ import streamlit as st
 import utils.pricing as pricing
 import streamlit_shadcn_ui as ui
 import utils.helper as helper
+import utils.telemetry as telemetry
+import utils.warmup as warmup
 import math
 import pandas as pd
 import numpy as np
 import plotly.express as px  # interactive charts
 
+logger = telemetry.get_logger('hybrid_module')
+
 LARGEST_FILE_SIZE = helper.convert_storage_size(5, 'TB', 'MB')
 MAX_REQUESTS = 10000
 
@@ -110,7 +114,7 @@ def calculate_prorated_charge(df, column, size):
     actual_retention = retention[st.session_state.frequency]['actual']
     required_days = prorated[column]
     cost_per_day = df.loc['CostGB-Day', column]
-    print(required_days)
+    logger.debug("Minimum storage days: %s", required_days)
     
     if required_days - actual_retention <= 0:
         return 0.00
@@ -131,9 +135,9 @@ def backup_components():
     df_stock = df.copy()
     # df_stock[numeric_cols] = df_stock[numeric_cols].map(lambda x: f'${x:.5f}')
     st.dataframe(df_stock, use_container_width=True)
-    print(df_stock)
+    logger.debug("Stock prices:\n%s", df_stock)
     df_stock = df_stock.round(-2)
-    print(df_stock)
+    logger.debug("Stock prices:\n%s", df_stock)
 
     # Calculate yearly cost
     total_size_GB = helper.convert_storage_size(st.session_state.size, st.session_state.unit, 'GB')
@@ -150,9 +154,9 @@ def backup_components():
     df_yearly = df.copy()
     df_yearly.drop(index=['PUT Request Cost per Backup File', 'Storage Cost per GB-month', 'CostGB-Day'], inplace=True)
     # df_yearly[numeric_cols] = df_yearly[numeric_cols].map(lambda x: f'${x:.5f}')
-    print(df_yearly)
+    logger.debug("Yearly costs:\n%s", df_yearly)
     df_yearly = df_yearly.round(2)
-    print(df_yearly)
+    logger.debug("Yearly costs:\n%s", df_yearly)
     st.dataframe(df_yearly, use_container_width=True)
     st.warning(f"For certain storage classes, objects deleted prior to the minimum storage duration incur a pro-rated charge equal to the storage charge for the remaining days. The minimum storage duration is 30 days for S3 Standard-IA and S3 One Zone-IA, 90 days for S3 Glacier Instant Retrieval, Glacier Flexible Retrieval and 180 days for S3 Glacier Deep Archive")
 
@@ -201,7 +205,7 @@ def retrieval_components():
             ui.metric_card(title="Total size of files to retrieve", content=f"{total_size_retrieved} {st.session_state.unit}", description=f"= total files * size of each file")
 
         df = get_retrieval_pricing()
-        print(df)        
+        logger.debug("Retrieval prices:\n%s", df)
         total_size_retrieved_bytes = helper.convert_storage_size(total_size_retrieved, st.session_state.unit, 'B')
 
         stock_retrieval_df = df.copy()
@@ -222,6 +226,7 @@ add_indentation()
 # st.set_page_config(page_title="Hybrid Cloud", page_icon="☁️", layout="wide")
 st.title("Scenario #2: Hybrid - Backup & Restore")
 st.sidebar.selectbox("Select a Region:", pricing.region_code, key='home_region')
+warmup.sidebar_warmup(st.session_state['home_region'])
 
 if "backup_form_submitted" not in st.session_state:
     st.session_state.backup_form_submitted = False
@@ -1,15 +1,17 @@
 import streamlit as st
 import utils.pricing as pricing
+import utils.price_sheet as price_sheet
+import utils.result_cache as result_cache
+import utils.scenarios as scenarios
+import utils.telemetry as telemetry
 from st_pages import show_pages_from_config, add_indentation, add_page_title, add_indentation
-import streamlit_shadcn_ui as ui
 import utils.helper as helper
+import utils.warmup as warmup
 import math
 import pandas as pd
 import numpy as np
-import plotly.express as px  # interactive charts
 
-LARGEST_FILE_SIZE = helper.convert_storage_size(5, 'TB', 'MB')
-MAX_REQUESTS = 10000
+MAX_REQUESTS = scenarios.MAX_PARTS
 
 def backup_form():
     with st.form('backup'):
@@ -25,122 +27,230 @@ def backup_form():
         with mpu_col:
             st.slider("Multipart Upload Size", 5, 1024, 8, key='mpu_size')
         st.multiselect("Target storage classes for comparision", list(pricing.s3_storage_classes_excl_int), key='selected_storage_class')
+        with st.expander("Uncertainty (Monte Carlo)"):
+            st.checkbox("Simulate the yearly cost with uncertain inputs", key='mc_enabled')
+            trials_col, dist_col = st.columns(2)
+            with trials_col:
+                st.number_input("Number of trials", min_value=1000, max_value=5000000, value=100000, step=10000, key='mc_trials')
+            with dist_col:
+                st.selectbox("Distribution of each range", ['Triangular', 'Uniform'], key='mc_distribution')
+            st.slider("Backup size variation (%)", -90, 200, (-10, 10), key='mc_size_range')
+            st.slider("Retention period variation (%)", -90, 200, (0, 0), key='mc_retention_range')
+            st.slider("Yearly data growth (%)", 0, 200, (0, 20), key='mc_growth_range')
+            st.slider("Data stored by each backup (%)", 1, 100, (100, 100), help="100% for full backups, the daily change rate for incremental backups", key='mc_change_range')
+            st.slider("Savings from deduplication and compression (%)", 0, 95, (0, 0), key='mc_dedup_range')
         backup_submitted = st.form_submit_button("Submit")
     return backup_submitted
 
 # @st.experimental_fragment
-def validate_backup_input(total_size_MB, total_requests):
-    # Validate maximum file size
-    if total_size_MB > LARGEST_FILE_SIZE:
-        st.error("File size is too large. Maximum file size allowed for upload to S3 is 5 TB.")
+def validate_backup_input(total_size_MB):
+    error = scenarios.validate_backup(total_size_MB, st.session_state.selected_storage_class)
+    if error is not None:
+        st.error(error)
         return False
-    
-    # Validate storage classes selected
-    if not st.session_state.selected_storage_class: 
-        st.error("Please select at least one storage class")
-        return False
-    
-    # Validate request count 
-    if total_requests > MAX_REQUESTS:
-        updated_multipart_size = math.ceil(total_size_MB / MAX_REQUESTS)
-        st.warning(f"The maximum number of parts per upload is 10,000. Instead of selected MPU size of {st.session_state.mpu_size} MB, it is now {updated_multipart_size} MB.")
-        st.session_state.total_requests = MAX_REQUESTS
-        st.session_state.final_mpu_size = updated_multipart_size
-    else:
-        st.session_state.total_requests = total_requests
-        st.session_state.final_mpu_size = st.session_state.mpu_size
+
+    # Validate request count
+    total_requests, final_mpu_size = scenarios.backup_parts(total_size_MB, st.session_state.mpu_size)
+    if final_mpu_size != st.session_state.mpu_size:
+        st.warning(f"The maximum number of parts per upload is 10,000. Instead of selected MPU size of {st.session_state.mpu_size} MB, it is now {final_mpu_size} MB.")
+    st.session_state.total_requests = total_requests
+    st.session_state.final_mpu_size = final_mpu_size
     return True
 
-# @st.experimental_fragment
-def get_backup_pricing():
-    df = pd.DataFrame(columns=st.session_state.selected_storage_class, index=['PUT Request Cost per Backup File', 'Storage Cost per GB-month'])
-    st.info(f"For S3 Glacier Flexible Retrieval and Glacier Deep Archive, objects that are uploaded will incur S3 Standard PUT request pricing for parts, and the final complete multipart upload will incur the respective PUT pricing for that specific class.")
-
-    for storage_class in st.session_state.selected_storage_class:
-        storage_class_code =  pricing.s3_storage_classes[storage_class]
-        cost_per_put = pricing.get_s3_put_cost(storage_class_code, home_region)
-
-        # Glacier PUT cost is MPU with Standard cost, then complete MPU with Glacier cost
-        if storage_class_code == 'GLACIER' or storage_class_code == 'DEEP_ARCHIVE':
-            cost_per_mpu = pricing.get_s3_put_cost('STANDARD', home_region)
-            put_cost = st.session_state.total_requests * cost_per_mpu + cost_per_put
-        else:
-            put_cost = st.session_state.total_requests * cost_per_put
-        storage_cost_GB = pricing.get_s3_storage_cost(storage_class_code, home_region)
-        df[storage_class] = [put_cost, storage_cost_GB]
-
-    return df
-
-def calculate_prorated_charge(df, column, size):
-    retention = helper.get_retention(st.session_state.frequency)
-    actual_retention = retention['actual']
-
-    required_days = helper.get_prorated(column)
-    cost_per_day = df.loc['CostGB-Day', column]
-    print(required_days)
-    
-    if required_days - actual_retention <= 0:
-        return 0.00
-    else:
-        return (required_days - actual_retention) * cost_per_day * size
-    
+# Function to build the backup price and yearly cost tables and their chart (cached on the inputs by backup_components)
+@telemetry.timed('page.backup_results')
+def backup_results(sheet, storage_classes, total_size_GB, frequency, retention_days, total_requests):
+    import plotly.express as px  # interactive charts
+
+    df = scenarios.backup_costs(sheet, storage_classes, total_size_GB, frequency, retention_days, total_requests)
+    df_stock = df.loc[[scenarios.PUT_PER_FILE, scenarios.STORAGE_PER_GB_MONTH]].map(lambda x: f'${x:.5f}')
+    df_yearly = df.drop(index=scenarios.BACKUP_PRICE_ROWS)
+    df_yearly = df_yearly.map(lambda x: f'${x:.5f}')
+
+    df_long = df_yearly.reset_index()
+    df_long = pd.melt(df_long, id_vars=['index'], var_name='Storage Class', value_name='Cost')
+
+    fig = px.bar(df_long, x='index', y='Cost', color='Storage Class', barmode='group', labels={'Cost': 'Cost (USD)'})
+    fig.update_yaxes(tickprefix="$")
+    fig.update_xaxes(title_text="Cost Comparision between S3 Storage Classes")
+    return df_stock, df_yearly, fig
+
 @st.experimental_fragment
+@telemetry.timed('page.backup_components')
 def backup_components(frequency, retention):
+    # Card components are only imported once there is a result to render
+    import streamlit_shadcn_ui as ui
+
     cols = st.columns(2)
     with cols[0]:
         ui.metric_card(title=f"Retention period for {st.session_state.frequency} backups", content=f"Typically {retention['typical']}", description="Depending on compliance & backup types")
     with cols[1]:
-        ui.metric_card(title="Number of PUT requests per file", content=f"{st.session_state.total_requests}", description=f"= File size / MPU size (or {MAX_REQUESTS} if the maximum number of parts is reached)")
-    
-    df = get_backup_pricing()
+        put_requests = st.session_state.total_requests + 2 if st.session_state.total_requests else 1
+        ui.metric_card(title="Number of PUT requests per file", content=f"{put_requests}", description=f"CreateMultipartUpload, one UploadPart per part (file size / MPU size, at most {MAX_REQUESTS}) and CompleteMultipartUpload")
     
-    numeric_cols = df.select_dtypes(include=np.number).columns
-    df_stock = df.copy()
-    df_stock = df_stock.map(lambda x: f'${x:.5f}')
-    st.dataframe(df_stock, use_container_width=True)
-    # df_stock = df_stock.round(-2)
-    print(df_stock)
-
-    # Calculate yearly cost
+    st.info(f"For S3 Glacier Flexible Retrieval and Glacier Deep Archive, the CreateMultipartUpload and UploadPart requests of an upload incur S3 Standard PUT request pricing, and the final complete multipart upload will incur the respective PUT pricing for that specific class.")
+
+    # Calculate yearly cost of the classes the region has prices for
     total_size_GB = helper.convert_storage_size(st.session_state.size, st.session_state.unit, 'GB')
-    df.loc['CostGB-Day'] = df.loc['Storage Cost per GB-month'] / 30
-    df.loc['Yearly Total Storage Cost'] = df.loc['CostGB-Day'] * frequency * retention['actual'] * total_size_GB
-    df.loc['Yearly Total PUT Requests Cost'] = df.loc['PUT Request Cost per Backup File'] * frequency
-    df.loc['Pro-rated fee per file'] = [calculate_prorated_charge(df, column, total_size_GB) for column in df.columns]
-    df.loc['Total pro-rated fee'] = df.loc['Pro-rated fee per file'] * frequency
+    sheet = price_sheet.get_price_sheet(home_region)
+    storage_classes, unpriced = scenarios.priced_classes(sheet, st.session_state.selected_storage_class, scenarios.BACKUP_DIMENSIONS)
+    if unpriced:
+        st.warning(f"No prices found in {home_region} for {', '.join(unpriced)}; they are left out of the comparison.")
+    if not storage_classes:
+        st.error(f"No prices found in {home_region} for the selected storage classes")
+        return
+    df_stock, df_yearly, fig = result_cache.get_or_compute(
+        'backup_results',
+        lambda: backup_results(sheet, storage_classes, total_size_GB, frequency,
+                               retention['actual'], st.session_state.total_requests),
+        price_version=sheet.version, storage_classes=storage_classes, size_gb=total_size_GB,
+        frequency=frequency, retention_days=retention['actual'], parts=st.session_state.total_requests
+    )
 
-    df.loc['Yearly Total Cost'] = df.loc['Yearly Total Storage Cost'] + df.loc['Yearly Total PUT Requests Cost'] + df.loc['Total pro-rated fee']
-    st.info(f"Assuming retention period for {st.session_state.frequency} backups is {retention['actual']} days, the following table shows the yearly cost if data were to be deleted after the retention period expires.")
+    with telemetry.span('page.dataframe'):
+        st.dataframe(df_stock, use_container_width=True)
 
-    numeric_cols = df.select_dtypes(include=np.number).columns
-    df_yearly = df.copy()
-    df_yearly.drop(index=['PUT Request Cost per Backup File', 'Storage Cost per GB-month', 'CostGB-Day'], inplace=True)
-    # df_yearly[numeric_cols] = df_yearly[numeric_cols].map(lambda x: f'${x:.5f}')
-    print(df_yearly)
-    # df_yearly = df_yearly.round(2)
-    df_yearly = df_yearly.map(lambda x: f'${x:.5f}')
+    st.info(f"Assuming retention period for {st.session_state.frequency} backups is {retention['actual']} days, the following table shows the yearly cost if data were to be deleted after the retention period expires.")
 
-    print(df_yearly)
-    st.dataframe(df_yearly, use_container_width=True)
+    with telemetry.span('page.dataframe'):
+        st.dataframe(df_yearly, use_container_width=True)
     st.warning(f"For certain storage classes, objects deleted prior to the minimum storage duration incur a pro-rated charge equal to the storage charge for the remaining days. The minimum storage duration is 30 days for S3 Standard-IA and S3 One Zone-IA, 90 days for S3 Glacier Instant Retrieval, Glacier Flexible Retrieval and 180 days for S3 Glacier Deep Archive")
 
-    df_long = df_yearly.reset_index()
-    df_long = pd.melt(df_long, id_vars=['index'], var_name='Storage Class', value_name='Cost')
+    with telemetry.span('page.chart'):
+        st.plotly_chart(fig, use_container_width=True)
 
-    fig = px.bar(df_long, x='index', y='Cost', color='Storage Class', barmode='group', labels={'Cost': 'Cost (USD)'})
-    fig.update_yaxes(tickprefix="$")
-    fig.update_xaxes(title_text="Cost Comparision between S3 Storage Classes")
+    if st.session_state.mc_enabled:
+        monte_carlo_components(frequency, retention, storage_classes)
+
+    if st.session_state.sweep_regions:
+        sweep_components(frequency, retention)
+
+@telemetry.timed('page.monte_carlo_components')
+def monte_carlo_components(frequency, retention, storage_classes):
+    import plotly.express as px  # interactive charts
+    import utils.monte_carlo as monte_carlo
 
+    kind = st.session_state.mc_distribution.lower()
+    total_size_GB = helper.convert_storage_size(st.session_state.size, st.session_state.unit, 'GB')
+    size_low, size_high = st.session_state.mc_size_range
+    retention_low, retention_high = st.session_state.mc_retention_range
+    with st.spinner("Running trials..."):
+        result = monte_carlo.backup_monte_carlo(
+            price_sheet.get_price_sheet(home_region), storage_classes,
+            monte_carlo.from_range(total_size_GB * (1 + size_low / 100), total_size_GB * (1 + size_high / 100), kind, total_size_GB),
+            frequency,
+            monte_carlo.from_range(retention['actual'] * (1 + retention_low / 100), retention['actual'] * (1 + retention_high / 100), kind, retention['actual']),
+            mpu_size_mb=st.session_state.final_mpu_size,
+            growth_rate=monte_carlo.from_range(*(value / 100 for value in st.session_state.mc_growth_range), kind),
+            change_rate=monte_carlo.from_range(*(value / 100 for value in st.session_state.mc_change_range), kind),
+            dedup_rate=monte_carlo.from_range(*(value / 100 for value in st.session_state.mc_dedup_range), kind),
+            trials=st.session_state.mc_trials
+        )
+    st.write(f"### Yearly total cost over {result.trials:,} trials")
+    st.dataframe(result.percentiles().map(lambda x: f'${x:,.2f}'), use_container_width=True)
+    fig = px.bar(result.histogram_frame(), x='Cost', y='Trials', color='Series', barmode='overlay', opacity=0.6,
+                 labels={'Cost': 'Yearly total cost (USD)', 'Series': 'Storage Class'})
+    fig.update_xaxes(tickprefix="$")
     st.plotly_chart(fig, use_container_width=True)
 
+@telemetry.timed('page.sweep_components')
+def sweep_components(frequency, retention):
+    import utils.sweep as sweep
+
+    total_size_GB = helper.convert_storage_size(st.session_state.size, st.session_state.unit, 'GB')
+    with st.spinner("Pricing every region..."):
+        matrix, errors = sweep.sweep(
+            lambda sheet: scenarios.backup_costs(sheet, st.session_state.selected_storage_class, total_size_GB, frequency,
+                                                 retention['actual'], st.session_state.total_requests).loc[scenarios.YEARLY_TOTAL],
+            st.session_state.selected_storage_class
+        )
+    st.write("### Yearly total cost in every region")
+    cost_columns = st.session_state.selected_storage_class + [sweep.CHEAPEST_COST]
+    st.dataframe(matrix.style.format('${:.2f}', subset=cost_columns, na_rep='-'), use_container_width=True)
+    if errors:
+        st.caption(f"Not priced: {', '.join(sorted(errors))}")
+
+def gfs_form():
+    import utils.gfs as gfs
+
+    with st.form('gfs'):
+        st.write("### Grandfather-father-son retention schedule")
+        st.caption("Daily, weekly, monthly and yearly backup sets coexist, each with its own retention and storage class. On days when several sets are due, only the longest-lived set takes the backup.")
+        size_col, unit_col, growth_col, years_col = st.columns([2, 1, 2, 2])
+        with size_col:
+            st.number_input("Size of protected data", value=1, min_value=1, key='gfs_size')
+        with unit_col:
+            st.selectbox("Unit", ["GB", "TB"], index=1, key='gfs_unit')
+        with growth_col:
+            st.number_input("Yearly data growth (%)", value=20, min_value=0, key='gfs_growth')
+        with years_col:
+            st.slider("Years to simulate", 1, 10, 3, key='gfs_years')
+        storage_classes = list(pricing.s3_storage_classes_excl_int)
+        for backup_set in gfs.DEFAULT_SCHEDULE:
+            enabled_col, retention_col, class_col = st.columns([1, 2, 3])
+            with enabled_col:
+                st.checkbox(backup_set.name, value=True, key=f'gfs_{backup_set.name}_enabled')
+            with retention_col:
+                st.number_input(f"{backup_set.name} retention (days)", value=backup_set.retention_days, min_value=1, key=f'gfs_{backup_set.name}_retention')
+            with class_col:
+                st.selectbox(f"{backup_set.name} storage class", storage_classes, index=storage_classes.index(backup_set.storage_class), key=f'gfs_{backup_set.name}_class')
+        gfs_submitted = st.form_submit_button("Simulate schedule")
+    return gfs_submitted
+
+@telemetry.timed('page.gfs_components')
+def gfs_components():
+    import plotly.express as px  # interactive charts
+    import utils.gfs as gfs
+
+    schedule = [backup_set._replace(retention_days=st.session_state[f'gfs_{backup_set.name}_retention'],
+                                    storage_class=st.session_state[f'gfs_{backup_set.name}_class'])
+                for backup_set in gfs.DEFAULT_SCHEDULE if st.session_state[f'gfs_{backup_set.name}_enabled']]
+    error = gfs.validate_schedule(schedule)
+    if error is not None:
+        st.error(error)
+        return
+
+    sheet = price_sheet.get_price_sheet(home_region)
+    error = price_sheet.validate_priced(sheet, [backup_set.storage_class for backup_set in schedule], scenarios.BACKUP_DIMENSIONS)
+    if error is not None:
+        st.error(error)
+        return
+
+    size_GB = helper.convert_storage_size(st.session_state.gfs_size, st.session_state.gfs_unit, 'GB')
+    result = gfs.simulate_gfs(sheet, schedule, size_GB, st.session_state.gfs_years * gfs.DAYS_PER_YEAR,
+                              growth_rate=st.session_state.gfs_growth / 100)
+
+    components_df = pd.DataFrame({'Cost incurred': result.components()})
+    components_df.loc['Total cost'] = result.total
+    st.dataframe(components_df['Cost incurred'].map(lambda x: f'${x:,.2f}'), use_container_width=True)
+
+    yearly_df = pd.DataFrame(result.yearly_cost(), columns=result.set_names)
+    yearly_df.index = yearly_df.index + 1
+    yearly_df.index.name = 'Year'
+    yearly_long = pd.melt(yearly_df.reset_index(), id_vars=['Year'], var_name='Backup set', value_name='Cost')
+    fig = px.bar(yearly_long, x='Year', y='Cost', color='Backup set', labels={'Cost': 'Cost (USD)'})
+    fig.update_yaxes(tickprefix="$")
+    st.plotly_chart(fig, use_container_width=True)
+
+    stored_df = pd.DataFrame(result.stored_gb, columns=result.set_names)
+    stored_df.index.name = 'Day'
+    stored_long = pd.melt(stored_df.reset_index(), id_vars=['Day'], var_name='Backup set', value_name='Retained GB')
+    fig = px.area(stored_long, x='Day', y='Retained GB', color='Backup set')
+    st.plotly_chart(fig, use_container_width=True)
 
 if __name__ == "__main__":
     add_page_title()
     add_indentation()
-
+    trace = telemetry.begin_page('backup_archive')
 
     st.title("Scenario #2: Hybrid - Backup & Restore")
     st.sidebar.selectbox("Select a Region:", pricing.region_code, key='home_region')
+    warmup.sidebar_warmup(st.session_state['home_region'])
+    if st.sidebar.toggle("Compare all regions", key='sweep_regions'):
+        import utils.sweep as sweep
+
+        # Warm up every region's price sheet while the form is being filled in
+        sweep.prefetch_price_sheets()
 
     home_region = st.session_state['home_region']
 
@@ -148,12 +258,16 @@ if __name__ == "__main__":
 
     if backup_submitted:
         total_size_MB = helper.convert_storage_size(st.session_state.size, st.session_state.unit, 'MB')
-        total_requests = math.ceil(total_size_MB/st.session_state.mpu_size)
 
-        if validate_backup_input(total_size_MB, total_requests):
+        if validate_backup_input(total_size_MB):
 
             frequency = helper.get_frequency(st.session_state.frequency)
             retention = helper.get_retention(st.session_state.frequency)
             backup_components(frequency, retention)
 
+    if gfs_form():
+        gfs_components()
+
+    telemetry.end_page(trace)
+
 
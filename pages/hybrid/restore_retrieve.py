@@ -1,25 +1,18 @@
 import streamlit as st
 import utils.pricing as pricing
-import streamlit_shadcn_ui as ui
+import utils.price_sheet as price_sheet
+import utils.result_cache as result_cache
+import utils.scenarios as scenarios
+import utils.telemetry as telemetry
 import utils.helper as helper
+import utils.warmup as warmup
 import math
 import pandas as pd
 import numpy as np
-import plotly.express as px  # interactive charts
 from st_pages import show_pages_from_config, add_indentation, add_page_title
 import math
 
 
-LARGEST_FILE_SIZE = helper.convert_storage_size(5, 'TB', 'MB')
-MAX_REQUESTS = 10000
-
-GET_REQUEST_COST = 'GET Request Cost per 1000 files'
-RETRIEVAL_COST = 'Retrieval Cost per GB'
-RETRIEVAL_REQUEST_COST = 'Retrieval Cost per 1000 Requests'
-TOTAL_GET_REQUEST_COST = 'Total GET Request cost'
-TOTAL_RETRIEVAL_COST = 'Total Data Retrieval cost'
-TOTAL_RETRIEVAL_REQUEST_COST = 'Total Retrieval Requests cost'
-TOTAL_COST = 'Total cost'
 GLACIER_CLASSES = ['S3 Glacier Flexible Retrieval', 'S3 Glacier Deep Archive']
 
 # @st.experimental_fragment
@@ -38,27 +31,28 @@ def retrieval_form():
     return retrieval_submitted
 
 def validate_retrieval_input(total_size_MB):
-    # Validate maximum file size
-    if total_size_MB > LARGEST_FILE_SIZE:
-        st.error("File size is too large. Maximum size for each file stored in Amazon S3 is 5 TB.")
-        return False
-    
-    # Validate storage classes selected
-    if not st.session_state.selected_storage_class: 
-        st.error("Please select at least one storage class")
+    error = scenarios.validate_retrieval(total_size_MB, st.session_state.selected_storage_class)
+    if error is not None:
+        st.error(error)
         return False
-    
     return True
 
-def get_retrieval_pricing():
-    df = pd.DataFrame(columns=st.session_state.selected_storage_class, index=[GET_REQUEST_COST, RETRIEVAL_COST, RETRIEVAL_REQUEST_COST])
-    for storage_class in st.session_state.selected_storage_class:
-        storage_class_code =  pricing.s3_storage_classes[storage_class]
-        get_cost = pricing.get_s3_get_cost(storage_class_code, home_region)
-        retrieval_cost_per_gb = pricing.get_s3_retrieval_cost(storage_class_code, home_region)
-        retrieval_requests_cost = pricing.get_s3_retrieval_req_cost(storage_class_code, home_region)
-        df[storage_class] = [get_cost, retrieval_cost_per_gb, retrieval_requests_cost]
-    return df
+# Function to build the retrieval price and total cost tables and their chart (cached on the inputs by retrieval_components)
+@telemetry.timed('page.retrieval_results')
+def retrieval_results(sheet, storage_classes, files, total_size_retrieved_gb):
+    import plotly.express as px  # interactive charts
+
+    stock_table_df = scenarios.retrieval_pricing(sheet, storage_classes).map(lambda x: f'${x:.5f}')
+    table_df = scenarios.retrieval_costs(sheet, storage_classes, files, total_size_retrieved_gb)
+    table_df = table_df.map(lambda x: f'${x:.5f}')
+
+    df_long = table_df.reset_index()
+    df_long = pd.melt(df_long, id_vars=['index'], var_name='Storage Class', value_name='Cost')
+
+    fig = px.bar(df_long, x='index', y='Cost', color='Storage Class', barmode='group', labels={'Cost': 'Cost (USD)'})
+    fig.update_yaxes(tickprefix="$")
+    fig.update_xaxes(title_text="Cost Comparision between S3 Storage Classes")
+    return stock_table_df, table_df, fig
 
 @st.experimental_fragment
 def retrieval_components():
@@ -67,6 +61,8 @@ def retrieval_components():
         total_size_MB = helper.convert_storage_size(st.session_state.size, st.session_state.unit, 'MB')
 
         if validate_retrieval_input(total_size_MB):
+            # Card components are only imported once there is a result to render
+            import streamlit_shadcn_ui as ui
 
             total_size_retrieved = st.session_state.files_retrieval * st.session_state.size
 
@@ -78,12 +74,25 @@ def retrieval_components():
             with cols[2]:
                 ui.metric_card(title="Total size of files to retrieve", content=f"{total_size_retrieved} {st.session_state.unit}", description=f"= total files * size of each file")
 
-            stock_retrieval_df = get_retrieval_pricing()
+            sheet = price_sheet.get_price_sheet(home_region)
+            storage_classes, unpriced = scenarios.priced_classes(sheet, st.session_state.selected_storage_class, scenarios.RETRIEVAL_DIMENSIONS)
+            if unpriced:
+                st.warning(f"No prices found in {home_region} for {', '.join(unpriced)}; they are left out of the comparison.")
+            if not storage_classes:
+                st.error(f"No prices found in {home_region} for the selected storage classes")
+                return
             total_size_retrieved_gb = helper.convert_storage_size(total_size_retrieved, st.session_state.unit, 'GB')
+            stock_table_df, table_df, fig = result_cache.get_or_compute(
+                'retrieval_results',
+                lambda: retrieval_results(sheet, storage_classes, st.session_state.files_retrieval,
+                                          total_size_retrieved_gb),
+                price_version=sheet.version, storage_classes=storage_classes,
+                files=st.session_state.files_retrieval, retrieved_gb=total_size_retrieved_gb
+            )
 
             # Print table for stock cost first
-            stock_table_df = stock_retrieval_df.map(lambda x: f'${x:.5f}')
-            st.dataframe(stock_table_df, use_container_width=True)
+            with telemetry.span('page.dataframe'):
+                st.dataframe(stock_table_df, use_container_width=True)
 
             # Educate pricing
             st.info("""
@@ -94,38 +103,54 @@ def retrieval_components():
                         """)
 
             # Print table for total cost 
-            table_df = pd.DataFrame(columns=st.session_state.selected_storage_class)
-            table_df.loc[TOTAL_GET_REQUEST_COST] = stock_retrieval_df.loc[GET_REQUEST_COST] * st.session_state.files_retrieval
-            table_df.loc[TOTAL_RETRIEVAL_COST] = stock_retrieval_df.loc[RETRIEVAL_COST] * total_size_retrieved_gb * st.session_state.files_retrieval
-            table_df.loc[TOTAL_RETRIEVAL_REQUEST_COST] = stock_retrieval_df.loc[RETRIEVAL_REQUEST_COST] * math.ceil(st.session_state.files_retrieval/1000)
-            table_df.loc[TOTAL_COST] = table_df.sum()
-            table_df = table_df.map(lambda x: f'${x:.5f}')
-            st.dataframe(table_df, use_container_width=True)
+            with telemetry.span('page.dataframe'):
+                st.dataframe(table_df, use_container_width=True)
 
-            df_long = table_df.reset_index()
-            df_long = pd.melt(df_long, id_vars=['index'], var_name='Storage Class', value_name='Cost')
+            with telemetry.span('page.chart'):
+                st.plotly_chart(fig, use_container_width=True)
 
-            fig = px.bar(df_long, x='index', y='Cost', color='Storage Class', barmode='group', labels={'Cost': 'Cost (USD)'})
-            fig.update_yaxes(tickprefix="$")
-            fig.update_xaxes(title_text="Cost Comparision between S3 Storage Classes")
-
-            st.plotly_chart(fig, use_container_width=True)
-
-            if any(element in GLACIER_CLASSES for element in st.session_state.selected_storage_class):
+            if any(element in GLACIER_CLASSES for element in storage_classes):
                 st.info("""
                     Amazon S3 objects that are stored in the S3 Glacier Flexible Retrieval or S3 Glacier Deep Archive storage classes are not immediately accessible. 
                     To access an object in these storage classes, you must restore a temporary copy of the object to its S3 bucket for a specified duration (number of days). 
                     You pay for storage cost for both the archived object (per selected S3 Glacier class rates) and the copy that you restored temporarily (per S3 Standard rates).
                         """)
 
+            if st.session_state.sweep_regions:
+                sweep_components(total_size_retrieved_gb)
+
+@telemetry.timed('page.sweep_components')
+def sweep_components(total_size_retrieved_gb):
+    import utils.sweep as sweep
+
+    with st.spinner("Pricing every region..."):
+        matrix, errors = sweep.sweep(
+            lambda sheet: scenarios.retrieval_costs(sheet, st.session_state.selected_storage_class,
+                                                    st.session_state.files_retrieval, total_size_retrieved_gb).loc[scenarios.TOTAL_COST],
+            st.session_state.selected_storage_class
+        )
+    st.write("### Total retrieval cost in every region")
+    cost_columns = st.session_state.selected_storage_class + [sweep.CHEAPEST_COST]
+    st.dataframe(matrix.style.format('${:.5f}', subset=cost_columns, na_rep='-'), use_container_width=True)
+    if errors:
+        st.caption(f"Not priced: {', '.join(sorted(errors))}")
+
 if __name__ == "__main__":
 
     add_page_title(layout="wide",)
     add_indentation()
+    trace = telemetry.begin_page('restore_retrieve')
     st.sidebar.selectbox("Select a Region:", pricing.region_code, key='home_region')
+    warmup.sidebar_warmup(st.session_state['home_region'])
+    if st.sidebar.toggle("Compare all regions", key='sweep_regions'):
+        import utils.sweep as sweep
+
+        # Warm up every region's price sheet while the form is being filled in
+        sweep.prefetch_price_sheets()
     home_region = st.session_state['home_region']
 
     retrieval_components()
-        
+
+    telemetry.end_page(trace)
 
 
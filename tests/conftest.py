@@ -0,0 +1,27 @@
+# conftest.py
+"""
+Prices are replayed from the recorded Price List responses (benchmarks/fixtures, see
+benchmarks/record_responses.py), so the tests need no network and no credentials. Expected
+values are worked out by hand from the us-east-1 prices of that recording.
+"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+REGION = 'us-east-1'
+
+
+@pytest.fixture(scope='session')
+def sheet():
+    import benchmarks.suite as suite
+    import utils.price_sheet as price_sheet
+
+    # A price store or local catalog would take precedence over the recording
+    os.environ.pop('S3_PRICE_STORE', None)
+    suite.install_stub()
+    return price_sheet.get_price_sheet(REGION)
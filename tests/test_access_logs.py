@@ -0,0 +1,39 @@
+# test_access_logs.py
+import datetime
+
+import utils.access_logs as access_logs
+
+LINE = 'owner bucket [{date}:10:00:00 +0000] 192.0.2.1 requester REQID {operation} {key} "PUT /{key} HTTP/1.1" 200 - 100 {size} 10 5 "-" "-"\n'
+
+
+def _write_log(tmp_path, records):
+    (tmp_path / 'access.log').write_text(''.join(LINE.format(date=date, operation=operation, key=key, size=size)
+                                                 for date, operation, key, size in records))
+    return str(tmp_path)
+
+
+def test_log_with_only_part_uploads_and_copies(tmp_path):
+    directory = _write_log(tmp_path, [
+        ('10/Mar/2024', 'REST.PUT.PART', 'a', 5000),
+        ('12/Mar/2024', 'REST.COPY.PART', 'b', 7000),
+    ])
+    summary = access_logs.summarize_logs(directory, workers=1)
+    assert summary.get_requests == 0 and summary.put_requests == 0
+    # Ages are measured from the last access, as no GET or PUT was logged
+    assert summary.first_day == datetime.date(2024, 3, 10).toordinal()
+    assert summary.last_day == datetime.date(2024, 3, 12).toordinal()
+    assert summary.days_covered == 3
+    assert summary.age_objects[0] == 1 and summary.age_objects[2] == 1
+    assert summary.age_bytes.sum() == 12000
+
+
+def test_age_histogram(tmp_path):
+    directory = _write_log(tmp_path, [
+        ('01/Mar/2024', 'REST.PUT.OBJECT', 'a', 100),
+        ('11/Mar/2024', 'REST.GET.OBJECT', 'b', 300),
+        ('31/Mar/2024', 'REST.GET.OBJECT', 'b', 300),
+    ])
+    summary = access_logs.summarize_logs(directory, workers=1)
+    assert (summary.get_requests, summary.put_requests, summary.days_covered) == (2, 1, 31)
+    assert summary.age_objects[30] == 1 and summary.age_objects[0] == 1
+    assert summary.not_accessed_share(30) == 0.25
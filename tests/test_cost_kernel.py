@@ -0,0 +1,86 @@
+# test_cost_kernel.py
+"""
+Kernel output against hand-computed costs. us-east-1 prices of the recording: PUT per request,
+GET, retrieval request and transition per 1000 requests, storage per GB-month, retrieval per GB.
+"""
+import pytest
+
+import utils.cost_kernel as cost_kernel
+import utils.helper as helper
+import utils.multipart as multipart
+import utils.price_sheet as price_sheet
+
+STANDARD = price_sheet.CLASS_INDEX['STANDARD']
+STANDARD_IA = price_sheet.CLASS_INDEX['STANDARD_IA']
+GLACIER_IR = price_sheet.CLASS_INDEX['GLACIER_IR']
+GLACIER = price_sheet.CLASS_INDEX['GLACIER']
+DEEP_ARCHIVE = price_sheet.CLASS_INDEX['DEEP_ARCHIVE']
+
+KB_GB = 1 / 1024 ** 2
+
+
+def test_recorded_prices(sheet):
+    assert sheet.price('STANDARD', 'storage') == pytest.approx(0.023)
+    assert sheet.price('STANDARD', 'PUT') == pytest.approx(0.000005)
+    assert sheet.price('GLACIER', 'PUT') == pytest.approx(0.00003)
+    assert sheet.price('GLACIER_IR', 'transition') == pytest.approx(0.02)
+
+
+def test_storage_cost(sheet):
+    # 100 GB for 45 days at $0.023 per GB-month
+    assert cost_kernel.storage_cost(sheet.table, STANDARD, 100, 45) == pytest.approx(100 * 0.023 * 45 / 30)
+
+
+def test_storage_cost_minimum_billable_size(sheet):
+    # 1000 objects of 64 KB in Standard-IA are billed as 128 KB each
+    cost = cost_kernel.storage_cost(sheet.table, STANDARD_IA, 1000 * 64 * KB_GB, 30, objects=1000)
+    assert cost == pytest.approx(1000 * 128 * KB_GB * 0.0125)
+
+
+def test_storage_cost_glacier_overhead(sheet):
+    # One 1 GB object in Flexible Retrieval adds 32 KB at its rate and 8 KB at the S3 Standard rate
+    cost = cost_kernel.storage_cost(sheet.table, GLACIER, 1.0, 30, objects=1)
+    assert cost == pytest.approx((1 + 32 * KB_GB) * 0.0036 + 8 * KB_GB * 0.023)
+
+
+def test_early_deletion_cost(sheet):
+    # Glacier Instant Retrieval deleted after 30 of its 90 minimum days pays the other 60
+    assert cost_kernel.early_deletion_cost(sheet.table, GLACIER_IR, 100, 30) == pytest.approx(100 * 0.004 * 60 / 30)
+    assert cost_kernel.early_deletion_cost(sheet.table, STANDARD, 100, 1) == 0.0
+
+
+def test_put_cost_single_put(sheet):
+    assert cost_kernel.put_cost(sheet.table, GLACIER, 10) == pytest.approx(10 * 0.00003)
+    assert cost_kernel.put_cost(sheet.table, GLACIER, 10, put_parts=0) == pytest.approx(10 * 0.00003)
+
+
+def test_put_cost_multipart(sheet):
+    # CreateMultipartUpload, 10 UploadPart and CompleteMultipartUpload
+    assert cost_kernel.put_cost(sheet.table, STANDARD, 1, put_parts=10) == pytest.approx(12 * 0.000005)
+    # Flexible Retrieval: create and parts at the S3 Standard price, complete at the class price
+    assert cost_kernel.put_cost(sheet.table, GLACIER, 1, put_parts=10) == pytest.approx(11 * 0.000005 + 0.00003)
+    assert cost_kernel.put_cost(sheet.table, DEEP_ARCHIVE, 3, put_parts=10) == pytest.approx(3 * (11 * 0.000005 + 0.00005))
+
+
+def test_put_cost_matches_upload_planner(sheet):
+    plan = multipart.plan_uploads(helper.convert_storage_size(100, 'GB', 'MB'), part_size_mb=8, threshold_mb=0)
+    storage_classes = list(price_sheet.STORAGE_CLASSES)
+    expected = plan.put_cost(sheet, storage_classes)
+    actual = cost_kernel.put_cost(sheet.table, price_sheet.class_indices(storage_classes), 1, put_parts=plan.parts)
+    assert actual == pytest.approx(expected)
+
+
+def test_request_and_retrieval_units(sheet):
+    # GET and restore requests are priced per 1000, retrieval per GB
+    assert cost_kernel.get_request_cost(sheet.table, STANDARD, 1000) == pytest.approx(0.0004)
+    assert cost_kernel.restore_request_cost(sheet.table, GLACIER, 1000) == pytest.approx(0.05)
+    assert cost_kernel.retrieval_cost(sheet.table, GLACIER, 500) == pytest.approx(500 * 0.01)
+    assert cost_kernel.transition_cost(sheet.table, GLACIER_IR, 10_000) == pytest.approx(10 * 0.02)
+
+
+def test_cost_components_vectorized(sheet):
+    costs = cost_kernel.cost_components(sheet.table, [STANDARD, GLACIER_IR], size_gb=100, days=30, objects=1, removed=True)
+    assert costs.storage == pytest.approx([100 * 0.023, 100 * 0.004])
+    assert costs.request == pytest.approx([0.000005, 0.00002])
+    assert costs.early_deletion == pytest.approx([0.0, 100 * 0.004 * 60 / 30])
+    assert costs.total == pytest.approx(costs.storage + costs.request + costs.early_deletion)
@@ -0,0 +1,68 @@
+# test_scenarios.py
+"""
+Page-level totals against hand-computed costs, including the per-1000 request units the
+retrieval and known-access pages got wrong before the shared cost kernel.
+"""
+import pytest
+
+import utils.helper as helper
+import utils.monte_carlo as monte_carlo
+import utils.price_sheet as price_sheet
+import utils.scenarios as scenarios
+
+
+def test_retrieval_costs(sheet):
+    # 1000 files, 500 GB in total
+    df = scenarios.retrieval_costs(sheet, ['S3 Standard', 'S3 Glacier Flexible Retrieval'], 1000, 500)
+    standard, glacier = df['S3 Standard'], df['S3 Glacier Flexible Retrieval']
+    # GET is per 1000 requests, not per request
+    assert standard[scenarios.TOTAL_GET_REQUEST_COST] == pytest.approx(0.0004)
+    assert glacier[scenarios.TOTAL_GET_REQUEST_COST] == pytest.approx(0.0004)
+    # Retrieval is per GB retrieved, not multiplied by the file count again
+    assert glacier[scenarios.TOTAL_RETRIEVAL_COST] == pytest.approx(500 * 0.01)
+    assert glacier[scenarios.TOTAL_RETRIEVAL_REQUEST_COST] == pytest.approx(0.05)
+    assert glacier[scenarios.TOTAL_COST] == pytest.approx(0.0004 + 5.0 + 0.05)
+    assert standard[scenarios.TOTAL_COST] == pytest.approx(0.0004)
+
+
+def test_transition_costs(sheet):
+    # 10,000 objects, 1000 GB, moved from Standard to Glacier Instant Retrieval after 30 of 365 days
+    costs = scenarios.transition_costs(sheet, 'S3 Standard', 'S3 Glacier Instant Retrieval', 10_000, 1000, 30, 365)
+    # Transitions are per 1000 objects
+    assert costs['transition'] == pytest.approx(10 * 0.02)
+    assert costs['source_storage'] == pytest.approx(1000 * 0.023 * 30 / 30)
+    assert costs['target_storage'] == pytest.approx(1000 * 0.004 * 335 / 30)
+    assert costs['early_deletion'] == 0.0
+    assert costs['total'] == pytest.approx(23.0 + 1000 * 0.004 * 335 / 30 + 0.2)
+    assert costs['original_storage'] == pytest.approx(1000 * 0.023 * 365 / 30)
+
+
+def test_transition_costs_early_deletion(sheet):
+    # Leaving Standard-IA after 10 days pays the remaining 20 of its 30 minimum days
+    costs = scenarios.transition_costs(sheet, 'S3 Standard - Infrequent Access', 'S3 Glacier Instant Retrieval', 10_000, 1000, 10, 365)
+    assert costs['early_deletion'] == pytest.approx(1000 * 0.0125 * 20 / 30)
+
+
+def test_backup_costs(sheet):
+    # Daily 100 GB backups kept 30 days: 102,400 MB needs 11 MB parts to stay within 10,000 parts
+    parts, part_size_mb = scenarios.backup_parts(helper.convert_storage_size(100, 'GB', 'MB'), 8)
+    assert (parts, part_size_mb) == (9310, 11)
+    df = scenarios.backup_costs(sheet, ['S3 Standard'], 100, 365, 30, parts)
+    put = (parts + 2) * 0.000005
+    assert df.loc[scenarios.PUT_PER_FILE, 'S3 Standard'] == pytest.approx(put)
+    assert df.loc[scenarios.YEARLY_TOTAL, 'S3 Standard'] == pytest.approx(365 * (100 * 0.023 + put))
+
+
+@pytest.mark.parametrize('size_gb, frequency, retention_days, mpu_size_mb', [
+    (100, 365, 30, 8),
+    (2.5, 52, 90, 16),
+    (4096, 12, 365, 64),
+])
+def test_backup_costs_match_monte_carlo(sheet, size_gb, frequency, retention_days, mpu_size_mb):
+    storage_classes = list(price_sheet.STORAGE_CLASS_NAMES)
+    parts, _ = scenarios.backup_parts(helper.convert_storage_size(size_gb, 'GB', 'MB'), mpu_size_mb)
+    df = scenarios.backup_costs(sheet, storage_classes, size_gb, frequency, retention_days, parts)
+    result = monte_carlo.backup_monte_carlo(sheet, storage_classes, size_gb, frequency, retention_days, mpu_size_mb,
+                                            trials=10, seed=0)
+    for storage_class in storage_classes:
+        assert result.totals[:, result.columns.index(storage_class)] == pytest.approx(df.loc[scenarios.YEARLY_TOTAL, storage_class])
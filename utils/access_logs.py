@@ -0,0 +1,314 @@
+# access_logs.py
+"""
+Streaming ingestion of S3 server access logs into the access-pattern inputs of the scenario pages.
+
+Log files (plain or gzipped) are read line by line; per object key only the last access day
+and object size are kept. When more keys than the memory budget are seen, they are spilled to a
+SQLite file. Files are summarized in parallel with a process pool and merged.
+
+Objects that were never accessed during the log window do not appear in the logs at all, so
+their share has to come from an inventory (see utils/inventory.py).
+"""
+import datetime
+import glob
+import gzip
+import multiprocessing
+import os
+import re
+import sqlite3
+import tempfile
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import utils.intelligent_tiering as intelligent_tiering
+
+# bucket_owner bucket [time] remote_ip requester request_id operation key "request_uri" status error_code bytes_sent object_size ...
+LOG_LINE = re.compile(r'^\S+ \S+ \[([^\]]+)\] \S+ \S+ \S+ (\S+) (\S+) "[^"]*" (\S+) \S+ \S+ (\S+)')
+
+GET_OPERATIONS = {'REST.GET.OBJECT'}
+PUT_OPERATIONS = {'REST.PUT.OBJECT', 'REST.POST.UPLOAD', 'REST.COPY.OBJECT', 'REST.POST.OBJECT'}
+# Requests that count as an access for Intelligent-Tiering (HEAD and LIST do not)
+ACCESS_OPERATIONS = GET_OPERATIONS | PUT_OPERATIONS | {'REST.COPY.OBJECT_GET', 'REST.PUT.PART', 'REST.COPY.PART'}
+
+MONTHS = {name: i for i, name in enumerate(['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'], 1)}
+
+# Ages beyond this many days are counted in the last bucket of the age histogram
+MAX_AGE_DAYS = 3650
+
+DEFAULT_MAX_KEYS = 2_000_000
+
+
+def iter_log_lines(path):
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8', errors='replace') as fp:
+        for line in fp:
+            yield line
+
+
+def parse_records(lines):
+    """
+    Yield (day ordinal, operation, key, object size in bytes) for every successful object request.
+    """
+    days = {}
+    for line in lines:
+        match = LOG_LINE.match(line)
+        if match is None:
+            continue
+        timestamp, operation, key, status, object_size = match.groups()
+        if key == '-' or not status.startswith('2'):
+            continue
+        # '06/Feb/2019:00:00:38 +0000'; parsing is cached per calendar day
+        date = timestamp[:11]
+        day = days.get(date)
+        if day is None:
+            day = datetime.date(int(date[7:11]), MONTHS[date[3:6]], int(date[0:2])).toordinal()
+            days[date] = day
+        yield day, operation, key, int(object_size) if object_size.isdigit() else 0
+
+
+class LastAccessStore:
+    """
+    Last access day and size per object key, bounded to max_keys in memory.
+    Beyond the budget, entries are merged into a SQLite file on disk.
+    first_day and last_day are the earliest and latest access day stored (None while empty).
+    """
+
+    def __init__(self, max_keys=DEFAULT_MAX_KEYS, spill_dir=None):
+        self.max_keys = max_keys
+        self.spill_dir = spill_dir
+        self.memory = {}
+        self.spill_path = None
+        self._db = None
+        self.first_day = None
+        self.last_day = None
+
+    def update(self, key, day, size):
+        if self.first_day is None or day < self.first_day:
+            self.first_day = day
+        if self.last_day is None or day > self.last_day:
+            self.last_day = day
+        entry = self.memory.get(key)
+        if entry is None:
+            self.memory[key] = (day, size)
+            if len(self.memory) > self.max_keys:
+                self.spill()
+        else:
+            self.memory[key] = (max(entry[0], day), max(entry[1], size))
+
+    def spill(self):
+        if self._db is None:
+            fd, self.spill_path = tempfile.mkstemp(prefix='s3-access-', suffix='.sqlite', dir=self.spill_dir)
+            os.close(fd)
+            self._db = sqlite3.connect(self.spill_path)
+            self._db.execute('PRAGMA journal_mode=OFF')
+            self._db.execute('PRAGMA synchronous=OFF')
+            self._db.execute('CREATE TABLE IF NOT EXISTS access (key TEXT PRIMARY KEY, day INTEGER, size INTEGER)')
+        self._db.executemany(
+            'INSERT INTO access (key, day, size) VALUES (?, ?, ?) '
+            'ON CONFLICT(key) DO UPDATE SET day = max(day, excluded.day), size = max(size, excluded.size)',
+            ((key, day, size) for key, (day, size) in self.memory.items())
+        )
+        self._db.commit()
+        self.memory.clear()
+
+    def __len__(self):
+        if self._db is None:
+            return len(self.memory)
+        self.spill()
+        return self._db.execute('SELECT count(*) FROM access').fetchone()[0]
+
+    def items(self, chunk_size=100_000):
+        """
+        Yield (key, day, size) for every key exactly once.
+        """
+        if self._db is None:
+            for key, (day, size) in self.memory.items():
+                yield key, day, size
+            return
+        self.spill()
+        cursor = self._db.execute('SELECT key, day, size FROM access')
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield from rows
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+            os.remove(self.spill_path)
+        self.memory.clear()
+
+
+class AccessLogSummary:
+    """
+    Access-pattern inputs derived from the logs: an age histogram (days since last access,
+    by object count and by bytes) and GET/PUT request counts per day.
+    """
+
+    def __init__(self, age_objects, age_bytes, get_requests, put_requests, first_day, last_day):
+        self.age_objects = age_objects
+        self.age_bytes = age_bytes
+        self.get_requests = get_requests
+        self.put_requests = put_requests
+        self.first_day = first_day
+        self.last_day = last_day
+
+    @property
+    def days_covered(self):
+        return self.last_day - self.first_day + 1 if self.last_day is not None else 0
+
+    @property
+    def daily_get_rate(self):
+        return self.get_requests / self.days_covered if self.days_covered else 0.0
+
+    @property
+    def daily_put_rate(self):
+        return self.put_requests / self.days_covered if self.days_covered else 0.0
+
+    def not_accessed_share(self, days, by='bytes'):
+        """
+        Share of objects (or bytes) not accessed in the last `days` days, e.g. TIP_IA (30) and TIP_AI (90).
+        """
+        histogram = self.age_bytes if by == 'bytes' else self.age_objects
+        total = histogram.sum()
+        return float(histogram[days:].sum() / total) if total else 0.0
+
+    def tier_percentages(self, schedule, by='bytes'):
+        """
+        Whole-number percentage per Intelligent-Tiering tier, keyed like the unknown-access form.
+        """
+        histogram = self.age_bytes if by == 'bytes' else self.age_objects
+        fractions = intelligent_tiering.fractions_from_access_ages(np.arange(len(histogram)), histogram, schedule)
+        return {tier: int(round(fraction * 100)) for tier, fraction in zip(intelligent_tiering.TIERS, fractions)}
+
+
+def summarize_file(path, max_keys=DEFAULT_MAX_KEYS, spill_dir=None):
+    """
+    Summarize one log file. Returns (store, request counts by (day, 'GET'/'PUT')).
+    """
+    store = LastAccessStore(max_keys, spill_dir)
+    requests = Counter()
+    for day, operation, key, size in parse_records(iter_log_lines(path)):
+        if operation in GET_OPERATIONS:
+            requests[(day, 'GET')] += 1
+        elif operation in PUT_OPERATIONS:
+            requests[(day, 'PUT')] += 1
+        if operation in ACCESS_OPERATIONS:
+            store.update(key, day, size)
+    return store, requests
+
+
+def _summarize_file_worker(path, max_keys, spill_dir):
+    # Runs in a worker process: large results are handed back as a SQLite file instead of a pickled dict
+    store, requests = summarize_file(path, max_keys, spill_dir)
+    if store.spill_path is not None:
+        store.spill()
+        store._db.close()
+        return ('sqlite', store.spill_path), requests
+    return ('memory', store.memory), requests
+
+
+def _iter_partial(partial):
+    kind, payload = partial
+    if kind == 'memory':
+        for key, (day, size) in payload.items():
+            yield key, day, size
+        return
+    db = sqlite3.connect(payload)
+    try:
+        yield from db.execute('SELECT key, day, size FROM access')
+    finally:
+        db.close()
+        os.remove(payload)
+
+
+def _merge_partials(store, requests, partials):
+    for partial, file_requests in partials:
+        requests.update(file_requests)
+        for key, day, size in _iter_partial(partial):
+            store.update(key, day, size)
+
+
+def summarize_logs(directory, pattern='*', workers=None, max_keys=DEFAULT_MAX_KEYS, spill_dir=None, reference_day=None):
+    """
+    Summarize every access log file in a directory.
+
+    Parameters:
+    directory (str): directory holding the (optionally gzipped) log files.
+    pattern (str): glob pattern of log file names.
+    workers (int): size of the process pool; defaults to the number of CPUs, 1 reads the files in this process.
+    max_keys (int): keys kept in memory by the merged store (each worker gets an equal share).
+    spill_dir (str): where spill files are written; defaults to the system temp directory.
+    reference_day (datetime.date): day ages are measured from; defaults to the last day in the logs.
+
+    Returns:
+    AccessLogSummary
+    """
+    paths = sorted(path for path in glob.glob(os.path.join(directory, pattern)) if os.path.isfile(path))
+    workers = workers or os.cpu_count() or 1
+    worker_keys = max(1, max_keys // workers)
+
+    store = LastAccessStore(max_keys, spill_dir)
+    requests = Counter()
+    if workers == 1:
+        _merge_partials(store, requests, (_summarize_file_worker(path, worker_keys, spill_dir) for path in paths))
+    else:
+        # Spawned, not forked: forking a threaded process such as the Streamlit server can deadlock the workers
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            futures = [executor.submit(_summarize_file_worker, path, worker_keys, spill_dir) for path in paths]
+            _merge_partials(store, requests, (future.result() for future in futures))
+
+    # Logs with no GET or PUT (e.g. only part uploads or copies) fall back to the days of the accesses
+    request_days = [day for day, _ in requests]
+    first_day = min(request_days) if request_days else store.first_day
+    last_day = max(request_days) if request_days else store.last_day
+    if reference_day is not None:
+        reference_ordinal = reference_day.toordinal()
+    else:
+        reference_ordinal = last_day
+
+    # Age histogram, built in chunks so memory stays flat however many keys there are
+    age_objects = np.zeros(MAX_AGE_DAYS + 1)
+    age_bytes = np.zeros(MAX_AGE_DAYS + 1)
+    chunk = []
+    for _, day, size in store.items():
+        chunk.append((day, size))
+        if len(chunk) >= 100_000:
+            _add_ages(age_objects, age_bytes, chunk, reference_ordinal)
+            chunk = []
+    if chunk:
+        _add_ages(age_objects, age_bytes, chunk, reference_ordinal)
+    store.close()
+
+    return AccessLogSummary(
+        age_objects, age_bytes,
+        sum(count for (_, kind), count in requests.items() if kind == 'GET'),
+        sum(count for (_, kind), count in requests.items() if kind == 'PUT'),
+        first_day, last_day
+    )
+
+
+def _add_ages(age_objects, age_bytes, chunk, reference_ordinal):
+    days, sizes = np.array(chunk, dtype=np.int64).T
+    ages = np.clip(reference_ordinal - days, 0, MAX_AGE_DAYS)
+    age_objects += np.bincount(ages, minlength=MAX_AGE_DAYS + 1)
+    age_bytes += np.bincount(ages, weights=sizes.astype(float), minlength=MAX_AGE_DAYS + 1)
+
+
+if __name__ == "__main__":
+    # python -m utils.access_logs <log directory> [pattern]
+    import json
+    import sys
+
+    summary = summarize_logs(sys.argv[1], *sys.argv[2:3])
+    print(json.dumps({
+        'days_covered': summary.days_covered,
+        'daily_get_rate': summary.daily_get_rate,
+        'daily_put_rate': summary.daily_put_rate,
+        'not_accessed_30_days': summary.not_accessed_share(30),
+        'not_accessed_90_days': summary.not_accessed_share(90),
+        'tier_percentages': summary.tier_percentages(intelligent_tiering.transition_schedule()),
+    }, indent=2))
@@ -0,0 +1,225 @@
+# batch.py
+"""
+Headless batch runner for the cost scenarios in utils/scenarios.py.
+
+Scenario files are JSON (a list, or {"scenarios": [...]}), YAML (needs PyYAML) or CSV with one
+scenario per row; list values in CSV cells are separated by ';'. Every scenario has a `type`:
+
+- backup:     size, unit, frequency, mpu_size, storage_classes
+- retrieval:  size, unit, files, storage_classes
+- transition: source, target, objects, size, unit, days, forecast
+- lifecycle:  source, target, days, daily_objects, size, unit, years, expiration (0 keeps objects)
+
+plus optional `id` and `region` (default us-east-1). Transition and lifecycle scenarios may give
+a `size_histogram` instead of `size`: [objects, average object size] pairs in `unit` (written
+`objects:size` in CSV cells), priced bucket by bucket (see utils/object_sizes.py); `objects`
+then defaults to the histogram's total. Results are written as CSV, or Parquet
+(needs pyarrow) when the output ends in .parquet, with one row per scenario and storage class.
+
+Usage: python -m utils.batch scenarios.yaml -o results.csv [--workers N] [--chunk-size N]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import utils.helper as helper
+import utils.object_sizes as object_sizes
+import utils.price_sheet as price_sheet
+import utils.scenarios as scenarios
+
+DEFAULT_REGION = 'us-east-1'
+CHUNK_SIZE = 500
+LIST_FIELDS = ('storage_classes', 'size_histogram')
+
+
+def load_scenarios(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        records = pd.read_csv(path).to_dict('records')
+        for record in records:
+            for field in LIST_FIELDS:
+                if isinstance(record.get(field), str):
+                    record[field] = [value.strip() for value in record[field].split(';') if value.strip()]
+        # Empty CSV cells come back as NaN; treat them as missing
+        records = [{key: value for key, value in record.items() if not (isinstance(value, float) and value != value)}
+                   for record in records]
+    elif extension in ('.yaml', '.yml'):
+        import yaml
+
+        with open(path, encoding='utf-8') as fp:
+            records = yaml.safe_load(fp)
+    else:
+        with open(path, encoding='utf-8') as fp:
+            records = json.load(fp)
+    if isinstance(records, dict):
+        records = records['scenarios']
+    for i, record in enumerate(records):
+        record.setdefault('id', i)
+        record.setdefault('region', DEFAULT_REGION)
+    return records
+
+
+def _size_gb(scenario):
+    return helper.convert_storage_size(float(scenario['size']), scenario.get('unit', 'GB'), 'GB')
+
+
+# Function to get the SizeHistogram of a scenario's size_histogram, or None when it has none
+def _size_histogram(scenario):
+    entries = scenario.get('size_histogram')
+    if not entries:
+        return None
+    pairs = [entry.split(':') if isinstance(entry, str) else entry for entry in entries]
+    objects = np.array([float(count) for count, _ in pairs])
+    sizes_gb = helper.convert_storage_size(np.array([float(size) for _, size in pairs]), scenario.get('unit', 'GB'), 'GB')
+    return object_sizes.SizeHistogram(objects, objects * sizes_gb)
+
+
+def evaluate_scenario(scenario, sheet):
+    """
+    Evaluate one scenario against the PriceSheet of its region.
+
+    Returns:
+    list of result records (one per storage class), or one record with an `error`
+    """
+    base = {'id': scenario['id'], 'type': scenario['type'], 'region': scenario['region']}
+    kind = scenario['type']
+    if kind == 'backup':
+        size_gb = _size_gb(scenario)
+        size_mb = helper.convert_storage_size(size_gb, 'GB', 'MB')
+        error = (scenarios.validate_backup(size_mb, scenario.get('storage_classes'))
+                 or price_sheet.validate_priced(sheet, scenario['storage_classes'], scenarios.BACKUP_DIMENSIONS))
+        if error is not None:
+            return [dict(base, error=error)]
+        parts, _ = scenarios.backup_parts(size_mb, float(scenario.get('mpu_size', 8)))
+        frequency = scenario.get('frequency', 'Daily')
+        df = scenarios.backup_costs(sheet, scenario['storage_classes'], size_gb, helper.get_frequency(frequency),
+                                    scenario.get('retention_days', helper.get_retention(frequency)['actual']), parts)
+        return scenarios.as_records(df, **base)
+    if kind == 'retrieval':
+        size_gb = _size_gb(scenario)
+        error = (scenarios.validate_retrieval(helper.convert_storage_size(size_gb, 'GB', 'MB'), scenario.get('storage_classes'))
+                 or price_sheet.validate_priced(sheet, scenario['storage_classes'], scenarios.RETRIEVAL_DIMENSIONS))
+        if error is not None:
+            return [dict(base, error=error)]
+        files = int(scenario.get('files', 1))
+        df = scenarios.retrieval_costs(sheet, scenario['storage_classes'], files, files * size_gb)
+        return scenarios.as_records(df, **base)
+    if kind == 'transition':
+        sizes = _size_histogram(scenario)
+        if sizes is None:
+            objects = float(scenario['objects'])
+            size_gb = objects * _size_gb(scenario)
+        else:
+            objects = float(scenario.get('objects', sizes.total_objects))
+            size_gb = objects * sizes.mean_object_gb
+        costs = scenarios.transition_costs(sheet, scenario['source'], scenario['target'], objects, size_gb,
+                                           int(scenario['days']), int(scenario['forecast']), sizes=sizes)
+        return [dict(base, storage_class=f"{scenario['source']} -> {scenario['target']}", **costs)]
+    if kind == 'lifecycle':
+        rule_chain = [(scenario['source'], 0)]
+        if scenario.get('target'):
+            rule_chain.append((scenario['target'], max(int(scenario.get('days', 30)), 1)))
+        sizes = _size_histogram(scenario)
+        costs = scenarios.lifecycle_costs(sheet, rule_chain, float(scenario['daily_objects']),
+                                          sizes if sizes is not None else _size_gb(scenario),
+                                          int(scenario.get('years', 1)) * 365, int(scenario.get('expiration', 0)) or None)
+        return [dict(base, storage_class=' -> '.join(name for name, _ in rule_chain), **costs)]
+    return [dict(base, error=f"Unknown scenario type {kind}")]
+
+
+def _evaluate_chunk(chunk, sheets):
+    # Runs in a worker process; a failing scenario is reported in its row instead of stopping the run
+    records = []
+    for scenario in chunk:
+        try:
+            records.extend(evaluate_scenario(scenario, sheets[scenario['region']]))
+        except (KeyError, ValueError, TypeError) as e:
+            records.append({'id': scenario.get('id'), 'type': scenario.get('type'), 'region': scenario.get('region'), 'error': str(e)})
+    return records
+
+
+def _peak_memory_mb():
+    # Peak resident set size of this process and of its (finished) worker processes
+    try:
+        import resource
+    except ImportError:
+        return None, None
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale)
+
+
+def run_batch(scenario_list, workers=None, chunk_size=CHUNK_SIZE):
+    """
+    Evaluate scenarios in a process pool. Price sheets of every region are fetched once here
+    and shipped to the workers with their chunk.
+
+    Returns:
+    (DataFrame of results, run report dict)
+    """
+    start = time.perf_counter()
+    regions = sorted({scenario['region'] for scenario in scenario_list})
+    sheets = {region: price_sheet.get_price_sheet(region) for region in regions}
+    prices_loaded = time.perf_counter()
+
+    chunks = [scenario_list[i:i + chunk_size] for i in range(0, len(scenario_list), chunk_size)]
+    records = []
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for chunk in chunks:
+            records.extend(_evaluate_chunk(chunk, sheets))
+    else:
+        # Spawned, not forked: the pricing client's thread pool is already running by now
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            futures = [executor.submit(_evaluate_chunk, chunk, {region: sheets[region] for region in {s['region'] for s in chunk}})
+                       for chunk in chunks]
+            for future in futures:
+                records.extend(future.result())
+    end = time.perf_counter()
+
+    results = pd.DataFrame.from_records(records)
+    peak_main, peak_workers = _peak_memory_mb()
+    report = {
+        'scenarios': len(scenario_list),
+        'result_rows': len(results),
+        'errors': int(results['error'].notna().sum()) if 'error' in results else 0,
+        'regions': len(regions),
+        'workers': workers,
+        'price_load_seconds': prices_loaded - start,
+        'evaluation_seconds': end - prices_loaded,
+        'scenarios_per_second': len(scenario_list) / (end - prices_loaded) if end > prices_loaded else None,
+        'peak_memory_mb': peak_main,
+        'peak_worker_memory_mb': peak_workers,
+    }
+    return results, report
+
+
+def write_results(results, path):
+    if path.lower().endswith('.parquet'):
+        results.to_parquet(path, index=False)
+    else:
+        results.to_csv(path, index=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('scenarios', help='scenario file (.json, .yaml/.yml or .csv)')
+    parser.add_argument('-o', '--output', required=True, help='result file (.csv or .parquet)')
+    parser.add_argument('--workers', type=int, default=None, help='process pool size (default: number of CPUs)')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='scenarios per worker task')
+    args = parser.parse_args(argv)
+
+    results, report = run_batch(load_scenarios(args.scenarios), args.workers, args.chunk_size)
+    write_results(results, args.output)
+    print(json.dumps(report, indent=2), file=sys.stderr)
+    return 1 if report['errors'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,291 @@
+# catalog.py
+import csv
+import gzip
+import json
+import math
+import shutil
+import sys
+import urllib.request
+
+OFFER_FILE_URL = 'https://pricing.us-east-1.amazonaws.com/offers/v1.0/aws/AmazonS3/current/index.json'
+REGION_OFFER_FILE_URL = 'https://pricing.us-east-1.amazonaws.com/offers/v1.0/aws/AmazonS3/current/{region}/index.json'
+REGION_INDEX_URL = 'https://pricing.us-east-1.amazonaws.com/offers/v1.0/aws/AmazonS3/current/region_index.json'
+PRICING_HOST = 'https://pricing.us-east-1.amazonaws.com'
+
+# Product attributes used by the Price List filters in utils/pricing.s3_req_filters
+INDEX_FIELDS = ('regioncode', 'usagetype', 'group', 'operation', 'feecode')
+
+CHUNK_SIZE = 1 << 20
+
+_decoder = json.JSONDecoder()
+
+
+def normalize_field(field):
+    """
+    Normalize a Price List attribute name so that the API filter field ('usageType'),
+    the JSON offer attribute ('usagetype') and the CSV column ('Region Code') line up.
+    """
+    return field.replace(' ', '').lower()
+
+
+def parse_range(value):
+    if value in (None, '', 'Inf'):
+        return math.inf
+    return float(value)
+
+
+def parse_price_dimension(rate_value):
+    """
+    Convert a priceDimensions entry from the Price List into a (begin, end, rate, unit, description) tuple.
+    """
+    return (
+        parse_range(rate_value.get('beginRange', '0')),
+        parse_range(rate_value.get('endRange', 'Inf')),
+        float(rate_value['pricePerUnit']['USD']),
+        rate_value.get('unit', ''),
+        rate_value.get('description', ''),
+    )
+
+
+class PriceCatalog:
+    """
+    In-memory S3 price catalog indexed on the attributes the Price List filters use.
+    Each product maps to its OnDemand price dimensions sorted by beginRange.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.publication_date = None
+        self.attributes = {}
+        self.prices = {}
+        self.index = {}
+
+    def __len__(self):
+        return len(self.attributes)
+
+    def add_product(self, sku, attributes):
+        indexed = {}
+        for field, value in attributes.items():
+            field = normalize_field(field)
+            if field in INDEX_FIELDS and value:
+                indexed[field] = value
+                self.index.setdefault((field, value), set()).add(sku)
+        self.attributes[sku] = indexed
+
+    def add_price(self, sku, price_dimension):
+        dimensions = self.prices.setdefault(sku, [])
+        dimensions.append(price_dimension)
+        dimensions.sort(key=lambda dimension: dimension[0])
+
+    def find(self, filters):
+        """
+        Return the SKUs matching every TERM_MATCH filter, in a stable order.
+        """
+        matches = None
+        for item in filters:
+            field = normalize_field(item['Field'])
+            if field not in INDEX_FIELDS:
+                raise ValueError(f"Price catalog is not indexed on field '{item['Field']}'")
+            skus = self.index.get((field, item['Value']), set())
+            matches = skus if matches is None else matches & skus
+            if not matches:
+                return []
+        return sorted(sku for sku in (matches or ()) if sku in self.prices)
+
+    def lookup(self, filters):
+        """
+        Return the price dimensions of the first product matching the filters, or None.
+        """
+        skus = self.find(filters)
+        if not skus:
+            return None
+        return self.prices[skus[0]]
+
+
+class _JsonStream:
+    # Incremental reader for the offer file, decoding one member at a time
+    def __init__(self, fp, chunk_size=CHUNK_SIZE):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        if self.eof:
+            return False
+        chunk = self.fp.read(self.chunk_size)
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        if not chunk:
+            self.eof = True
+            return False
+        return True
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                raise ValueError('Unexpected end of offer file')
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected '{char}' in offer file at offset {self.pos}")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                obj, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number at the end of the buffer may have been cut in half
+            if end == len(self.buf) and self._fill():
+                continue
+            self.pos = end
+            return obj
+
+    def members(self):
+        """
+        Yield the keys of the object at the current position. The caller must consume
+        each member's value (value() or members()) before asking for the next key.
+        """
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            yield key
+            separator = self.peek()
+            self.pos += 1
+            if separator == '}':
+                return
+            if separator != ',':
+                raise ValueError(f"Malformed object in offer file at offset {self.pos}")
+
+
+def _open_text(path):
+    if str(path).endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, 'r', encoding='utf-8', newline='')
+
+
+def load_offer_json(path):
+    """
+    Build a PriceCatalog from a JSON bulk offer file without loading the whole file into memory.
+    """
+    price_catalog = PriceCatalog()
+    with _open_text(path) as fp:
+        stream = _JsonStream(fp)
+        for key in stream.members():
+            if key == 'products':
+                for sku in stream.members():
+                    product = stream.value()
+                    price_catalog.add_product(sku, product.get('attributes', {}))
+            elif key == 'terms':
+                for term_type in stream.members():
+                    if term_type != 'OnDemand':
+                        stream.value()
+                        continue
+                    for sku in stream.members():
+                        for term in stream.value().values():
+                            for rate_value in term['priceDimensions'].values():
+                                if 'USD' in rate_value.get('pricePerUnit', {}):
+                                    price_catalog.add_price(sku, parse_price_dimension(rate_value))
+            elif key == 'version':
+                price_catalog.version = stream.value()
+            elif key == 'publicationDate':
+                price_catalog.publication_date = stream.value()
+            else:
+                stream.value()
+    return price_catalog
+
+
+def load_offer_csv(path):
+    """
+    Build a PriceCatalog from a CSV bulk offer file, one row at a time.
+    """
+    price_catalog = PriceCatalog()
+    with _open_text(path) as fp:
+        reader = csv.reader(fp)
+        header = None
+        for row in reader:
+            if header is None:
+                # Preamble rows hold the offer metadata until the column header
+                if not row:
+                    continue
+                if row[0] == 'SKU':
+                    header = [normalize_field(column) for column in row]
+                    columns = {column: i for i, column in enumerate(header)}
+                    attribute_columns = [(header[i], i) for i in range(len(header)) if header[i] in INDEX_FIELDS]
+                elif row[0] == 'Version':
+                    price_catalog.version = row[1]
+                elif row[0] == 'Publication Date':
+                    price_catalog.publication_date = row[1]
+                continue
+
+            if row[columns['termtype']] != 'OnDemand' or row[columns['currency']] != 'USD':
+                continue
+            sku = row[columns['sku']]
+            if sku not in price_catalog.attributes:
+                price_catalog.add_product(sku, {field: row[i] for field, i in attribute_columns})
+            price_catalog.add_price(sku, (
+                parse_range(row[columns['startingrange']]),
+                parse_range(row[columns['endingrange']]),
+                float(row[columns['priceperunit']]),
+                row[columns['unit']],
+                row[columns['pricedescription']],
+            ))
+    return price_catalog
+
+
+def load_offer_file(path):
+    if str(path).endswith(('.csv', '.csv.gz')):
+        return load_offer_csv(path)
+    return load_offer_json(path)
+
+
+def download_url(url, dest):
+    with urllib.request.urlopen(url) as response, open(dest, 'wb') as out:
+        shutil.copyfileobj(response, out, CHUNK_SIZE)
+    return dest
+
+
+def download_offer_file(dest, region=None):
+    """
+    Download the AmazonS3 bulk offer file (all regions, or a single region) to dest.
+    """
+    url = REGION_OFFER_FILE_URL.format(region=region) if region else OFFER_FILE_URL
+    return download_url(url, dest)
+
+
+def fetch_region_index():
+    """
+    Current offer version of every region, from the AmazonS3 region index.
+
+    Returns:
+    {region: (version, offer file URL)}; the version is the publication id in the offer file URL
+    (e.g. /offers/v1.0/aws/AmazonS3/20240501120000/us-east-1/index.json), so a region whose
+    version did not change does not need to be downloaded again.
+    """
+    with urllib.request.urlopen(REGION_INDEX_URL) as response:
+        region_index = json.load(response)
+    versions = {}
+    for region, entry in region_index.get('regions', {}).items():
+        url = entry['currentVersionUrl']
+        versions[region] = (url.rstrip('/').split('/')[-3], PRICING_HOST + url)
+    return versions
+
+
+if __name__ == "__main__":
+    # python -m utils.catalog <offer file>
+    loaded = load_offer_file(sys.argv[1])
+    print(f"Loaded {len(loaded)} products, version {loaded.version}, published {loaded.publication_date}")
@@ -0,0 +1,156 @@
+# cost_kernel.py
+from collections import namedtuple
+
+import numpy as np
+import utils.helper as helper
+import utils.price_sheet as price_sheet
+
+# Column indices of a PriceSheet table
+PUT, STORAGE, GET, RETRIEVAL, RETRIEVAL_REQ, TRANSITION = (price_sheet.DIMENSION_INDEX[dimension] for dimension in price_sheet.DIMENSIONS)
+
+DAYS_PER_MONTH = 30
+STANDARD = price_sheet.CLASS_INDEX['STANDARD']
+
+# Minimum storage duration per class, in PriceSheet row order
+MIN_STORAGE_DAYS = np.array([helper.get_prorated(name) for name in price_sheet.STORAGE_CLASS_NAMES], dtype=float)
+
+# Multipart uploads to these classes pay S3 Standard PUT pricing for the parts and the class PUT price for completion
+STANDARD_PART_PRICING = np.isin(price_sheet.STORAGE_CLASSES, ['GLACIER', 'DEEP_ARCHIVE'])
+
+# Per-object billing rules, in PriceSheet row order: objects smaller than MIN_BILLABLE_GB are billed
+# as that size, and every object adds OVERHEAD_GB at the class rate and STANDARD_OVERHEAD_GB of
+# metadata at the S3 Standard rate (the index and metadata of S3 Glacier Flexible Retrieval and Deep Archive)
+MIN_BILLABLE_GB = np.where(np.isin(price_sheet.STORAGE_CLASSES, ['STANDARD_IA', 'ONEZONE_IA', 'GLACIER_IR']),
+                           helper.convert_storage_size(128, 'KB', 'GB'), 0.0)
+OVERHEAD_GB = np.where(STANDARD_PART_PRICING, helper.convert_storage_size(32, 'KB', 'GB'), 0.0)
+STANDARD_OVERHEAD_GB = np.where(STANDARD_PART_PRICING, helper.convert_storage_size(8, 'KB', 'GB'), 0.0)
+
+
+class CostComponents(namedtuple('CostComponents', ['storage', 'request', 'retrieval', 'transition', 'early_deletion'])):
+    """
+    Cost components of a batch of scenarios, each a float array of the broadcast input shape.
+    """
+    __slots__ = ()
+
+    @property
+    def total(self):
+        return self.storage + self.request + self.retrieval + self.transition + self.early_deletion
+
+    def as_dict(self):
+        return dict(self._asdict(), total=self.total)
+
+
+def _prices(table, storage_class, column):
+    # A stack of tables (e.g. price versions, see utils/price_history.py) adds a leading axis to the result
+    return table[..., np.asarray(storage_class, dtype=np.intp), column]
+
+
+def _standard_prices(table, column, like):
+    # The S3 Standard price of each table, shaped to broadcast against `like` (a _prices result)
+    return table[..., STANDARD, column].reshape(np.shape(table)[:-2] + (1,) * (np.ndim(like) - np.ndim(table) + 2))
+
+
+# Function to get the GB billed at the class rate and at the S3 Standard rate for `objects` objects totalling size_gb
+def billable_gb(storage_class, size_gb, objects):
+    """
+    Applies the per-object rules to aggregates: exact when the objects are all at or above, or
+    all below, the minimum billable size, e.g. one bucket of a size histogram with an edge at
+    128 KB (see utils/object_sizes.py).
+
+    Returns:
+    (GB billed at the class rate, GB billed at the S3 Standard rate)
+    """
+    storage_class = np.asarray(storage_class, dtype=np.intp)
+    objects = np.asarray(objects, dtype=float)
+    class_gb = np.maximum(np.asarray(size_gb, dtype=float), objects * MIN_BILLABLE_GB[storage_class]) + objects * OVERHEAD_GB[storage_class]
+    return class_gb, objects * STANDARD_OVERHEAD_GB[storage_class]
+
+
+# Function to compute storage cost for size_gb kept for days, at the class rate (or a blended tier rate);
+# with objects, the per-object minimum billable size and overhead apply (see billable_gb)
+def storage_cost(table, storage_class, size_gb, days, storage_rate=None, objects=None):
+    class_rate = _prices(table, storage_class, STORAGE)
+    rate = class_rate if storage_rate is None else np.asarray(storage_rate, dtype=float)
+    days = np.asarray(days, dtype=float)
+    if objects is None:
+        return rate / DAYS_PER_MONTH * np.asarray(size_gb, dtype=float) * days
+    class_gb, standard_gb = billable_gb(storage_class, size_gb, objects)
+    return (rate * class_gb + _standard_prices(table, STORAGE, class_rate) * standard_gb) / DAYS_PER_MONTH * days
+
+# Function to compute the pro-rated charge for objects removed before the minimum storage duration
+# (on the GB billed at the class rate; the S3 Standard metadata has no minimum duration)
+def early_deletion_cost(table, storage_class, size_gb, days, storage_rate=None, min_days=MIN_STORAGE_DAYS, objects=None):
+    remaining_days = np.maximum(min_days[np.asarray(storage_class, dtype=np.intp)] - np.asarray(days, dtype=float), 0.0)
+    if objects is not None:
+        size_gb, _ = billable_gb(storage_class, size_gb, objects)
+    return storage_cost(table, storage_class, size_gb, remaining_days, storage_rate)
+
+# Function to compute PUT cost; with put_parts, each object is a multipart upload of that many parts
+# (priced by multipart_put_cost), or a single PUT where put_parts is 0
+def put_cost(table, storage_class, objects, put_parts=None):
+    objects = np.asarray(objects, dtype=float)
+    if put_parts is None:
+        return objects * _prices(table, storage_class, PUT)
+    put_parts = np.asarray(put_parts, dtype=float)
+    multipart = put_parts > 0
+    return objects * multipart_put_cost(table, storage_class, ~multipart, multipart, put_parts)
+
+# Function to compute the cost of single PUTs and multipart uploads (CreateMultipartUpload, UploadPart, CompleteMultipartUpload);
+# the create and part requests of S3 Glacier Flexible Retrieval and Deep Archive uploads are at S3 Standard pricing
+def multipart_put_cost(table, storage_class, single_puts, uploads, upload_parts):
+    class_put = _prices(table, storage_class, PUT)
+    standard_put = _standard_prices(table, PUT, class_put)
+    part_put = np.where(STANDARD_PART_PRICING[np.asarray(storage_class, dtype=np.intp)], standard_put, class_put)
+    uploads = np.asarray(uploads, dtype=float)
+    return (np.asarray(single_puts, dtype=float) + uploads) * class_put + (uploads + np.asarray(upload_parts, dtype=float)) * part_put
+
+# Function to compute GET request cost (GET prices are per 1000 requests)
+def get_request_cost(table, storage_class, get_requests):
+    return np.asarray(get_requests, dtype=float) / 1000 * _prices(table, storage_class, GET)
+
+# Function to compute data retrieval cost per GB retrieved
+def retrieval_cost(table, storage_class, retrieved_gb):
+    return np.asarray(retrieved_gb, dtype=float) * _prices(table, storage_class, RETRIEVAL)
+
+# Function to compute restore request cost (per 1000 requests)
+def restore_request_cost(table, storage_class, restore_requests):
+    return np.asarray(restore_requests, dtype=float) / 1000 * _prices(table, storage_class, RETRIEVAL_REQ)
+
+# Function to compute lifecycle transition cost into the class (per 1000 requests)
+def transition_cost(table, storage_class, transition_requests):
+    return np.asarray(transition_requests, dtype=float) / 1000 * _prices(table, storage_class, TRANSITION)
+
+
+def cost_components(table, storage_class, size_gb=0.0, days=0.0, objects=0.0, put_parts=None, get_requests=0.0,
+                    retrieved_gb=0.0, restore_requests=0.0, transition_requests=0.0, removed=False,
+                    storage_rate=None, min_days=MIN_STORAGE_DAYS, stored_objects=None):
+    """
+    Evaluate every cost component for arrays of scenarios in one vectorized pass.
+
+    Parameters:
+    table (ndarray): dense PriceSheet table (storage class x dimension), or a stack of them
+        (... x storage class x dimension) to price every scenario under each table at once.
+    storage_class (array-like of int): PriceSheet row index of each scenario.
+    size_gb, days: GB stored and days stored in the class.
+    objects: objects uploaded with PUT (or multipart uploads when put_parts is given).
+    put_parts: parts per multipart upload, counted with its create and complete requests; 0 is a single PUT.
+    get_requests, retrieved_gb, restore_requests, transition_requests: request and retrieval volumes.
+    removed (bool array-like): whether the data leaves the class after `days` (deleted or transitioned),
+        in which case the minimum storage duration applies.
+    storage_rate: per GB-month rate overriding the table, e.g. a blended tier rate.
+    stored_objects: objects making up size_gb, to bill the per-object minimum size and overhead
+        (see billable_gb); None bills size_gb as is. Pass one entry per size histogram bucket
+        on an extra axis and sum over it to price a histogram.
+
+    All array arguments broadcast against each other.
+
+    Returns:
+    CostComponents: storage, request, retrieval, transition and early_deletion float arrays.
+    """
+    storage = storage_cost(table, storage_class, size_gb, days, storage_rate, stored_objects)
+    request = put_cost(table, storage_class, objects, put_parts) + get_request_cost(table, storage_class, get_requests)
+    retrieval = retrieval_cost(table, storage_class, retrieved_gb) + restore_request_cost(table, storage_class, restore_requests)
+    transition = transition_cost(table, storage_class, transition_requests)
+    early_deletion = np.where(removed, early_deletion_cost(table, storage_class, size_gb, days, storage_rate, min_days, stored_objects), 0.0)
+    shape = np.broadcast_shapes(*(np.shape(component) for component in (storage, request, retrieval, transition, early_deletion)))
+    return CostComponents(*(np.broadcast_to(component, shape).astype(float) for component in (storage, request, retrieval, transition, early_deletion)))
@@ -0,0 +1,183 @@
+# gfs.py
+"""
+Grandfather-father-son backup retention timeline.
+
+Daily, weekly, monthly and yearly backup sets coexist, each with its own schedule, retention
+and target storage class. Copies retained by every set are tracked per day with difference
+arrays (a copy is added on its backup day and removed on its expiry day, then cumsum), so a
+multi-year horizon costs a handful of array operations per set rather than a loop per backup.
+"""
+from collections import namedtuple
+
+import numpy as np
+import utils.cost_kernel as cost_kernel
+import utils.helper as helper
+import utils.price_sheet as price_sheet
+import utils.scenarios as scenarios
+
+DAYS_PER_YEAR = 365
+
+
+class BackupSet(namedtuple('BackupSet', ['name', 'every_days', 'retention_days', 'storage_class', 'size_fraction', 'level'])):
+    """
+    One set of a GFS schedule: a backup every `every_days` days kept for `retention_days` in
+    `storage_class` (display name). size_fraction is the share of the protected data each
+    backup stores (1.0 for full backups). When two sets are due on the same day, only the set
+    with the highest level takes the backup if overlaps are promoted.
+    """
+    __slots__ = ()
+
+
+DEFAULT_SCHEDULE = [
+    BackupSet('Daily', 1, 7, 'S3 Standard', 1.0, 0),
+    BackupSet('Weekly', 7, 35, 'S3 Standard - Infrequent Access', 1.0, 1),
+    BackupSet('Monthly', 30, 365, 'S3 Glacier Flexible Retrieval', 1.0, 2),
+    BackupSet('Yearly', 365, 7 * 365, 'S3 Glacier Deep Archive', 1.0, 3),
+]
+
+
+class GFSResult:
+    """
+    Daily state and cost of every backup set, each array (days, sets) in schedule order.
+    """
+
+    def __init__(self, schedule, copies, stored_gb, storage, request, early_deletion):
+        self.schedule = schedule
+        self.copies = copies
+        self.stored_gb = stored_gb
+        self.storage = storage
+        self.request = request
+        self.early_deletion = early_deletion
+
+    @property
+    def set_names(self):
+        return [backup_set.name for backup_set in self.schedule]
+
+    @property
+    def daily_cost(self):
+        return self.storage + self.request + self.early_deletion
+
+    @property
+    def total(self):
+        return float(self.daily_cost.sum())
+
+    def components(self):
+        return {
+            'Storage': float(self.storage.sum()),
+            'PUT requests': float(self.request.sum()),
+            'Pro-rated fee': float(self.early_deletion.sum()),
+        }
+
+    def cost_by_set(self):
+        return dict(zip(self.set_names, self.daily_cost.sum(axis=0)))
+
+    def yearly_cost(self):
+        """
+        Cost per 365-day year and backup set, shape (years, sets).
+        """
+        days, sets = self.daily_cost.shape
+        years = -(-days // DAYS_PER_YEAR)
+        padded = np.zeros((years * DAYS_PER_YEAR, sets))
+        padded[:days] = self.daily_cost
+        return padded.reshape(years, DAYS_PER_YEAR, sets).sum(axis=1)
+
+
+# Function to validate a GFS schedule; returns an error message, or None if valid
+def validate_schedule(schedule):
+    if not schedule:
+        return "Please enable at least one backup set"
+    for backup_set in schedule:
+        if backup_set.every_days < 1:
+            return f"{backup_set.name} backups must be taken at least one day apart"
+        if backup_set.retention_days < 1:
+            return f"{backup_set.name} backups must be retained for at least one day"
+        if backup_set.storage_class not in price_sheet.CLASS_INDEX:
+            return f"Unknown storage class {backup_set.storage_class}"
+    return None
+
+
+def backup_days(schedule, horizon_days, promote=True):
+    """
+    (days, sets) boolean array of the days each set takes a backup. With promote, a day due in
+    several sets only backs up in the highest-level one (the weekly backup is not also a daily copy).
+    """
+    days = np.arange(horizon_days)
+    due = np.column_stack([days % backup_set.every_days == 0 for backup_set in schedule])
+    if not promote:
+        return due
+    levels = np.array([backup_set.level for backup_set in schedule])
+    top_level = np.where(due, levels, -1).max(axis=1, keepdims=True)
+    return due & (levels == top_level)
+
+
+def _shifted(values, shift, horizon):
+    # values[t - shift] for t in range(horizon), zero where t - shift < 0
+    out = np.zeros(horizon)
+    if shift < horizon:
+        out[shift:] = values[:horizon - shift]
+    return out
+
+
+def simulate_gfs(sheet, schedule, size_gb, horizon_days, growth_rate=0.0, mpu_size_mb=8, promote=True,
+                 min_days=cost_kernel.MIN_STORAGE_DAYS):
+    """
+    Simulate a GFS schedule day by day.
+
+    Parameters:
+    sheet (PriceSheet): prices of the region; storage uses the tier ladder of each class's total volume.
+    schedule (list): BackupSet entries.
+    size_gb (float): size of the protected data on day 0.
+    horizon_days (int): number of days to simulate.
+    growth_rate (float): yearly growth of the protected data, compounded daily (0.2 = +20% a year).
+    mpu_size_mb (float): multipart upload part size; grows to fit when a backup would need over 10,000 parts.
+    promote (bool): see backup_days.
+    min_days (array): minimum storage duration per class, in PriceSheet row order.
+
+    Returns:
+    GFSResult
+    """
+    error = validate_schedule(schedule) or price_sheet.validate_priced(sheet, [backup_set.storage_class for backup_set in schedule],
+                                                                       scenarios.BACKUP_DIMENSIONS)
+    if error is not None:
+        raise ValueError(error)
+
+    horizon = int(horizon_days)
+    days = np.arange(horizon)
+    protected_gb = size_gb * (1 + growth_rate) ** (days / DAYS_PER_YEAR)
+    taken = backup_days(schedule, horizon, promote)
+    class_idx = price_sheet.class_indices([backup_set.storage_class for backup_set in schedule])
+
+    copies = np.zeros((horizon, len(schedule)))
+    stored_gb = np.zeros((horizon, len(schedule)))
+    request = np.zeros((horizon, len(schedule)))
+    early_deletion = np.zeros((horizon, len(schedule)))
+
+    for j, backup_set in enumerate(schedule):
+        backup_gb = np.where(taken[:, j], protected_gb * backup_set.size_fraction, 0.0)
+        retention = int(backup_set.retention_days)
+
+        # Difference arrays: +copy on the backup day, -copy on the day it expires
+        added_copies = taken[:, j].astype(float)
+        expired_gb = _shifted(backup_gb, retention, horizon)
+        copies[:, j] = np.cumsum(added_copies - _shifted(added_copies, retention, horizon))
+        stored_gb[:, j] = np.cumsum(backup_gb - expired_gb)
+
+        # Every backup is one multipart upload
+        backup_mb = helper.convert_storage_size(backup_gb, 'GB', 'MB')
+        parts = scenarios.upload_parts(backup_mb, mpu_size_mb)
+        request[:, j] = cost_kernel.put_cost(sheet.table, class_idx[j], taken[:, j], put_parts=parts)
+
+        # Copies expiring before the minimum storage duration pay the remaining days when they are deleted
+        early_deletion[:, j] = cost_kernel.early_deletion_cost(sheet.table, class_idx[j], expired_gb, retention, min_days=min_days,
+                                                               objects=_shifted(added_copies, retention, horizon))
+
+    # Storage is priced on the tier ladder of each class's total volume, then split across its sets by volume
+    class_gb = np.zeros((horizon, len(price_sheet.STORAGE_CLASSES)))
+    np.add.at(class_gb.T, class_idx, stored_gb.T)
+    rates = sheet.blended_storage_rate(price_sheet.STORAGE_CLASSES, class_gb)
+    # Every copy is one object, billed with the per-object overhead of its class
+    billed_gb, standard_gb = cost_kernel.billable_gb(class_idx, stored_gb, copies)
+    storage = (billed_gb * rates[:, class_idx] / cost_kernel.DAYS_PER_MONTH
+               + cost_kernel.storage_cost(sheet.table, cost_kernel.STANDARD, standard_gb, 1))
+
+    return GFSResult(schedule, copies, stored_gb, storage, request, early_deletion)
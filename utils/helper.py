@@ -1,5 +1,4 @@
 # utils.py 
-import plotly.express as px  # interactive charts
 import math
 
 def convert_storage_size(size, from_unit, to_unit):
@@ -0,0 +1,198 @@
+# intelligent_tiering.py
+import numpy as np
+import utils.helper as helper
+import utils.object_sizes as object_sizes
+import utils.price_store as price_store
+import utils.pricing as pricing
+from utils.cache import TTLCache
+
+# Access tiers in the order objects move down through them
+TIERS = ['frequent', 'infrequent', 'instant', 'archive', 'deep']
+TIER_INDEX = {tier: i for i, tier in enumerate(TIERS)}
+
+# Consecutive days without access before an object moves to the tier; archive tiers are opt-in
+DEFAULT_TRANSITION_DAYS = {
+    'frequent': 0,
+    'infrequent': 30,
+    'instant': 90,
+    'archive': None,
+    'deep': None
+}
+
+# Objects smaller than this are not monitored, never leave the Frequent Access tier and pay no monitoring fee
+MONITORING_THRESHOLD_GB = helper.convert_storage_size(128, 'KB', 'GB')
+
+DAYS_PER_MONTH = 30
+
+
+class IntPrices:
+    """
+    Intelligent-Tiering prices of a region: storage per GB-month of each tier (TIERS order)
+    and the monitoring and automation fee per object-month.
+
+    Prices the Price List has no product for are 0.0 and flagged False in `available`
+    (TIERS order, then monitoring); check `unpriced` (or validate_int_priced) before
+    pricing a scenario, so a missing price is never shown as free.
+    """
+
+    def __init__(self, region, storage, monitoring, available=None):
+        self.region = region
+        self.storage = np.asarray(storage, dtype=float)
+        self.monitoring = float(monitoring)
+        if available is None:
+            available = np.ones(len(TIERS) + 1, dtype=bool)
+        self.available = np.asarray(available, dtype=bool)
+
+    @classmethod
+    def fetch(cls, region):
+        filters_list = [pricing.build_int_price_filter(tier, region) for tier in TIERS + ['monitoring']]
+        prices = pricing.get_s3_pricing_batch(filters_list)
+        available = [price is not None for price in prices]
+        prices = [price if price is not None else 0.0 for price in prices]
+        return cls(region, prices[:-1], prices[-1], available)
+
+    def unpriced(self, tiers, monitoring=True):
+        """
+        The tiers (and 'monitoring', if it is charged) missing a price in this region.
+        """
+        missing = [tier for tier in tiers if not self.available[TIER_INDEX[tier]]]
+        if monitoring and not self.available[-1]:
+            missing.append('monitoring')
+        return missing
+
+
+int_prices = TTLCache(maxsize=len(pricing.region_code), ttl=pricing.price_cache.ttl)
+
+# Function to get the (cached) Intelligent-Tiering prices of a region
+def get_int_prices(region):
+    # Picks up a refreshed price store first, which clears the cached prices
+    price_store.snapshot()
+    return int_prices.get_or_compute(region, lambda: IntPrices.fetch(region))
+
+
+class IntResult:
+    """
+    Daily Intelligent-Tiering state: stored_gb and storage cost per tier (days, tiers),
+    and the monitoring fee per day.
+    """
+
+    def __init__(self, stored_gb, storage, monitoring, monitored_objects):
+        self.stored_gb = stored_gb
+        self.storage = storage
+        self.monitoring = monitoring
+        self.monitored_objects = monitored_objects
+
+    @property
+    def daily_cost(self):
+        return self.storage.sum(axis=1) + self.monitoring
+
+    @property
+    def total(self):
+        return float(self.daily_cost.sum())
+
+    def cost_by_tier(self):
+        return dict(zip(TIERS, self.storage.sum(axis=0)))
+
+    def monthly_cost(self):
+        """
+        Storage cost per tier and monitoring fee per 30-day month, shape (months, tiers + 1).
+        """
+        daily = np.column_stack([self.storage, self.monitoring])
+        days = daily.shape[0]
+        months = -(-days // DAYS_PER_MONTH)
+        padded = np.zeros((months * DAYS_PER_MONTH, daily.shape[1]))
+        padded[:days] = daily
+        return padded.reshape(months, DAYS_PER_MONTH, daily.shape[1]).sum(axis=1)
+
+
+# Function to resolve the transition day of every tier, None for tiers that are not enabled
+def transition_schedule(archive_days=None, deep_days=None, bypass_instant=False):
+    schedule = dict(DEFAULT_TRANSITION_DAYS)
+    schedule['archive'] = archive_days
+    schedule['deep'] = deep_days
+    if bypass_instant:
+        schedule['instant'] = None
+    return schedule
+
+
+# Function to list the tiers data passes through on its way to the tiers it settles in
+def tiers_used(tier_fractions, schedule):
+    if isinstance(tier_fractions, dict):
+        tier_fractions = [tier_fractions.get(tier, 0.0) for tier in TIERS]
+    deepest = max([k for k, fraction in enumerate(tier_fractions) if fraction], default=0)
+    return [tier for tier in TIERS[:deepest + 1] if schedule.get(tier) is not None]
+
+
+# Function to validate that every price a scenario needs is available; returns an error message, or None
+def validate_int_priced(prices, tier_fractions, schedule, monitored=True):
+    unpriced = prices.unpriced(tiers_used(tier_fractions, schedule), monitored)
+    if unpriced:
+        return f"No Intelligent-Tiering prices found in {prices.region} for {', '.join(unpriced)}"
+    return None
+
+
+# Function to derive tier fractions from a distribution of days since last access
+def fractions_from_access_ages(ages_days, weights, schedule):
+    """
+    Share of data that settles in each tier, given how long ago it was last accessed.
+    Data sits in the deepest enabled tier whose transition day it has reached.
+    """
+    ages_days = np.asarray(ages_days, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+    enabled = [TIER_INDEX[tier] for tier in TIERS if schedule.get(tier) is not None]
+    thresholds = np.array([schedule[TIERS[i]] for i in enabled], dtype=float)
+    tier_of_age = np.array(enabled)[np.searchsorted(thresholds, ages_days, side='right') - 1]
+    fractions = np.bincount(tier_of_age, weights=weights, minlength=len(TIERS))
+    return fractions / fractions.sum() if fractions.sum() > 0 else fractions
+
+
+def simulate_intelligent_tiering(prices, tier_fractions, objects, object_size_gb, horizon_days, schedule):
+    """
+    Simulate tier movement of a bucket uploaded on day 0 to Intelligent-Tiering.
+
+    Parameters:
+    prices (IntPrices): region prices.
+    tier_fractions (dict or array): share of objects whose access pattern settles in each tier.
+    objects (float): number of objects, any magnitude (only aggregates are simulated).
+    object_size_gb (float or SizeHistogram): average object size in GB, or the size distribution
+        of the objects; buckets of objects under the monitoring threshold stay in Frequent Access.
+    horizon_days (int): number of days to simulate.
+    schedule (dict): transition day of each tier, see transition_schedule.
+
+    Returns:
+    IntResult
+
+    Raises ValueError if a tier that holds data, or the monitoring fee, has no price in the region.
+    """
+    if isinstance(tier_fractions, dict):
+        tier_fractions = [tier_fractions.get(tier, 0.0) for tier in TIERS]
+    fractions = np.asarray(tier_fractions, dtype=float)
+    horizon = int(horizon_days)
+    days = np.arange(horizon)
+
+    # Objects under the monitoring threshold stay in Frequent Access and pay no monitoring fee
+    sizes = object_sizes.as_histogram(object_size_gb, objects)
+    monitored = sizes.average_gb >= MONITORING_THRESHOLD_GB
+    monitored_gb = float(sizes.size_gb[monitored].sum())
+    monitored_objects = float(sizes.objects[monitored].sum())
+    stored_gb = np.zeros((horizon, len(TIERS)))
+    stored_gb[:, TIER_INDEX['frequent']] = sizes.total_gb - monitored_gb
+
+    if monitored_gb > 0:
+        # Objects heading for tier k step down through every enabled tier above it as they age
+        enabled = [TIER_INDEX[tier] for tier in TIERS if schedule.get(tier) is not None]
+        thresholds = np.array([schedule[TIERS[i]] for i in enabled], dtype=float)
+        for k, fraction in enumerate(fractions):
+            if fraction == 0:
+                continue
+            reachable = [j for j in range(len(enabled)) if enabled[j] <= k]
+            current = np.array(enabled)[np.searchsorted(thresholds[reachable], days, side='right') - 1]
+            np.add.at(stored_gb, (days, current), fraction * monitored_gb)
+
+    unpriced = prices.unpriced([tier for tier in TIERS if stored_gb[:, TIER_INDEX[tier]].any()], monitored_objects > 0)
+    if unpriced:
+        raise ValueError(f"No Intelligent-Tiering prices found in {prices.region} for {', '.join(unpriced)}")
+
+    storage = stored_gb * prices.storage / DAYS_PER_MONTH
+    monitoring = np.full(horizon, monitored_objects * prices.monitoring / DAYS_PER_MONTH)
+    return IntResult(stored_gb, storage, monitoring, monitored_objects)
@@ -0,0 +1,290 @@
+# inventory.py
+"""
+S3 Inventory ingestion: reads a manifest.json and its CSV/ORC/Parquet data files from local
+disk, in chunks and in parallel, into compact per-storage-class histograms of object size and
+age that the cost kernels consume directly.
+
+ORC and Parquet need pyarrow, which is only imported when such an inventory is read.
+"""
+import datetime
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import utils.price_sheet as price_sheet
+
+# Storage classes of the histograms: the PriceSheet rows, then anything else (RRS, OUTPOSTS, ...)
+CLASS_NAMES = price_sheet.STORAGE_CLASSES + ['OTHER']
+CLASS_CODES = {code: i for i, code in enumerate(price_sheet.STORAGE_CLASSES)}
+OTHER = len(CLASS_NAMES) - 1
+
+# Size bins are powers of two in bytes: bin b holds sizes in [2^(b-1), 2^b), bin 0 holds empty objects
+SIZE_BINS = 44
+SIZE_EDGES = np.concatenate([[0.0], 2.0 ** np.arange(SIZE_BINS)])
+
+# Age bins in days since last modified, measured from the inventory creation time
+AGE_EDGES = np.array([0, 7, 30, 60, 90, 120, 180, 270, 365, 548, 730, 1095, 1825, 3650, np.inf])
+AGE_BINS = len(AGE_EDGES) - 1
+
+CHUNK_ROWS = 1_000_000
+
+# Column names in the CSV fileSchema, and their ORC/Parquet equivalents
+SIZE_COLUMN = ('Size', 'size')
+LAST_MODIFIED_COLUMN = ('LastModifiedDate', 'last_modified_date')
+STORAGE_CLASS_COLUMN = ('StorageClass', 'storage_class')
+DELETE_MARKER_COLUMN = ('IsDeleteMarker', 'is_delete_marker')
+
+
+class InventorySummary:
+    """
+    Object count and bytes per (storage class, size bin, age bin).
+    """
+
+    def __init__(self, counts=None, bytes=None, creation_date=None):
+        shape = (len(CLASS_NAMES), SIZE_BINS, AGE_BINS)
+        self.counts = np.zeros(shape) if counts is None else counts
+        self.bytes = np.zeros(shape) if bytes is None else bytes
+        self.creation_date = creation_date
+
+    def __iadd__(self, other):
+        self.counts += other.counts
+        self.bytes += other.bytes
+        return self
+
+    @property
+    def total_objects(self):
+        return float(self.counts.sum())
+
+    @property
+    def total_bytes(self):
+        return float(self.bytes.sum())
+
+    def by_class(self):
+        """
+        {storage class: (objects, bytes)} for every class present in the inventory.
+        """
+        objects = self.counts.sum(axis=(1, 2))
+        sizes = self.bytes.sum(axis=(1, 2))
+        return {CLASS_NAMES[i]: (objects[i], sizes[i]) for i in np.flatnonzero(objects)}
+
+    def size_histogram(self, storage_class=None):
+        """
+        (object counts, bytes) per size bin, for one storage class code or the whole bucket.
+        """
+        index = slice(None) if storage_class is None else CLASS_NAMES.index(storage_class)
+        counts = self.counts[index].reshape(-1, SIZE_BINS, AGE_BINS).sum(axis=(0, 2))
+        sizes = self.bytes[index].reshape(-1, SIZE_BINS, AGE_BINS).sum(axis=(0, 2))
+        return counts, sizes
+
+    def average_object_size(self, storage_class=None):
+        counts, sizes = self.size_histogram(storage_class)
+        return sizes.sum() / counts.sum() if counts.sum() else 0.0
+
+    def kernel_inputs(self):
+        """
+        Non-empty histogram cells as flat arrays for utils/cost_kernel:
+        PriceSheet class index, objects, size in GB and age in days (lower edge of the age bin).
+        Objects in classes outside the PriceSheet are left out.
+        """
+        storage_class, size_bin, age_bin = np.nonzero(self.counts[:OTHER])
+        return {
+            'storage_class': storage_class,
+            'objects': self.counts[storage_class, size_bin, age_bin],
+            'size_gb': self.bytes[storage_class, size_bin, age_bin] / 1024 ** 3,
+            'age_days': AGE_EDGES[age_bin],
+        }
+
+
+def read_manifest(path):
+    with open(path, encoding='utf-8') as fp:
+        manifest = json.load(fp)
+    manifest['fileFormat'] = manifest.get('fileFormat', 'CSV').upper()
+    return manifest
+
+
+# Function to read the inventory creation date from the manifest (creationTimestamp is in epoch milliseconds)
+def manifest_creation_date(manifest):
+    timestamp = manifest.get('creationTimestamp')
+    if timestamp is None:
+        return datetime.date.today()
+    return datetime.datetime.fromtimestamp(int(timestamp) / 1000, datetime.timezone.utc).date()
+
+
+# Function to find a data file listed in the manifest on local disk
+def resolve_data_file(manifest_path, key, root=None):
+    manifest_dir = os.path.dirname(os.path.abspath(manifest_path))
+    candidates = [
+        os.path.join(root, key) if root else None,
+        os.path.join(manifest_dir, key),
+        os.path.join(manifest_dir, 'data', os.path.basename(key)),
+        os.path.join(os.path.dirname(manifest_dir), 'data', os.path.basename(key)),
+        os.path.join(manifest_dir, os.path.basename(key)),
+    ]
+    for candidate in candidates:
+        if candidate and os.path.exists(candidate):
+            return candidate
+    raise FileNotFoundError(f"Inventory data file {key} not found next to {manifest_path}")
+
+
+def _column(names, columns):
+    for name in names:
+        if name in columns:
+            return name
+    return None
+
+
+def _histogram_chunk(summary, sizes, last_modified_days, storage_classes, reference_day):
+    # sizes: float bytes, last_modified_days: datetime64[D], storage_classes: int codes
+    valid = ~np.isnan(sizes)
+    sizes = sizes[valid]
+    ages = (reference_day - last_modified_days[valid]).astype(np.int64)
+    classes = storage_classes[valid]
+
+    size_bin = np.zeros(sizes.shape, dtype=np.int64)
+    positive = sizes > 0
+    size_bin[positive] = np.minimum(np.floor(np.log2(sizes[positive])).astype(np.int64) + 1, SIZE_BINS - 1)
+    age_bin = np.clip(np.searchsorted(AGE_EDGES, np.maximum(ages, 0), side='right') - 1, 0, AGE_BINS - 1)
+
+    cell = np.ravel_multi_index((classes, size_bin, age_bin), summary.counts.shape)
+    summary.counts += np.bincount(cell, minlength=summary.counts.size).reshape(summary.counts.shape)
+    summary.bytes += np.bincount(cell, weights=sizes, minlength=summary.counts.size).reshape(summary.counts.shape)
+
+
+def _class_codes(values):
+    return np.array([CLASS_CODES.get(value, OTHER) for value in values], dtype=np.int64)
+
+
+def _summarize_csv(path, schema, reference_day, chunk_rows):
+    import pandas as pd
+
+    columns = [column.strip() for column in schema.split(',')]
+    wanted = {
+        'size': _column(SIZE_COLUMN, columns),
+        'last_modified': _column(LAST_MODIFIED_COLUMN, columns),
+        'storage_class': _column(STORAGE_CLASS_COLUMN, columns),
+        'delete_marker': _column(DELETE_MARKER_COLUMN, columns),
+    }
+    if wanted['size'] is None or wanted['last_modified'] is None:
+        raise ValueError("Inventory must include the Size and LastModifiedDate fields")
+
+    summary = InventorySummary()
+    compression = 'gzip' if path.endswith('.gz') else None
+    reader = pd.read_csv(
+        path, header=None, names=columns, usecols=[name for name in wanted.values() if name],
+        dtype=str, compression=compression, chunksize=chunk_rows,
+        # Uncompressed inventories are memory-mapped instead of read into a buffer
+        memory_map=compression is None
+    )
+    for chunk in reader:
+        if wanted['delete_marker']:
+            chunk = chunk[chunk[wanted['delete_marker']] != 'true']
+        sizes = pd.to_numeric(chunk[wanted['size']], errors='coerce').to_numpy(dtype=float)
+        last_modified = chunk[wanted['last_modified']].fillna('1970-01-01').str.slice(0, 10).to_numpy(dtype='datetime64[D]')
+        if wanted['storage_class']:
+            classes = _class_codes(chunk[wanted['storage_class']].fillna('STANDARD'))
+        else:
+            classes = np.full(len(chunk), CLASS_CODES['STANDARD'])
+        _histogram_chunk(summary, sizes, last_modified, classes, reference_day)
+    return summary
+
+
+def _summarize_arrow_batches(batches, reference_day):
+    summary = InventorySummary()
+    for batch in batches:
+        names = batch.schema.names
+        size_name = _column(SIZE_COLUMN, names)
+        modified_name = _column(LAST_MODIFIED_COLUMN, names)
+        class_name = _column(STORAGE_CLASS_COLUMN, names)
+        marker_name = _column(DELETE_MARKER_COLUMN, names)
+
+        sizes = batch.column(size_name).to_numpy(zero_copy_only=False).astype(float)
+        last_modified = batch.column(modified_name).to_numpy(zero_copy_only=False).astype('datetime64[D]')
+        if class_name:
+            classes = _class_codes(batch.column(class_name).fill_null('STANDARD').to_pylist())
+        else:
+            classes = np.full(len(sizes), CLASS_CODES['STANDARD'])
+        if marker_name:
+            keep = ~batch.column(marker_name).fill_null(False).to_numpy(zero_copy_only=False).astype(bool)
+            sizes, last_modified, classes = sizes[keep], last_modified[keep], classes[keep]
+        _histogram_chunk(summary, sizes, last_modified, classes, reference_day)
+    return summary
+
+
+def _arrow_columns(names):
+    return [name for name in names if name in SIZE_COLUMN + LAST_MODIFIED_COLUMN + STORAGE_CLASS_COLUMN + DELETE_MARKER_COLUMN]
+
+
+def _summarize_parquet(path, reference_day, chunk_rows):
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path, memory_map=True)
+    columns = _arrow_columns(parquet_file.schema_arrow.names)
+    return _summarize_arrow_batches(parquet_file.iter_batches(batch_size=chunk_rows, columns=columns), reference_day)
+
+
+def _summarize_orc(path, reference_day):
+    import pyarrow as pa
+    import pyarrow.orc as orc
+
+    orc_file = orc.ORCFile(pa.memory_map(path))
+    columns = _arrow_columns(orc_file.schema.names)
+    batches = (orc_file.read_stripe(i, columns=columns) for i in range(orc_file.nstripes))
+    return _summarize_arrow_batches(batches, reference_day)
+
+
+def summarize_data_file(path, file_format, schema, reference_day, chunk_rows=CHUNK_ROWS):
+    """
+    Histogram one inventory data file. reference_day is a numpy datetime64[D].
+    """
+    if file_format == 'CSV':
+        return _summarize_csv(path, schema, reference_day, chunk_rows)
+    if file_format == 'PARQUET':
+        return _summarize_parquet(path, reference_day, chunk_rows)
+    if file_format == 'ORC':
+        return _summarize_orc(path, reference_day)
+    raise ValueError(f"Unsupported inventory format {file_format}")
+
+
+def summarize_inventory(manifest_path, root=None, workers=None, chunk_rows=CHUNK_ROWS):
+    """
+    Summarize every data file of an S3 Inventory report.
+
+    Parameters:
+    manifest_path (str): path of the report's manifest.json.
+    root (str): directory the manifest's data file keys are relative to, if not next to the manifest.
+    workers (int): size of the process pool; defaults to the number of CPUs, 1 reads the files in this process.
+    chunk_rows (int): rows held in memory per worker at a time.
+
+    Returns:
+    InventorySummary
+    """
+    manifest = read_manifest(manifest_path)
+    creation_date = manifest_creation_date(manifest)
+    reference_day = np.datetime64(creation_date, 'D')
+    paths = [resolve_data_file(manifest_path, item['key'], root) for item in manifest['files']]
+
+    summary = InventorySummary(creation_date=creation_date)
+    args = (manifest['fileFormat'], manifest.get('fileSchema', ''), reference_day, chunk_rows)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for path in paths:
+            summary += summarize_data_file(path, *args)
+        return summary
+    # Spawned, not forked: forking a threaded process such as the Streamlit server can deadlock the workers
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        futures = [executor.submit(summarize_data_file, path, *args) for path in paths]
+        for future in futures:
+            summary += future.result()
+    return summary
+
+
+if __name__ == "__main__":
+    # python -m utils.inventory <manifest.json>
+    import sys
+
+    result = summarize_inventory(sys.argv[1])
+    print(f"{result.total_objects:,.0f} objects, {result.total_bytes / 1024 ** 4:,.2f} TB")
+    for storage_class, (objects, size) in result.by_class().items():
+        print(f"{storage_class:20s} {objects:>16,.0f} objects {size / 1024 ** 3:>16,.2f} GB")
@@ -0,0 +1,199 @@
+# lifecycle.py
+import numpy as np
+import utils.cost_kernel as cost_kernel
+import utils.object_sizes as object_sizes
+import utils.price_sheet as price_sheet
+import utils.pricing as pricing
+
+NUM_CLASSES = len(price_sheet.STORAGE_CLASSES)
+SEGMENT_COSTS = ['storage', 'request', 'retrieval', 'transition', 'early_deletion']
+
+
+class LifecycleResult:
+    """
+    Daily state and cost of a lifecycle simulation. Every array is (days, storage classes)
+    in PriceSheet row order; costs are accrued on the day they are incurred.
+    """
+
+    def __init__(self, stored_gb, stored_objects, storage, request, retrieval, transition, early_deletion):
+        self.stored_gb = stored_gb
+        self.stored_objects = stored_objects
+        self.storage = storage
+        self.request = request
+        self.retrieval = retrieval
+        self.transition = transition
+        self.early_deletion = early_deletion
+
+    @property
+    def daily_cost(self):
+        return self.storage + self.request + self.retrieval + self.transition + self.early_deletion
+
+    @property
+    def total(self):
+        return float(self.daily_cost.sum())
+
+    def components(self):
+        return {
+            'Storage': float(self.storage.sum()),
+            'Requests': float(self.request.sum()),
+            'Retrieval': float(self.retrieval.sum()),
+            'Transition': float(self.transition.sum()),
+            'Pro-rated fee': float(self.early_deletion.sum()),
+        }
+
+    def cost_by_class(self):
+        return dict(zip(price_sheet.STORAGE_CLASS_NAMES, self.daily_cost.sum(axis=0)))
+
+    def monthly_cost(self):
+        """
+        Cost per 30-day month and storage class, shape (months, storage classes).
+        """
+        days = self.daily_cost.shape[0]
+        months = -(-days // cost_kernel.DAYS_PER_MONTH)
+        padded = np.zeros((months * cost_kernel.DAYS_PER_MONTH, NUM_CLASSES))
+        padded[:days] = self.daily_cost
+        return padded.reshape(months, cost_kernel.DAYS_PER_MONTH, NUM_CLASSES).sum(axis=1)
+
+
+# Function to validate a lifecycle rule chain against s3_storage_classes_waterfall
+def validate_rule_chain(rule_chain, expiration_days=None):
+    """
+    rule_chain is a list of (storage class name, days after object creation), starting with
+    the class objects are uploaded to at day 0. Returns an error message, or None if valid.
+    """
+    if not rule_chain or rule_chain[0][1] != 0:
+        return "The first rule must be the upload storage class at day 0"
+    for (source, source_day), (target, target_day) in zip(rule_chain, rule_chain[1:]):
+        if target not in pricing.s3_storage_classes_waterfall[source]:
+            return f"You are not able to transition objects from {source} to {target}"
+        if target_day <= source_day:
+            return f"Transition to {target} must happen after day {source_day}"
+    if expiration_days is not None and expiration_days <= rule_chain[-1][1]:
+        return f"Expiration must happen after the last transition on day {rule_chain[-1][1]}"
+    return None
+
+
+def _shifted(values, shift, horizon):
+    # values[t - shift] for t in range(horizon), zero where t - shift < 0
+    out = np.zeros(horizon)
+    if shift < horizon:
+        out[shift:] = values[:horizon - shift]
+    return out
+
+
+def _window_sum(prefix, start_age, end_age, horizon):
+    # Sum of cohorts created in (t - end_age, t - start_age] for every day t, from a prefix sum
+    t = np.arange(horizon)
+    upper = t - start_age
+    lower = t - end_age if np.isfinite(end_age) else np.full(horizon, -1)
+    upper_sum = np.where(upper >= 0, prefix[np.clip(upper, 0, None)], 0.0)
+    lower_sum = np.where(lower >= 0, prefix[np.clip(lower, 0, None).astype(int)], 0.0)
+    return upper_sum - lower_sum
+
+
+class CohortProfile:
+    """
+    Daily ingestion and read profile shared by every segment of a simulation. Every cohort has
+    the size distribution of object_size_gb (an average size or a SizeHistogram), so the GB
+    billed per stored object in each class is the same for all of them.
+    """
+
+    def __init__(self, daily_objects, object_size_gb, horizon_days, daily_read_fraction=0.0):
+        self.horizon = int(horizon_days)
+        self.ingest_objects = np.broadcast_to(np.asarray(daily_objects, dtype=float), (self.horizon,)).copy()
+        self.ingest_gb = self.ingest_objects * object_sizes.mean_object_gb(object_size_gb)
+        # GB billed per object at the class rate and at the S3 Standard rate, in PriceSheet row order
+        self.billed_gb, self.standard_billed_gb = object_sizes.as_histogram(object_size_gb).billable_gb(np.arange(NUM_CLASSES))
+        self.prefix_objects = np.cumsum(self.ingest_objects)
+        self.prefix_gb = np.cumsum(self.ingest_gb)
+        self.read_fraction = np.broadcast_to(np.asarray(daily_read_fraction, dtype=float), (self.horizon,))
+
+
+def simulate_segment(sheet, profile, storage_class, start_age, leave_age, min_days=cost_kernel.MIN_STORAGE_DAYS):
+    """
+    Daily state and cost of one storage class of a rule chain, for cohorts aged [start_age, leave_age).
+
+    Every storage class appears at most once in a rule chain, so a chain's cost is the sum of its
+    segments; objects enter by PUT when start_age is 0 and by a lifecycle transition otherwise.
+
+    Returns:
+    dict of (days,) arrays keyed like the LifecycleResult attributes
+    """
+    horizon = profile.horizon
+    table = sheet.table
+    i = price_sheet.CLASS_INDEX[storage_class]
+    zeros = np.zeros(horizon)
+    segment = {
+        'stored_gb': _window_sum(profile.prefix_gb, start_age, leave_age, horizon),
+        'stored_objects': _window_sum(profile.prefix_objects, start_age, leave_age, horizon),
+        'request': zeros, 'retrieval': zeros, 'transition': zeros, 'early_deletion': zeros,
+    }
+
+    # Objects enter the class by PUT (first rule) or by a lifecycle transition
+    entering = _shifted(profile.ingest_objects, start_age, horizon)
+    if start_age == 0:
+        segment['request'] = cost_kernel.put_cost(table, i, entering)
+    else:
+        segment['transition'] = cost_kernel.transition_cost(table, i, entering)
+
+    # Leaving the class before its minimum storage duration is charged on the day it leaves
+    if np.isfinite(leave_age):
+        leaving_gb = _shifted(profile.ingest_objects, int(leave_age), horizon) * profile.billed_gb[i]
+        segment['early_deletion'] = cost_kernel.early_deletion_cost(table, i, leaving_gb, leave_age - start_age, min_days=min_days)
+
+    # Reads of the cohorts while they sit in this class
+    if profile.read_fraction.any():
+        ages = np.arange(horizon)
+        kernel = np.where((ages >= start_age) & (ages < leave_age), profile.read_fraction, 0.0)
+        read_gb = np.convolve(profile.ingest_gb, kernel)[:horizon]
+        read_objects = np.convolve(profile.ingest_objects, kernel)[:horizon]
+        segment['request'] = segment['request'] + cost_kernel.get_request_cost(table, i, read_objects)
+        segment['retrieval'] = cost_kernel.retrieval_cost(table, i, read_gb)
+
+    # Daily accrual of the monthly tiered storage price for that day's billed volume
+    billed_gb = segment['stored_objects'] * profile.billed_gb[i]
+    segment['storage'] = sheet.storage_cost([storage_class], billed_gb[:, None])[:, 0] / cost_kernel.DAYS_PER_MONTH
+    if profile.standard_billed_gb[i]:
+        standard_gb = segment['stored_objects'] * profile.standard_billed_gb[i]
+        segment['storage'] = segment['storage'] + cost_kernel.storage_cost(table, cost_kernel.STANDARD, standard_gb, 1)
+    return segment
+
+
+def segment_total(segment):
+    return float(sum(segment[name].sum() for name in SEGMENT_COSTS))
+
+
+def simulate_lifecycle(sheet, rule_chain, daily_objects, object_size_gb, horizon_days, expiration_days=None,
+                       daily_read_fraction=0.0, min_days=cost_kernel.MIN_STORAGE_DAYS):
+    """
+    Simulate object cohorts (one per creation day) through a lifecycle rule chain, day by day.
+
+    Parameters:
+    sheet (PriceSheet): prices of the region; storage uses the full tier ladder of the daily volume.
+    rule_chain (list): (storage class name, days after creation) pairs, see validate_rule_chain.
+    daily_objects (float or array): objects ingested each day, scalar or one value per day.
+    object_size_gb (float or SizeHistogram): average object size in GB, or the size distribution
+        of the ingested objects, billed with the per-object rules of each class (see utils/object_sizes.py).
+    horizon_days (int): number of days to simulate.
+    expiration_days (int): days after creation when objects are deleted, or None to keep them.
+    daily_read_fraction (float or array): fraction of a cohort read each day, scalar or indexed by age in days.
+    min_days (array): minimum storage duration per class, in PriceSheet row order.
+
+    Returns:
+    LifecycleResult
+    """
+    error = validate_rule_chain(rule_chain, expiration_days) or price_sheet.validate_priced(sheet, [name for name, _ in rule_chain])
+    if error is not None:
+        raise ValueError(error)
+
+    profile = CohortProfile(daily_objects, object_size_gb, horizon_days, daily_read_fraction)
+    columns = {name: np.zeros((profile.horizon, NUM_CLASSES)) for name in ['stored_gb', 'stored_objects'] + SEGMENT_COSTS}
+
+    end_age = float(expiration_days) if expiration_days is not None else np.inf
+    boundaries = [day for _, day in rule_chain[1:]] + [end_age]
+    for (storage_class, start_age), leave_age in zip(rule_chain, boundaries):
+        i = price_sheet.CLASS_INDEX[storage_class]
+        for name, values in simulate_segment(sheet, profile, storage_class, start_age, leave_age, min_days).items():
+            columns[name][:, i] = values
+
+    return LifecycleResult(**columns)
@@ -0,0 +1,196 @@
+# lifecycle_optimizer.py
+"""
+Search for the cheapest lifecycle policy: upload class, chain of transitions allowed by
+s3_storage_classes_waterfall, transition days and expiration.
+
+A storage class appears at most once in a rule chain, so the cost of a chain is the sum of the
+costs of its segments (class, entry day, exit day). Every segment is simulated once, spread
+across a process pool, and the cheapest chain is then found by dynamic programming over
+(class, entry day) states.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import utils.cost_kernel as cost_kernel
+import utils.lifecycle as lifecycle
+import utils.price_sheet as price_sheet
+import utils.pricing as pricing
+
+# Candidate transition days (after object creation)
+DEFAULT_TRANSITION_DAYS = [30, 45, 60, 90, 120, 150, 180, 270, 365, 450, 545, 730, 1095, 1460, 1825]
+
+# Objects must be at least this many days old before they can transition to these classes
+MIN_TRANSITION_AGE = {
+    'S3 Standard - Infrequent Access': 30,
+    'S3 One Zone - Infrequent Access': 30,
+}
+
+
+class OptimizedPolicy:
+    """
+    Cheapest policy found: the rule chain, its expiration and the full simulation of it.
+    """
+
+    def __init__(self, rule_chain, expiration_days, result, policies, segments):
+        self.rule_chain = rule_chain
+        self.expiration_days = expiration_days
+        self.result = result
+        self.policies = policies
+        self.segments = segments
+
+    @property
+    def total(self):
+        return self.result.total
+
+    def describe(self):
+        steps = [f"Upload to {self.rule_chain[0][0]}"]
+        steps += [f"Transition to {storage_class} after {day} days" for storage_class, day in self.rule_chain[1:]]
+        if self.expiration_days is not None:
+            steps.append(f"Expire after {self.expiration_days} days")
+        return steps
+
+
+def _evaluate_segments(sheet, profile, storage_class, spans, min_days):
+    # Runs in a worker process: total cost of every (entry day, exit day) span of one class
+    return storage_class, {
+        span: lifecycle.segment_total(lifecycle.simulate_segment(sheet, profile, storage_class, span[0], span[1], min_days))
+        for span in spans
+    }
+
+
+def _transition_allowed(target, day):
+    return day >= MIN_TRANSITION_AGE.get(target, 0)
+
+
+def _spans(storage_class, entry_days, transition_days, expiration, allow_early_deletion, min_days):
+    # Every (entry, exit) span a class can occupy; exit is a later transition day or the expiration
+    min_dwell = min_days[price_sheet.CLASS_INDEX[storage_class]]
+    spans = []
+    for entry in entry_days:
+        exits = [day for day in transition_days if day > entry] + [expiration]
+        for exit_day in exits:
+            if not allow_early_deletion and np.isfinite(exit_day) and exit_day - entry < min_dwell:
+                continue
+            spans.append((entry, exit_day))
+    return spans
+
+
+def optimize_lifecycle(sheet, daily_objects, object_size_gb, horizon_days, daily_read_fraction=0.0,
+                       upload_classes=None, transition_days=DEFAULT_TRANSITION_DAYS, expiration_options=(None,),
+                       allow_early_deletion=True, min_days=cost_kernel.MIN_STORAGE_DAYS, workers=None):
+    """
+    Find the cheapest lifecycle policy for an ingestion and access profile.
+
+    Parameters:
+    sheet (PriceSheet): prices of the region.
+    daily_objects, object_size_gb, horizon_days, daily_read_fraction: as in lifecycle.simulate_lifecycle.
+    upload_classes (list): storage class names objects may be uploaded to; defaults to every class.
+        Classes the sheet has no price for are never part of a policy.
+    transition_days (list): candidate days after creation for each transition.
+    expiration_options (list): candidate expiration days, None meaning objects are kept.
+    allow_early_deletion (bool): if False, never leave a class before its minimum storage duration
+        instead of paying the pro-rated fee.
+    min_days (array): minimum storage duration per class, in PriceSheet row order.
+    workers (int): size of the process pool; 1 evaluates in this process.
+
+    Returns:
+    OptimizedPolicy
+    """
+    horizon = int(horizon_days)
+    profile = lifecycle.CohortProfile(daily_objects, object_size_gb, horizon, daily_read_fraction)
+    # Classes the sheet has no price for are left out rather than priced as free
+    unpriced = sheet.unpriced(list(pricing.s3_storage_classes.keys()))
+    upload_classes = [storage_class for storage_class in upload_classes or pricing.s3_storage_classes.keys() if storage_class not in unpriced]
+    classes = [storage_class for storage_class in pricing.s3_storage_classes.keys() if storage_class not in unpriced]
+
+    best = None
+    policies = 0
+    segments = 0
+    for expiration_days in expiration_options:
+        expiration = float(expiration_days) if expiration_days is not None else np.inf
+        days = sorted({day for day in transition_days if 0 < day < min(horizon, expiration)})
+
+        # Entry days each class can be reached on: 0 if it is an upload class, else any allowed transition day
+        entry_days = {
+            storage_class: ([0] if storage_class in upload_classes else [])
+                           + [day for day in days if _transition_allowed(storage_class, day)]
+            for storage_class in classes
+        }
+        spans = {
+            storage_class: _spans(storage_class, entry_days[storage_class], days, expiration, allow_early_deletion, min_days)
+            for storage_class in classes
+        }
+        costs = _evaluate_all(sheet, profile, spans, min_days, workers)
+        segments += sum(len(values) for values in costs.values())
+
+        # best_from[(class, entry)] = (cost of the cheapest chain from this state, next state or None)
+        best_from = {}
+        count_from = {}
+        for entry in sorted({day for values in entry_days.values() for day in values}, reverse=True):
+            for storage_class in classes:
+                if entry not in entry_days[storage_class]:
+                    continue
+                options = []
+                count = 0
+                if (entry, expiration) in costs[storage_class]:
+                    options.append((costs[storage_class][(entry, expiration)], None))
+                    count += 1
+                for target in pricing.s3_storage_classes_waterfall[storage_class]:
+                    for day in days:
+                        state = (target, day)
+                        if day <= entry or state not in best_from or (entry, day) not in costs[storage_class]:
+                            continue
+                        options.append((costs[storage_class][(entry, day)] + best_from[state][0], state))
+                        count += count_from[state]
+                if options:
+                    best_from[(storage_class, entry)] = min(options, key=lambda option: option[0])
+                    count_from[(storage_class, entry)] = count
+
+        for storage_class in upload_classes:
+            state = (storage_class, 0)
+            if state not in best_from:
+                continue
+            policies += count_from[state]
+            if best is None or best_from[state][0] < best[0]:
+                best = (best_from[state][0], _rule_chain(best_from, state), expiration_days)
+
+    if best is None:
+        raise ValueError("No lifecycle policy satisfies the constraints")
+
+    _, rule_chain, expiration_days = best
+    result = lifecycle.simulate_lifecycle(sheet, rule_chain, daily_objects, object_size_gb, horizon,
+                                          expiration_days, daily_read_fraction, min_days)
+    return OptimizedPolicy(rule_chain, expiration_days, result, policies, segments)
+
+
+def _rule_chain(best_from, state):
+    chain = []
+    while state is not None:
+        chain.append(state)
+        state = best_from[state][1]
+    return chain
+
+
+def _evaluate_all(sheet, profile, spans, min_days, workers):
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        results = [_evaluate_segments(sheet, profile, storage_class, class_spans, min_days)
+                   for storage_class, class_spans in spans.items()]
+        return dict(results)
+
+    # Split each class's spans into chunks so the work spreads evenly over the pool
+    tasks = []
+    for storage_class, class_spans in spans.items():
+        chunk = max(1, -(-len(class_spans) // workers))
+        tasks += [(storage_class, class_spans[i:i + chunk]) for i in range(0, len(class_spans), chunk)]
+    costs = {storage_class: {} for storage_class in spans}
+    # Spawned, not forked: forking a threaded process such as the Streamlit server can deadlock the workers
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        futures = [executor.submit(_evaluate_segments, sheet, profile, storage_class, class_spans, min_days)
+                   for storage_class, class_spans in tasks]
+        for future in futures:
+            storage_class, values = future.result()
+            costs[storage_class].update(values)
+    return costs
@@ -0,0 +1,207 @@
+# monte_carlo.py
+"""
+Monte Carlo mode of the cost models: inputs are given as distributions, every trial is
+evaluated in one vectorized pass per chunk of trials, and results are summarized as
+percentiles and histograms.
+
+A distribution is a number (fixed value) or a dict such as
+{'dist': 'uniform', 'low': 0.1, 'high': 0.3},
+{'dist': 'triangular', 'low': 7, 'mode': 14, 'high': 31},
+{'dist': 'normal', 'mean': 0.2, 'std': 0.05, 'low': 0, 'high': 1} (clipped to low/high if given) or
+{'dist': 'lognormal', 'median': 100, 'sigma': 0.5}.
+"""
+import numpy as np
+import utils.cost_kernel as cost_kernel
+import utils.helper as helper
+import utils.intelligent_tiering as intelligent_tiering
+import utils.object_sizes as object_sizes
+import utils.price_sheet as price_sheet
+import utils.scenarios as scenarios
+
+DEFAULT_TRIALS = 100_000
+CHUNK_TRIALS = 25_000
+PERCENTILES = (50, 90, 99)
+
+
+def sample(distribution, size, rng):
+    if not isinstance(distribution, dict):
+        return np.full(size, float(distribution))
+    kind = distribution['dist']
+    if kind == 'fixed':
+        return np.full(size, float(distribution['value']))
+    if kind == 'uniform':
+        return rng.uniform(distribution['low'], distribution['high'], size)
+    if kind == 'triangular':
+        if distribution['low'] == distribution['high']:
+            return np.full(size, float(distribution['low']))
+        return rng.triangular(distribution['low'], distribution['mode'], distribution['high'], size)
+    if kind == 'normal':
+        values = rng.normal(distribution['mean'], distribution['std'], size)
+        return np.clip(values, distribution.get('low', -np.inf), distribution.get('high', np.inf))
+    if kind == 'lognormal':
+        return rng.lognormal(np.log(distribution['median']), distribution['sigma'], size)
+    raise ValueError(f"Unknown distribution {kind}")
+
+
+# Function to build a uniform or triangular distribution over [low, high] (triangular peaks at mode, default the midpoint)
+def from_range(low, high, kind='uniform', mode=None):
+    if low == high:
+        return float(low)
+    if kind == 'triangular':
+        return {'dist': 'triangular', 'low': low, 'mode': (low + high) / 2 if mode is None else min(max(mode, low), high), 'high': high}
+    return {'dist': 'uniform', 'low': low, 'high': high}
+
+
+class MonteCarloResult:
+    """
+    Cost of every trial (trials x columns), e.g. one column per storage class.
+    """
+
+    def __init__(self, totals, columns):
+        self.totals = totals
+        self.columns = list(columns)
+
+    @property
+    def trials(self):
+        return self.totals.shape[0]
+
+    def percentiles(self, q=PERCENTILES):
+        import pandas as pd
+
+        values = np.percentile(self.totals, q, axis=0)
+        df = pd.DataFrame(values, index=[f"P{p}" for p in q], columns=self.columns)
+        df.loc['Mean'] = self.totals.mean(axis=0)
+        return df
+
+    def histogram(self, column, bins=50):
+        """
+        (counts, bin edges) of the trial costs of one column.
+        """
+        return np.histogram(self.totals[:, self.columns.index(column)], bins=bins)
+
+    def histogram_frame(self, columns=None, bins=50):
+        """
+        Long DataFrame (Cost, Trials, Series) of histograms on common bins, for charting.
+        """
+        import pandas as pd
+
+        columns = self.columns if columns is None else list(columns)
+        values = self.totals[:, [self.columns.index(column) for column in columns]]
+        edges = np.histogram_bin_edges(values, bins=bins)
+        centers = (edges[:-1] + edges[1:]) / 2
+        return pd.concat([
+            pd.DataFrame({'Cost': centers, 'Trials': np.histogram(values[:, i], bins=edges)[0], 'Series': column})
+            for i, column in enumerate(columns)
+        ], ignore_index=True)
+
+
+def _run(evaluate, trials, columns, seed, chunk_trials):
+    # Trials are evaluated in chunks so intermediate arrays stay bounded whatever the trial count
+    rng = np.random.default_rng(seed)
+    totals = np.empty((trials, len(columns)))
+    for start in range(0, trials, chunk_trials):
+        size = min(chunk_trials, trials - start)
+        totals[start:start + size] = evaluate(size, rng)
+    return MonteCarloResult(totals, columns)
+
+
+def backup_monte_carlo(sheet, storage_classes, size_gb, frequency, retention_days, mpu_size_mb=8,
+                       growth_rate=0.0, change_rate=1.0, dedup_rate=0.0,
+                       trials=DEFAULT_TRIALS, seed=None, chunk_trials=CHUNK_TRIALS):
+    """
+    Yearly backup cost per storage class, like scenarios.backup_costs, with uncertain inputs.
+
+    Parameters:
+    sheet (PriceSheet): prices of the region.
+    storage_classes (list): storage class names.
+    size_gb, retention_days: distributions of the full backup size and of the retention period.
+    frequency (int): backups per year.
+    growth_rate: distribution of the yearly growth of the protected data (0.2 = +20% over the year).
+    change_rate: distribution of the share of the data each backup stores (1.0 = full backups).
+    dedup_rate: distribution of the share saved by deduplication and compression.
+
+    Returns:
+    MonteCarloResult with one column per storage class
+    """
+    class_idx = price_sheet.class_indices(storage_classes)
+
+    def evaluate(size, rng):
+        # Average protected size over the year, assuming linear growth
+        protected_gb = sample(size_gb, size, rng) * (1 + sample(growth_rate, size, rng) / 2)
+        stored_gb = protected_gb * np.clip(sample(change_rate, size, rng), 0, 1) * (1 - np.clip(sample(dedup_rate, size, rng), 0, 1))
+        retention = np.maximum(sample(retention_days, size, rng), 0)
+
+        stored_mb = helper.convert_storage_size(stored_gb, 'GB', 'MB')
+        parts = scenarios.upload_parts(stored_mb, mpu_size_mb)
+        retained_gb = frequency * retention * stored_gb / 365
+        storage_rate = sheet.blended_storage_rate(storage_classes, retained_gb[:, None])
+        costs = cost_kernel.cost_components(sheet.table, class_idx[None, :], size_gb=stored_gb[:, None],
+                                            days=retention[:, None], objects=1, put_parts=parts[:, None],
+                                            removed=True, storage_rate=storage_rate, stored_objects=1)
+        return costs.total * frequency
+
+    return _run(evaluate, trials, storage_classes, seed, chunk_trials)
+
+
+def int_unit_costs(prices, horizon_days, schedule, tiers=intelligent_tiering.TIERS):
+    """
+    Storage cost of 1 GB uploaded on day 0 over the horizon, for each tier it settles in (TIERS order);
+    0.0 for tiers not in `tiers`.
+    """
+    return np.array([
+        intelligent_tiering.simulate_intelligent_tiering(prices, np.eye(len(intelligent_tiering.TIERS))[k], 1, 1.0,
+                                                         horizon_days, schedule).storage.sum()
+        if tier in tiers else 0.0
+        for k, tier in enumerate(intelligent_tiering.TIERS)
+    ])
+
+
+def intelligent_tiering_monte_carlo(prices, tier_fractions, objects, object_size_gb, horizon_days, schedule,
+                                    trials=DEFAULT_TRIALS, seed=None, chunk_trials=CHUNK_TRIALS):
+    """
+    Intelligent-Tiering cost over the horizon, like intelligent_tiering.simulate_intelligent_tiering,
+    with uncertain inputs. Sampled tier fractions are renormalized to sum to 1 in every trial.
+
+    Parameters:
+    tier_fractions (dict): distribution of the share of each tier, keyed by tier.
+    objects, object_size_gb: distributions of the object count and average object size; object_size_gb
+        may instead be a SizeHistogram, whose size distribution is then scaled to every sampled count.
+
+    Returns:
+    MonteCarloResult with 'Storage', 'Monitoring' and 'Total' columns
+
+    Raises ValueError if a tier data may settle in or pass through, or the monitoring fee, has no price in the region.
+    """
+    error = intelligent_tiering.validate_int_priced(prices, dict.fromkeys(tier_fractions, 1.0), schedule)
+    if error:
+        raise ValueError(error)
+    unit_costs = int_unit_costs(prices, horizon_days, schedule, list(tier_fractions))
+    enabled = np.array([schedule.get(tier) is not None for tier in intelligent_tiering.TIERS])
+    months = horizon_days / intelligent_tiering.DAYS_PER_MONTH
+    histogram_split = None
+    if isinstance(object_size_gb, object_sizes.SizeHistogram):
+        # GB per object in monitored and unmonitored buckets, and the monitored share of objects
+        sizes = object_size_gb.scaled(1)
+        monitored = sizes.average_gb >= intelligent_tiering.MONITORING_THRESHOLD_GB
+        histogram_split = (sizes.size_gb[monitored].sum(), sizes.size_gb[~monitored].sum(), sizes.objects[monitored].sum())
+
+    def evaluate(size, rng):
+        fractions = np.column_stack([np.maximum(sample(tier_fractions.get(tier, 0.0), size, rng), 0)
+                                     for tier in intelligent_tiering.TIERS]) * enabled
+        total = fractions.sum(axis=1, keepdims=True)
+        fractions = np.divide(fractions, total, out=np.zeros_like(fractions), where=total > 0)
+        count = np.maximum(sample(objects, size, rng), 0)
+        if histogram_split is not None:
+            monitored_gb, unmonitored_gb, monitored_share = histogram_split
+        else:
+            object_gb = np.maximum(sample(object_size_gb, size, rng), 0)
+            monitored_share = (object_gb >= intelligent_tiering.MONITORING_THRESHOLD_GB).astype(float)
+            monitored_gb = object_gb * monitored_share
+            unmonitored_gb = object_gb - monitored_gb
+
+        # Objects under the monitoring threshold stay in Frequent Access and pay no monitoring fee
+        storage = count * (monitored_gb * (fractions @ unit_costs) + unmonitored_gb * unit_costs[0])
+        monitoring = count * monitored_share * prices.monitoring * months
+        return np.column_stack([storage, monitoring, storage + monitoring])
+
+    return _run(evaluate, trials, ['Storage', 'Monitoring', 'Total'], seed, chunk_trials)
@@ -0,0 +1,112 @@
+# multipart.py
+"""
+Upload planner: how a set of files is uploaded to S3 within the multipart upload limits, and
+what the upload requests cost per storage class.
+
+Files are given as sizes (one per file), or as a size histogram (object counts and bytes per
+bucket, e.g. InventorySummary.size_histogram) priced at each bucket's average file size; every
+step is vectorized over the files or buckets. Files up to the multipart threshold are uploaded
+with a single PUT, larger ones with CreateMultipartUpload, one UploadPart per part and
+CompleteMultipartUpload. The part size is the requested one clamped to S3's 5 MB - 5 GB range,
+grown for files that would otherwise need more than 10,000 parts.
+"""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+import utils.cost_kernel as cost_kernel
+import utils.price_sheet as price_sheet
+
+MIN_PART_MB = 5
+MAX_PART_MB = 5 * 1024
+MAX_PARTS = 10000
+# Largest single PUT, and largest object
+MAX_PUT_MB = 5 * 1024
+MAX_OBJECT_MB = 5 * 1024 * 1024
+
+SINGLE_PUTS = 'Single PUT requests'
+CREATE_REQUESTS = 'CreateMultipartUpload requests'
+UPLOAD_PART_REQUESTS = 'UploadPart requests'
+COMPLETE_REQUESTS = 'CompleteMultipartUpload requests'
+TOO_LARGE = 'Files over 5 TB (not uploaded)'
+PUT_REQUEST_COST = 'PUT Request Cost'
+
+
+class UploadPlan(namedtuple('UploadPlan', ['objects', 'size_mb', 'multipart', 'part_size_mb', 'parts', 'too_large'])):
+    """
+    Upload of each file (or histogram bucket of `objects` files of `size_mb` each): whether it
+    is a multipart upload, its part size and number of parts (0 for single PUTs), and whether it
+    is over the 5 TB object limit (and left out of the counts).
+    """
+    __slots__ = ()
+
+    def request_counts(self):
+        """
+        Total upload requests of every kind, {row: count}.
+        """
+        objects = np.broadcast_to(self.objects, np.shape(self.multipart))
+        uploaded = ~self.too_large
+        uploads = float(objects[self.multipart].sum())
+        return {
+            SINGLE_PUTS: float(objects[uploaded & ~self.multipart].sum()),
+            CREATE_REQUESTS: uploads,
+            UPLOAD_PART_REQUESTS: float((objects * self.parts)[self.multipart].sum()),
+            COMPLETE_REQUESTS: uploads,
+            TOO_LARGE: float(objects[self.too_large].sum()),
+        }
+
+    def put_cost(self, sheet, storage_classes, counts=None):
+        """
+        Cost of every upload request into each storage class, as an array over storage_classes.
+        """
+        counts = self.request_counts() if counts is None else counts
+        cost = cost_kernel.multipart_put_cost(sheet.table, price_sheet.class_indices(storage_classes), counts[SINGLE_PUTS],
+                                              counts[CREATE_REQUESTS], counts[UPLOAD_PART_REQUESTS])
+        # Classes the sheet has no PUT price for are NaN rather than free
+        return np.where(sheet.priced(storage_classes, ['PUT']), cost, np.nan)
+
+    def costs(self, sheet, storage_classes):
+        """
+        DataFrame of the request counts (same for every class) and their cost per storage class.
+        """
+        counts = self.request_counts()
+        df = pd.DataFrame({storage_class: counts for storage_class in storage_classes}, dtype=float)
+        df.loc[PUT_REQUEST_COST] = self.put_cost(sheet, storage_classes, counts)
+        return df
+
+
+def plan_uploads(sizes_mb, objects=1, part_size_mb=8, threshold_mb=None):
+    """
+    Plan the upload of files of the given sizes.
+
+    Parameters:
+    sizes_mb (array-like): size of each file, or the average file size of each histogram bucket, in MB.
+    objects (array-like): files of each size (1 for a list of files).
+    part_size_mb (float): preferred part size, clamped to 5 MB - 5 GB.
+    threshold_mb (float): files larger than this are uploaded in parts (default: the part size);
+        never above the 5 GB single PUT limit.
+
+    Returns:
+    UploadPlan
+    """
+    sizes_mb = np.asarray(sizes_mb, dtype=float)
+    part_size_mb = float(np.clip(part_size_mb, MIN_PART_MB, MAX_PART_MB))
+    threshold_mb = min(part_size_mb if threshold_mb is None else threshold_mb, MAX_PUT_MB)
+
+    too_large = sizes_mb > MAX_OBJECT_MB
+    multipart = (sizes_mb > threshold_mb) & ~too_large
+    # Grow the part size, in whole MB, where the preferred one needs more than MAX_PARTS parts
+    part_sizes = np.where(multipart, np.maximum(part_size_mb, np.ceil(sizes_mb / MAX_PARTS)), 0.0)
+    parts = np.where(multipart, np.ceil(sizes_mb / np.where(multipart, part_sizes, 1.0)), 0.0)
+    return UploadPlan(np.asarray(objects, dtype=float), sizes_mb, multipart, part_sizes, parts, too_large)
+
+
+def plan_histogram(counts, size_bytes, part_size_mb=8, threshold_mb=None):
+    """
+    Plan the upload of a size histogram: `counts` files and `size_bytes` bytes per bucket.
+    """
+    counts = np.asarray(counts, dtype=float)
+    size_bytes = np.asarray(size_bytes, dtype=float)
+    filled = counts > 0
+    average_mb = np.where(filled, size_bytes / np.where(filled, counts, 1.0), 0.0) / 1024 ** 2
+    return plan_uploads(average_mb[filled], counts[filled], part_size_mb, threshold_mb)
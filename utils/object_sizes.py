@@ -0,0 +1,106 @@
+# object_sizes.py
+"""
+Object-size histograms, so the per-object billing rules of S3 are priced on the actual size
+distribution of a bucket rather than on its average object size:
+
+- objects smaller than 128 KB are billed as 128 KB in S3 Standard-IA, One Zone-IA and Glacier
+  Instant Retrieval (cost_kernel.MIN_BILLABLE_GB);
+- every object in S3 Glacier Flexible Retrieval and Deep Archive adds 32 KB at the class rate
+  and 8 KB at the S3 Standard rate (cost_kernel.OVERHEAD_GB, cost_kernel.STANDARD_OVERHEAD_GB);
+- Intelligent-Tiering does not monitor objects smaller than 128 KB, which stay in the Frequent
+  Access tier (see utils/intelligent_tiering.py).
+
+A histogram is two arrays, object count and GB per size bucket; the rules are applied bucket by
+bucket to those aggregates, so pricing a bucket of 10^10 small objects costs as much as pricing
+one object. They are exact for buckets that do not straddle 128 KB, which holds for the
+power-of-two size bins of an S3 Inventory summary (see utils/inventory.py).
+
+The engines take a SizeHistogram wherever they take an average object size.
+"""
+from collections import namedtuple
+
+import numpy as np
+import utils.cost_kernel as cost_kernel
+
+
+class SizeHistogram(namedtuple('SizeHistogram', ['objects', 'size_gb'])):
+    """
+    Object count and total size in GB of each size bucket.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_average(cls, objects, object_size_gb):
+        """
+        One bucket of `objects` objects of object_size_gb each.
+        """
+        return cls(np.array([float(objects)]), np.array([float(objects) * float(object_size_gb)]))
+
+    @classmethod
+    def from_bytes(cls, counts, size_bytes):
+        """
+        From object counts and bytes per bucket, leaving out empty buckets.
+        """
+        counts = np.asarray(counts, dtype=float)
+        filled = counts > 0
+        return cls(counts[filled], np.asarray(size_bytes, dtype=float)[filled] / 1024 ** 3)
+
+    @classmethod
+    def from_inventory(cls, summary, storage_class=None):
+        """
+        From an InventorySummary, for one storage class code or the whole bucket.
+        """
+        return cls.from_bytes(*summary.size_histogram(storage_class))
+
+    @property
+    def total_objects(self):
+        return float(self.objects.sum())
+
+    @property
+    def total_gb(self):
+        return float(self.size_gb.sum())
+
+    @property
+    def average_gb(self):
+        """
+        Average object size of each bucket.
+        """
+        return np.divide(self.size_gb, self.objects, out=np.zeros_like(self.size_gb), where=self.objects > 0)
+
+    @property
+    def mean_object_gb(self):
+        return self.total_gb / self.total_objects if self.total_objects else 0.0
+
+    def scaled(self, objects):
+        """
+        The same size distribution with `objects` objects in total.
+        """
+        factor = float(objects) / self.total_objects if self.total_objects else 0.0
+        return SizeHistogram(self.objects * factor, self.size_gb * factor)
+
+    def billable_gb(self, storage_classes):
+        """
+        GB billed at the class rate and at the S3 Standard rate for all the objects, per PriceSheet
+        class index, see cost_kernel.billable_gb.
+
+        Returns:
+        (class GB, Standard GB), arrays of the shape of storage_classes
+        """
+        storage_classes = np.asarray(storage_classes, dtype=np.intp)
+        expand = (slice(None),) + (None,) * storage_classes.ndim
+        class_gb, standard_gb = cost_kernel.billable_gb(storage_classes, self.size_gb[expand], self.objects[expand])
+        return class_gb.sum(axis=0), standard_gb.sum(axis=0)
+
+
+# Function to get the size histogram of an average object size or a SizeHistogram, scaled to `objects` objects
+def as_histogram(object_size_gb, objects=1.0):
+    if isinstance(object_size_gb, SizeHistogram):
+        return object_size_gb.scaled(objects)
+    return SizeHistogram.from_average(objects, object_size_gb)
+
+
+# Function to get the mean object size of an average object size or a SizeHistogram
+def mean_object_gb(object_size_gb):
+    if isinstance(object_size_gb, SizeHistogram):
+        return object_size_gb.mean_object_gb
+    return float(object_size_gb)
@@ -0,0 +1,217 @@
+# price_history.py
+"""
+Every stored price version (see utils/price_store.py) of every region as one columnar stack,
+to replay a scenario under past prices in one vectorized call.
+
+The stack is a PriceSheet whose table, availability and storage ladders have a leading axis with
+one entry per (region, version); `index` lists the entries with their publication dates and is
+what `select` and `at` query. Scenarios built on the cost kernel (scenarios.backup_cost_rows,
+scenarios.retrieval_cost_rows, or utils/cost_kernel.py directly) price every entry at once, e.g.
+the yearly cost of a backup plan under every version published since 2023:
+
+    history = price_history.get_price_history()
+    costs = history.replay(lambda sheet: scenarios.backup_cost_rows(sheet, classes, 100.0, 365, 30, 13)[scenarios.YEARLY_TOTAL],
+                           columns=classes, since='2023-01-01')
+
+Past offer files are added to the store with:
+python -m utils.price_history add offer-2023-01.json offer-2023-02.json ... [--region us-east-1 ...]
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import utils.price_sheet as price_sheet
+import utils.price_store as price_store
+import utils.pricing as pricing
+import utils.telemetry as telemetry
+
+INDEX_COLUMNS = ['region', 'version', 'publication_date']
+
+logger = telemetry.get_logger('price_history')
+
+
+def stack_sheets(sheets):
+    """
+    One PriceSheet with a leading axis over the sheets; storage ladders are padded to the
+    longest ladder with zero-width tiers.
+    """
+    max_tiers = max(sheet.storage_ladders[0].shape[-1] for sheet in sheets)
+    ladders = tuple(np.zeros((len(sheets), len(price_sheet.STORAGE_CLASSES), max_tiers)) for _ in range(3))
+    for i, sheet in enumerate(sheets):
+        for stacked, ladder in zip(ladders, sheet.storage_ladders):
+            stacked[i, :, :ladder.shape[-1]] = ladder
+    return price_sheet.PriceSheet('history', np.stack([sheet.table for sheet in sheets]),
+                                  np.stack([sheet.available for sheet in sheets]), ladders)
+
+
+class PriceHistory:
+    """
+    Price versions as a stacked PriceSheet (`sheet`), entry i of which is row i of `index`
+    (region, version, publication date), sorted by region and publication date.
+    """
+
+    def __init__(self, index, sheet):
+        self.index = index.reset_index(drop=True)
+        self.sheet = sheet
+
+    def __len__(self):
+        return len(self.index)
+
+    @classmethod
+    def from_store(cls, store, regions=None, since=None, until=None):
+        """
+        Load the stored versions of the regions published in [since, until] (ISO dates).
+        """
+        query = 'SELECT region, version, publication_date FROM versions WHERE 1'
+        params = []
+        if regions is not None:
+            query += f" AND region IN ({', '.join('?' * len(regions))})"
+            params += list(regions)
+        if since is not None:
+            query += ' AND publication_date >= ?'
+            params.append(since)
+        if until is not None:
+            # An until date includes every version published that day
+            query += ' AND substr(publication_date, 1, ?) <= ?'
+            params += [len(until), until]
+        conn = store.connect()
+        index = pd.DataFrame(conn.execute(query + ' ORDER BY region, publication_date, version', params).fetchall(),
+                             columns=INDEX_COLUMNS).fillna({'publication_date': ''})
+        if index.empty:
+            raise LookupError("No stored price versions match")
+
+        with telemetry.span('price_history.load', versions=len(index)):
+            prices = {(region, version): {} for region, version in zip(index['region'], index['version'])}
+            rows = conn.execute(
+                f"SELECT region, version, filter_key, dimensions FROM prices WHERE region IN ({', '.join('?' * index['region'].nunique())})",
+                list(index['region'].unique())
+            )
+            # Most prices are unchanged from one version to the next: decode every distinct value once
+            keys = {}
+            decoded = {}
+            for region, version, key, dimensions in rows:
+                entry = prices.get((region, version))
+                if entry is None:
+                    continue
+                if key not in keys:
+                    keys[key] = tuple(tuple(item) for item in json.loads(key))
+                if dimensions not in decoded:
+                    decoded[dimensions] = price_store._decode_dimensions(dimensions)
+                entry[keys[key]] = decoded[dimensions]
+            sheets = [price_sheet.PriceSheet.from_price_dimensions(region, prices[region, version])
+                      for region, version in zip(index['region'], index['version'])]
+        return cls(index, stack_sheets(sheets))
+
+    def select(self, regions=None, since=None, until=None):
+        """
+        Positions of the entries of the regions published in [since, until] (ISO dates).
+        """
+        mask = np.ones(len(self.index), dtype=bool)
+        if regions is not None:
+            mask &= self.index['region'].isin(list(regions)).to_numpy()
+        if since is not None:
+            mask &= (self.index['publication_date'] >= since).to_numpy()
+        if until is not None:
+            mask &= (self.index['publication_date'].str[:len(until)] <= until).to_numpy()
+        return np.flatnonzero(mask)
+
+    def at(self, date, regions=None):
+        """
+        Positions of the version of each region in effect on the date (the latest published by then).
+        """
+        positions = self.select(regions, until=date)
+        return self.index.iloc[positions].groupby('region', sort=True).tail(1).index.to_numpy()
+
+    def subset(self, positions):
+        positions = np.asarray(positions, dtype=np.intp)
+        sheet = price_sheet.PriceSheet('history', self.sheet.table[positions], self.sheet.available[positions],
+                                       tuple(ladder[positions] for ladder in self.sheet.storage_ladders))
+        return PriceHistory(self.index.iloc[positions], sheet)
+
+    def replay(self, evaluate, columns=None, positions=None, regions=None, since=None, until=None):
+        """
+        Evaluate a scenario under every selected price version in one call.
+
+        Parameters:
+        evaluate (callable): evaluate(sheet) -> costs, called once with the stacked sheet, must return
+            one row per entry (shape (entries,) or (entries, len(columns))).
+        columns (list): names of the result columns, e.g. the storage classes evaluated.
+        positions: entries to replay (see select / at); by default those matching regions, since and until.
+
+        Returns:
+        DataFrame indexed by region, version and publication date.
+        """
+        if positions is None:
+            positions = self.select(regions, since, until)
+        history = self.subset(positions)
+        with telemetry.span('price_history.replay', versions=len(history)):
+            costs = np.asarray(evaluate(history.sheet), dtype=float)
+        index = pd.MultiIndex.from_frame(history.index)
+        if costs.ndim == 1:
+            return pd.DataFrame({'cost': costs}, index=index)
+        return pd.DataFrame(costs.reshape(len(history), -1), index=index, columns=columns)
+
+    def difference(self, evaluate, before, after, columns=None, regions=None):
+        """
+        Change in cost of a scenario between the prices in effect on two dates, per region
+        (negative when it got cheaper, e.g. after a price cut).
+        """
+        costs = [self.replay(evaluate, columns, positions=self.at(date, regions)).droplevel(['version', 'publication_date'])
+                 for date in (before, after)]
+        return costs[1] - costs[0]
+
+
+_history = None
+_history_version = None
+_history_lock = threading.Lock()
+
+
+def get_price_history():
+    """
+    Every version in the store at S3_PRICE_STORE, reloaded when the store has changed.
+    """
+    global _history, _history_version
+    store = price_store.get_price_store()
+    if store is None:
+        raise LookupError("S3_PRICE_STORE is not set")
+    with _history_lock:
+        data_version = store.data_version()
+        if _history is None or data_version != _history_version:
+            _history = PriceHistory.from_store(store)
+            _history_version = data_version
+            logger.info("Loaded %d price versions", len(_history))
+    return _history
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Add past S3 offer files to the price history")
+    parser.add_argument('command', choices=['add', 'list'])
+    parser.add_argument('offers', nargs='*', help='offer files to add')
+    parser.add_argument('--store', default=None, help='store file (default: $S3_PRICE_STORE)')
+    parser.add_argument('--region', action='append', help='regions to add (default: every region)')
+    args = parser.parse_intermixed_args(argv)
+
+    path = args.store or os.environ.get('S3_PRICE_STORE')
+    if not path:
+        parser.error('--store or S3_PRICE_STORE is required')
+    store = price_store.PriceStore(path)
+    if args.command == 'add':
+        for offer in args.offers:
+            start = time.perf_counter()
+            added = price_store.refresh_from_offer(store, offer, args.region or list(pricing.region_code))
+            print(f"{offer}: added {len(added)} regions in {time.perf_counter() - start:.1f}s")
+    else:
+        start = time.perf_counter()
+        history = PriceHistory.from_store(store, regions=args.region)
+        print(history.index.groupby('region').agg(versions=('version', 'count'), first=('publication_date', 'min'),
+                                                  last=('publication_date', 'max')).to_string())
+        print(f"Loaded {len(history)} versions in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
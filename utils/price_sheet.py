@@ -0,0 +1,179 @@
+# price_sheet.py
+import functools
+import hashlib
+
+import numpy as np
+import utils.price_store as price_store
+import utils.pricing as pricing
+import utils.telemetry as telemetry
+import utils.tiers as tiers
+from utils.cache import TTLCache
+
+# Row order of every price sheet, matching the storage class selectors on the pages
+STORAGE_CLASSES = list(pricing.s3_storage_classes.values())
+STORAGE_CLASS_NAMES = list(pricing.s3_storage_classes.keys())
+DIMENSIONS = list(pricing.price_dimension_scale.keys())
+
+CLASS_INDEX = {code: i for i, code in enumerate(STORAGE_CLASSES)}
+CLASS_INDEX.update({name: i for i, name in enumerate(STORAGE_CLASS_NAMES)})
+DIMENSION_INDEX = {dimension: i for i, dimension in enumerate(DIMENSIONS)}
+
+
+class PriceSheet:
+    """
+    Every price dimension of every storage class in one region, as a dense
+    (storage class x dimension) float table in the same units as the get_s3_* getters.
+
+    Dimensions a class does not have (e.g. retrieval for S3 Standard), and prices the
+    Price List has no product for, are 0.0 and flagged False in `available`; check
+    `unpriced` (or validate_priced) before pricing a scenario, so a missing price is never
+    shown as free. The full storage tier ladder of every class is kept in `storage_ladders`
+    (dense, zero-padded begin/end/rate arrays).
+
+    `version` is a fingerprint of the region and every price, so results computed from
+    the sheet can be cached until the prices change.
+
+    A sheet can also hold a stack of tables and ladders with a leading axis (e.g. price
+    versions, see utils/price_history.py); its methods then return one result per table.
+    """
+
+    def __init__(self, region, table, available, storage_ladders=None):
+        self.region = region
+        self.table = table
+        self.available = available
+        if storage_ladders is None:
+            storage_ladders = tiers.stack_ladders([tiers.TierLadder.flat(rate) for rate in table[:, DIMENSION_INDEX['storage']]])
+        self.storage_ladders = storage_ladders
+        digest = hashlib.sha1(region.encode('utf-8'))
+        for values in (table, available, *storage_ladders):
+            digest.update(np.ascontiguousarray(values).tobytes())
+        self.version = digest.hexdigest()[:16]
+
+    @classmethod
+    @telemetry.timed('price_sheet.fetch')
+    def fetch(cls, region):
+        cells = []
+        filters_list = []
+        for i, storage_class in enumerate(STORAGE_CLASSES):
+            for dimension in s3_class_dimensions(storage_class):
+                cells.append((i, DIMENSION_INDEX[dimension]))
+                filters_list.append(pricing.build_price_filter(storage_class, dimension, region))
+
+        table = np.zeros((len(STORAGE_CLASSES), len(DIMENSIONS)))
+        available = np.zeros(table.shape, dtype=bool)
+        for (i, j), price in zip(cells, pricing.get_s3_pricing_batch(filters_list)):
+            if price is not None:
+                table[i, j] = price * pricing.price_dimension_scale[DIMENSIONS[j]]
+                available[i, j] = True
+
+        storage_filters = [pricing.build_price_filter(storage_class, 'storage', region) for storage_class in STORAGE_CLASSES]
+        ladders = pricing.get_s3_pricing_tiers_batch(storage_filters)
+        ladders = [ladder if ladder is not None else tiers.TierLadder.flat(0.0) for ladder in ladders]
+        return cls(region, table, available, tiers.stack_ladders(ladders))
+
+    @classmethod
+    def from_price_dimensions(cls, region, price_dimensions):
+        """
+        Sheet of a region from resolved price dimensions, {filter cache key: price dimensions or None}
+        (e.g. a price version of utils/price_store.py), without any Price List lookup.
+        """
+        table = np.zeros((len(STORAGE_CLASSES), len(DIMENSIONS)))
+        available = np.zeros(table.shape, dtype=bool)
+        ladders = [tiers.TierLadder.flat(0.0)] * len(STORAGE_CLASSES)
+        for (i, j), key in region_filter_keys(region).items():
+            dimensions = price_dimensions.get(key)
+            if dimensions:
+                table[i, j] = pricing.first_tier(dimensions)[2] * pricing.price_dimension_scale[DIMENSIONS[j]]
+                available[i, j] = True
+                if j == DIMENSION_INDEX['storage']:
+                    ladders[i] = tiers.TierLadder.from_dimensions(dimensions)
+        return cls(region, table, available, tiers.stack_ladders(ladders))
+
+    def price(self, storage_class, dimension):
+        return self.table[..., CLASS_INDEX[storage_class], DIMENSION_INDEX[dimension]]
+
+    def column(self, dimension, storage_classes=None):
+        """
+        Prices of one dimension for the given storage classes (codes or display names), as an array.
+        """
+        values = self.table[..., DIMENSION_INDEX[dimension]]
+        if storage_classes is None:
+            return values
+        return values[..., class_indices(storage_classes)]
+
+    def priced(self, storage_classes, dimensions=None):
+        """
+        Whether the sheet has every price of the given dimensions (default: every dimension the
+        class has) for each storage class, as a bool array over storage_classes.
+        """
+        class_idx = class_indices(storage_classes)
+        needed = APPLICABLE[class_idx]
+        if dimensions is not None:
+            needed = needed & np.isin(DIMENSIONS, dimensions)
+        return ~(needed & ~self.available[..., class_idx, :]).any(axis=-1)
+
+    def unpriced(self, storage_classes, dimensions=None):
+        """
+        The storage classes (as given) missing a price of any of the dimensions in this region,
+        in any table of a stacked sheet.
+        """
+        priced = self.priced(storage_classes, dimensions).reshape(-1, len(storage_classes)).all(axis=0)
+        return [storage_class for storage_class, ok in zip(storage_classes, priced) if not ok]
+
+    def storage_cost(self, storage_classes, volumes_gb):
+        """
+        Tier-aware monthly storage cost of each volume (GB-month) for each storage class.
+        volumes_gb broadcasts against the classes: shape (..., len(storage_classes)).
+        """
+        begins, ends, rates = (ladder[..., class_indices(storage_classes), :] for ladder in self.storage_ladders)
+        return tiers.tiered_cost(volumes_gb, begins, ends, rates)
+
+    def blended_storage_rate(self, storage_classes, volumes_gb):
+        """
+        Average storage price per GB-month at each volume for each storage class.
+        """
+        begins, ends, rates = (ladder[..., class_indices(storage_classes), :] for ladder in self.storage_ladders)
+        volumes_gb = np.broadcast_to(np.asarray(volumes_gb, dtype=float), np.broadcast_shapes(np.shape(volumes_gb), rates.shape[:-1]))
+        return tiers.blended_rate(volumes_gb, begins, ends, rates)
+
+    def to_frame(self, storage_classes=None):
+        import pandas as pd
+
+        rows = STORAGE_CLASS_NAMES if storage_classes is None else list(storage_classes)
+        return pd.DataFrame(self.table[class_indices(rows)], index=rows, columns=DIMENSIONS)
+
+
+# Function to list the price dimensions a storage class has filters for
+def s3_class_dimensions(storage_class):
+    return [dimension for dimension in DIMENSIONS if dimension in pricing.s3_req_filters[storage_class]]
+
+# Dimensions each class has a Price List filter for, (storage class x dimension)
+APPLICABLE = np.array([[dimension in s3_class_dimensions(storage_class) for dimension in DIMENSIONS] for storage_class in STORAGE_CLASSES])
+
+# Function to validate that a sheet has every price a scenario needs; returns an error message, or None
+def validate_priced(sheet, storage_classes, dimensions=None):
+    unpriced = sheet.unpriced(storage_classes, dimensions)
+    if unpriced:
+        return f"No prices found in {sheet.region} for {', '.join(unpriced)}"
+    return None
+
+# Function to map the (class, dimension) cells of a region's price sheet to their Price List filter cache keys
+@functools.lru_cache(maxsize=None)
+def region_filter_keys(region):
+    return {
+        (i, DIMENSION_INDEX[dimension]): pricing.filter_cache_key(pricing.build_price_filter(storage_class, dimension, region))
+        for i, storage_class in enumerate(STORAGE_CLASSES) for dimension in s3_class_dimensions(storage_class)
+    }
+
+# Function to convert storage class codes or display names to row indices of a price sheet
+def class_indices(storage_classes):
+    return np.array([CLASS_INDEX[storage_class] for storage_class in storage_classes], dtype=np.intp)
+
+
+price_sheets = TTLCache(maxsize=len(pricing.region_code), ttl=pricing.price_cache.ttl)
+
+# Function to get the (cached) price sheet of a region
+def get_price_sheet(region):
+    # Picks up a refreshed price store first, which clears the cached sheets
+    price_store.snapshot()
+    return price_sheets.get_or_compute(region, lambda: PriceSheet.fetch(region))
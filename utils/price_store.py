@@ -0,0 +1,330 @@
+# price_store.py
+"""
+Persistent SQLite store of the resolved S3 prices, so a restarted app starts with warm prices.
+
+Every price the app resolves (the price dimensions of one Price List filter) is stored per region
+and offer version, tagged with the offer's publication date. `current` points each region at its
+latest version; older versions are kept for history. A refresh only downloads the regions whose
+offer version changed, and writes each new version in a single transaction that also moves the
+`current` pointer, so readers (in WAL mode, never blocked by the writer) see either the old or
+the new prices of a region, never a mix.
+
+The app loads the current prices of every region with one query into memory (see snapshot) and
+picks up a refresh made by another process within S3_PRICE_STORE_CHECK seconds of the next price
+lookup: reloading the snapshot clears the caches of resolved prices, price sheets and
+Intelligent-Tiering prices, which are checked on every price sheet and Intelligent-Tiering lookup.
+
+Usage:
+python -m utils.price_store refresh [--offer index.json] [region ...]
+python -m utils.price_store versions
+"""
+import argparse
+import datetime
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+import utils.catalog as catalog
+import utils.pricing as pricing
+import utils.telemetry as telemetry
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS versions (
+    region TEXT NOT NULL,
+    version TEXT NOT NULL,
+    publication_date TEXT,
+    source TEXT,
+    loaded_at TEXT NOT NULL,
+    PRIMARY KEY (region, version)
+);
+CREATE INDEX IF NOT EXISTS versions_by_date ON versions (publication_date);
+CREATE TABLE IF NOT EXISTS prices (
+    region TEXT NOT NULL,
+    version TEXT NOT NULL,
+    filter_key TEXT NOT NULL,
+    dimensions TEXT,
+    PRIMARY KEY (region, version, filter_key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS current (
+    region TEXT PRIMARY KEY,
+    version TEXT NOT NULL
+);
+"""
+
+# Sentinel of snapshot lookups for filters the store has no entry for
+MISSING = object()
+
+logger = telemetry.get_logger('price_store')
+
+
+# Function to list every Price List filter the app resolves for a region
+def region_filters(region):
+    import utils.price_sheet as price_sheet
+
+    filters = []
+    for storage_class in price_sheet.STORAGE_CLASSES:
+        for dimension in price_sheet.s3_class_dimensions(storage_class):
+            filters.append(pricing.build_price_filter(storage_class, dimension, region))
+    for tier in pricing.s3_int_tier_filters:
+        filters.append(pricing.build_int_price_filter(tier, region))
+    return filters
+
+
+def encode_key(filters):
+    return json.dumps(pricing.filter_cache_key(filters))
+
+
+def _encode_dimensions(price_dimensions):
+    return json.dumps(price_dimensions) if price_dimensions is not None else None
+
+
+def _decode_dimensions(value):
+    return [tuple(dimension) for dimension in json.loads(value)] if value is not None else None
+
+
+class PriceStore:
+    """
+    SQLite price store at `path`, with one connection per thread.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._watch = None
+        self._watch_lock = threading.Lock()
+        with self.connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def data_version(self):
+        """
+        Changes whenever the store is written to (by any thread or process) after the first call.
+        """
+        # data_version is per connection and ignores the connection's own writes, so watch from one that never writes
+        with self._watch_lock:
+            if self._watch is None:
+                self._watch = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            return self._watch.execute('PRAGMA data_version').fetchone()[0]
+
+    def current_versions(self):
+        """
+        {region: (version, publication date)} of the current prices.
+        """
+        rows = self.connect().execute(
+            'SELECT c.region, c.version, v.publication_date FROM current c '
+            'JOIN versions v ON v.region = c.region AND v.version = c.version'
+        )
+        return {region: (version, publication_date) for region, version, publication_date in rows}
+
+    def versions(self, region=None):
+        """
+        Every stored (region, version, publication date, source, loaded at), oldest first.
+        """
+        query = 'SELECT region, version, publication_date, source, loaded_at FROM versions'
+        if region is not None:
+            return self.connect().execute(query + ' WHERE region = ? ORDER BY version', (region,)).fetchall()
+        return self.connect().execute(query + ' ORDER BY region, version').fetchall()
+
+    def load_current(self):
+        """
+        The current price dimensions of every stored filter, {filter key: price dimensions or None}.
+        """
+        rows = self.connect().execute(
+            'SELECT p.filter_key, p.dimensions FROM prices p '
+            'JOIN current c ON c.region = p.region AND c.version = p.version'
+        )
+        return {tuple(tuple(item) for item in json.loads(key)): _decode_dimensions(value) for key, value in rows}
+
+    def load_version(self, region, version):
+        rows = self.connect().execute(
+            'SELECT filter_key, dimensions FROM prices WHERE region = ? AND version = ?', (region, version)
+        )
+        return {tuple(tuple(item) for item in json.loads(key)): _decode_dimensions(value) for key, value in rows}
+
+    def write_version(self, region, version, publication_date, prices, source=None):
+        """
+        Store the prices ({filter key JSON: price dimensions or None}) of a region's offer
+        version and, unless the region already has a later version, make it the current one,
+        in one transaction. Versions are Price List publication ids and sort by date.
+        """
+        conn = self.connect()
+        with conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO versions VALUES (?, ?, ?, ?, ?)',
+                (region, version, publication_date, source,
+                 datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'))
+            )
+            conn.execute('DELETE FROM prices WHERE region = ? AND version = ?', (region, version))
+            conn.executemany(
+                'INSERT INTO prices VALUES (?, ?, ?, ?)',
+                [(region, version, key, _encode_dimensions(dimensions)) for key, dimensions in prices.items()]
+            )
+            # Importing an older offer (see utils/price_history.py) adds history without moving `current` back
+            conn.execute(
+                'INSERT INTO current VALUES (?, ?) ON CONFLICT (region) DO UPDATE SET version = excluded.version '
+                'WHERE excluded.version >= current.version',
+                (region, version)
+            )
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+# Function to resolve every filter the app needs for a region from a loaded offer file
+def resolve_region(price_catalog, region):
+    return {encode_key(filters): price_catalog.lookup(filters) for filters in region_filters(region)}
+
+
+def refresh_from_offer(store, path, regions, source=None):
+    """
+    Store the prices of the regions from a local offer file, skipping regions that already have
+    the file's version. Returns the refreshed regions.
+    """
+    price_catalog = catalog.load_offer_file(path)
+    version = price_catalog.version or price_catalog.publication_date or os.path.basename(path)
+    stored = {region for region, stored_version, *_ in store.versions() if stored_version == version}
+    refreshed = []
+    for region in regions:
+        prices = resolve_region(price_catalog, region)
+        if region in stored or not any(prices.values()):
+            continue
+        store.write_version(region, version, price_catalog.publication_date, prices, source=source or os.path.basename(path))
+        refreshed.append(region)
+    return refreshed
+
+
+def refresh_from_offers(store, regions=None):
+    """
+    Download the regional offer files whose version changed since the last refresh (delta
+    refresh from the region index) and store their prices. Returns the refreshed regions.
+    """
+    latest = catalog.fetch_region_index()
+    regions = [region for region in (regions or pricing.region_code) if region in latest]
+    current = store.current_versions()
+    refreshed = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for region in regions:
+            version, url = latest[region]
+            if current.get(region, (None,))[0] == version:
+                logger.info("%s is up to date (%s)", region, version)
+                continue
+            with telemetry.span('price_store.refresh_region', region=region):
+                path = catalog.download_url(url, os.path.join(tmp_dir, f"{region}.json"))
+                price_catalog = catalog.load_offer_file(path)
+                store.write_version(region, version, price_catalog.publication_date,
+                                    resolve_region(price_catalog, region), source=url)
+                os.remove(path)
+            logger.info("Stored %s prices of %s", version, region)
+            refreshed.append(region)
+    return refreshed
+
+
+_store = None
+_store_lock = threading.Lock()
+_snapshot = None
+_snapshot_version = None
+_checked_at = 0.0
+
+
+def get_price_store():
+    """
+    The store at S3_PRICE_STORE, or None when it is not set.
+    """
+    global _store
+    path = os.environ.get('S3_PRICE_STORE')
+    if not path:
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = PriceStore(path)
+    return _store
+
+
+def _clear_price_caches():
+    # Everything resolved from the previous snapshot; computed results are keyed by PriceSheet.version
+    import utils.intelligent_tiering as intelligent_tiering
+    import utils.price_sheet as price_sheet
+
+    pricing.price_cache.clear()
+    price_sheet.price_sheets.clear()
+    intelligent_tiering.int_prices.clear()
+
+
+def snapshot():
+    """
+    In-memory copy of the store's current prices, reloaded when the store has changed (checked
+    at most every S3_PRICE_STORE_CHECK seconds), which also clears the cached prices resolved from
+    the previous copy. None when no store is configured.
+    """
+    global _snapshot, _snapshot_version, _checked_at
+    store = get_price_store()
+    if store is None:
+        return None
+    now = time.monotonic()
+    if _snapshot is not None and now - _checked_at < float(os.environ.get('S3_PRICE_STORE_CHECK', 60)):
+        return _snapshot
+    with _store_lock:
+        if _snapshot is None or now - _checked_at >= float(os.environ.get('S3_PRICE_STORE_CHECK', 60)):
+            data_version = store.data_version()
+            if _snapshot is None or data_version != _snapshot_version:
+                reload = _snapshot is not None
+                with telemetry.span('price_store.load'):
+                    _snapshot = store.load_current()
+                _snapshot_version = data_version
+                logger.info("Loaded %d stored prices from %s", len(_snapshot), store.path)
+                if reload:
+                    _clear_price_caches()
+            _checked_at = now
+    return _snapshot
+
+
+# Function to get the stored price dimensions of a filter, or MISSING when the store does not have it
+def lookup(filters):
+    prices = snapshot()
+    if prices is None:
+        return MISSING
+    return prices.get(pricing.filter_cache_key(filters), MISSING)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Refresh or inspect the persistent S3 price store")
+    parser.add_argument('command', choices=['refresh', 'versions'])
+    parser.add_argument('regions', nargs='*', help='regions to refresh (default: every region)')
+    parser.add_argument('--store', default=os.environ.get('S3_PRICE_STORE'), help='store file (default: $S3_PRICE_STORE)')
+    parser.add_argument('--offer', help='refresh from a local offer file instead of downloading the regional offers')
+    args = parser.parse_intermixed_args(argv)
+    if not args.store:
+        parser.error('--store or S3_PRICE_STORE is required')
+
+    store = PriceStore(args.store)
+    if args.command == 'refresh':
+        start = time.perf_counter()
+        if args.offer:
+            refreshed = refresh_from_offer(store, args.offer, args.regions or list(pricing.region_code))
+        else:
+            refreshed = refresh_from_offers(store, args.regions)
+        print(f"Refreshed {len(refreshed)} regions in {time.perf_counter() - start:.1f}s: {', '.join(refreshed) or '-'}")
+    else:
+        current = store.current_versions()
+        for region, version, publication_date, source, loaded_at in store.versions():
+            marker = '*' if current.get(region, (None,))[0] == version else ' '
+            print(f"{marker} {region:16} {version:20} {publication_date or '-':26} {loaded_at}  {source or ''}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,15 @@
-import boto3
 import json
+import os
+import threading
+import utils.catalog as catalog
+import utils.telemetry as telemetry
+from utils.cache import TTLCache
+from utils.pricing_client import PricingClient
+from utils.tiers import TierLadder
 from collections import OrderedDict
 
+logger = telemetry.get_logger('pricing')
+
 region_code = {
     'us-east-1': 'USE1', # US East (N. Virginia)
     'us-east-2': 'USE2', # US East (Ohio)
@@ -200,27 +208,164 @@ s3_req_filters = {
     }
 }
 
-pricing = boto3.client('pricing',region_name='us-east-1')
+# Intelligent-Tiering access tiers, monitoring and automation is charged per object
+s3_int_tier_filters = {
+    'frequent': {
+        'usageType': 'TimedStorage-INT-FA-ByteHrs'
+    },
+    'infrequent': {
+        'usageType': 'TimedStorage-INT-IA-ByteHrs'
+    },
+    'instant': {
+        'usageType': 'TimedStorage-INT-AIA-ByteHrs'
+    },
+    'archive': {
+        'usageType': 'TimedStorage-INT-AA-ByteHrs'
+    },
+    'deep': {
+        'usageType': 'TimedStorage-INT-DAA-ByteHrs'
+    },
+    'monitoring': {
+        'usageType': 'Monitoring-Automation-INT'
+    }
+}
+
+# Function to create the boto3 Price List client. boto3/botocore are only imported on first use,
+# and the connection pool is sized to the number of concurrent lookups.
+# With S3_PRICING_STUB set, recorded responses are replayed instead (see utils/pricing_stub.py).
+def create_pricing_client():
+    max_attempts = int(os.environ.get('S3_PRICING_MAX_ATTEMPTS', 5))
+    if os.environ.get('S3_PRICING_STUB'):
+        import utils.pricing_stub as pricing_stub
+        return pricing_stub.from_env(max_attempts=max_attempts)
 
-## Function to get S3 pricing
-def get_s3_pricing(filters):
-    response = pricing.get_products(
-        ServiceCode='AmazonS3',
-        Filters=filters
+    import boto3
+    from botocore.config import Config
+
+    config = Config(
+        max_pool_connections=pricing_client.max_workers,
+        connect_timeout=5,
+        read_timeout=pricing_client.timeout,
+        retries={'max_attempts': max_attempts, 'mode': 'standard'}
     )
-    if response['PriceList'] == {}:
-        print('critical:', 'No products returned for {filter}')
+    return boto3.client('pricing', region_name='us-east-1', config=config)
+
+# Paginated, concurrent wrapper around the Price List API client, created lazily on first lookup.
+# S3_PRICING_CONCURRENCY bounds parallel lookups; S3_PRICING_TIMEOUT is the batch timeout in seconds.
+pricing_client = PricingClient(
+    client_factory=create_pricing_client,
+    max_workers=int(os.environ.get('S3_PRICING_CONCURRENCY', 8)),
+    timeout=float(os.environ.get('S3_PRICING_TIMEOUT', 30))
+)
+
+def get_pricing_client_stats():
+    return pricing_client.stats()
 
-    price_list = json.loads(response['PriceList'][0])
+# Local price catalog built from the AmazonS3 bulk offer file (see utils/catalog.py).
+# Set S3_PRICE_CATALOG to the downloaded JSON/CSV offer file to resolve prices without the network.
+price_catalog = None
+price_catalog_lock = threading.Lock()
+
+def load_price_catalog(path):
+    global price_catalog
+    with telemetry.span('pricing.load_catalog'):
+        price_catalog = catalog.load_offer_file(path)
+    price_cache.clear()
+    logger.info("Loaded %d S3 products from %s", len(price_catalog), path)
+    return price_catalog
+
+def get_price_catalog():
+    if price_catalog is None and os.environ.get('S3_PRICE_CATALOG'):
+        # Concurrent lookups on a cold start must not each load the offer file
+        with price_catalog_lock:
+            if price_catalog is None:
+                load_price_catalog(os.environ['S3_PRICE_CATALOG'])
+    return price_catalog
+
+# Function to get the price dimensions of the first matching product from the Price List API.
+# The filters of a price dimension name a single product (location, usage type and operation), so
+# only the first two products are fetched: the first is priced, a second means the filters are
+# ambiguous and is logged rather than paged through.
+def get_s3_price_dimensions(filters):
+    with telemetry.span('pricing.api_call'):
+        products = pricing_client.get_products(filters, max_products=2)
+    if not products:
+        logger.warning("No products returned for %s", filters)
+        return None
+    if len(products) > 1:
+        logger.warning("Several products returned for %s, using the first", filters)
+
+    price_list = products[0]
+    price_dimensions = []
     for price_dimension in price_list['terms']['OnDemand'].values():
-        for description, rate_value in price_dimension['priceDimensions'].items():
-            #Ensure we are only getting one price from tiered storage costs
-            if rate_value["beginRange"] == "0":
-                pricing_data = float(rate_value["pricePerUnit"]["USD"])
-                unit = rate_value["unit"]
-    print('info:', f"Price for {description} is ${pricing_data} per {unit}")
+        for rate_value in price_dimension['priceDimensions'].values():
+            price_dimensions.append(catalog.parse_price_dimension(rate_value))
+    return price_dimensions
+
+# Process-wide cache of resolved price dimensions, shared by every Streamlit session.
+# S3_PRICE_CACHE_TTL is in seconds; S3_PRICE_CACHE_SIZE bounds the number of cached filters.
+price_cache = TTLCache(
+    maxsize=int(os.environ.get('S3_PRICE_CACHE_SIZE', 4096)),
+    ttl=float(os.environ.get('S3_PRICE_CACHE_TTL', 86400))
+)
+
+def configure_price_cache(maxsize=None, ttl=None):
+    price_cache.configure(maxsize=maxsize, ttl=ttl)
+
+def get_price_cache_stats():
+    return price_cache.stats()
+
+# Cache and Price List client stats are exported with the other metrics
+telemetry.metrics.register_collector(lambda: {
+    **{f"price_cache_{key}": value for key, value in get_price_cache_stats().items()},
+    **{f"pricing_client_{key}": value for key, value in get_pricing_client_stats().items()},
+})
+
+# Function to build an order-independent cache key from a list of Price List filters
+def filter_cache_key(filters):
+    return tuple(sorted((item.get('Type', 'TERM_MATCH'), catalog.normalize_field(item['Field']), item['Value']) for item in filters))
+
+# Function to resolve price dimensions from the local catalog, the price store (S3_PRICE_STORE,
+# see utils/price_store.py) or the Price List API, in that order
+def resolve_price_dimensions(filters):
+    def compute():
+        local_catalog = get_price_catalog()
+        if local_catalog is None and os.environ.get('S3_PRICE_STORE'):
+            import utils.price_store as price_store
+
+            stored = price_store.lookup(filters)
+            if stored is not price_store.MISSING:
+                telemetry.count('price_lookups', source='store')
+                return stored
+        source = 'catalog' if local_catalog is not None else 'api'
+        telemetry.count('price_lookups', source=source)
+        with telemetry.span('pricing.lookup', source=source):
+            if local_catalog is not None:
+                return local_catalog.lookup(filters)
+            return get_s3_price_dimensions(filters)
+    return price_cache.get_or_compute(filter_cache_key(filters), compute)
+
+# Function to pick the first tier of tiered price dimensions (e.g. storage: first 50 TB/month)
+def first_tier(price_dimensions):
+    return next((dimension for dimension in price_dimensions if dimension[0] == 0), price_dimensions[0])
+
+## Function to get S3 pricing
+def get_s3_pricing(filters):
+    price_dimensions = resolve_price_dimensions(filters)
+    if not price_dimensions:
+        raise LookupError(f'No S3 price found for {filters}')
+
+    _, _, pricing_data, unit, description = first_tier(price_dimensions)
+    logger.debug("Price for %s is $%s per %s", description, pricing_data, unit)
     return pricing_data
 
+# Function to get the complete tier ladder (begin/end range and rate) of a price
+def get_s3_pricing_tiers(filters):
+    price_dimensions = resolve_price_dimensions(filters)
+    if not price_dimensions:
+        raise LookupError(f'No S3 price found for {filters}')
+    return TierLadder.from_dimensions(price_dimensions)
+
 # Function to append filter for AWS Price List
 def add_pricing_filter(filter, field, value):
     if filter is None:
@@ -230,72 +375,110 @@ def add_pricing_filter(filter, field, value):
     # print('filter info', updated_filter)
     return updated_filter
 
+# Scale applied to each price dimension: request prices are shown per 1000 requests
+price_dimension_scale = {
+    'PUT': 1,
+    'storage': 1,
+    'GET': 1000,
+    'retrieval': 1,
+    'retrievalReq': 1000,
+    'transition': 1000
+}
+
+# Function to build the Price List filter for one price dimension of a storage class
+def build_price_filter(storage_class, dimension, region):
+    filter = [{'Type': 'TERM_MATCH', 'Field': 'regionCode', 'Value': region}]
+    prefix = ""
+    if dimension == 'storage' and region != 'us-east-1':
+        prefix = region_code[region] + "-"
+    for field, value in s3_req_filters[storage_class][dimension].items():
+        filter = add_pricing_filter(filter, field, prefix+value)
+    return filter
+
+# Function to resolve the first-tier price for a list of filters in one batch, None where no product matches
+def get_s3_pricing_batch(filters_list):
+    def get_price_or_none(filters):
+        try:
+            return get_s3_pricing(filters)
+        except LookupError as error:
+            logger.warning("%s", error)
+            return None
+
+    unique_filters = {filter_cache_key(filters): filters for filters in filters_list}
+    with telemetry.span('pricing.batch'):
+        prices = dict(zip(unique_filters, pricing_client.map(get_price_or_none, unique_filters.values())))
+    return [prices[filter_cache_key(filters)] for filters in filters_list]
+
+# Function to resolve the tier ladders for a list of filters in one batch, None where no product matches
+def get_s3_pricing_tiers_batch(filters_list):
+    def get_tiers_or_none(filters):
+        try:
+            return get_s3_pricing_tiers(filters)
+        except LookupError as error:
+            logger.warning("%s", error)
+            return None
+
+    unique_filters = {filter_cache_key(filters): filters for filters in filters_list}
+    with telemetry.span('pricing.batch'):
+        ladders = dict(zip(unique_filters, pricing_client.map(get_tiers_or_none, unique_filters.values())))
+    return [ladders[filter_cache_key(filters)] for filters in filters_list]
+
 # Function to retrieve ingestion pricing
 def get_s3_put_cost(storage_class, region):
-    filter = [{'Type': 'TERM_MATCH', 'Field': 'regionCode', 'Value': region}]
-    for field, value in s3_req_filters[storage_class]['PUT'].items():
-        filter = add_pricing_filter(filter, field, value)
-    put_cost = get_s3_pricing(filter)
+    put_cost = get_s3_pricing(build_price_filter(storage_class, 'PUT', region))
     return put_cost
 
 # Function to retrieve storage pricing
 def get_s3_storage_cost(storage_class, region):
-    filter = [{'Type': 'TERM_MATCH', 'Field': 'regionCode', 'Value': region}]
-    prefix = ""
-    if region != 'us-east-1':
-        prefix = region_code[region] + "-"
-    for field, value in s3_req_filters[storage_class]['storage'].items():
-        filter = add_pricing_filter(filter, field, prefix+value)
-    storage_cost = get_s3_pricing(filter)
+    storage_cost = get_s3_pricing(build_price_filter(storage_class, 'storage', region))
     return storage_cost
 
-# Function to retrieve storage pricing
-def get_s3_int_storage_cost(storage_class, region):
+# Function to retrieve the tiered storage pricing ladder per GB-month
+def get_s3_storage_tiers(storage_class, region):
+    return get_s3_pricing_tiers(build_price_filter(storage_class, 'storage', region))
+
+# Function to build the Price List filter for an Intelligent-Tiering access tier (or 'monitoring')
+def build_int_price_filter(tier, region):
     filter = [{'Type': 'TERM_MATCH', 'Field': 'regionCode', 'Value': region}]
     prefix = ""
     if region != 'us-east-1':
         prefix = region_code[region] + "-"
-    for field, value in s3_req_filters[storage_class]['storage'].items():
+    for field, value in s3_int_tier_filters[tier].items():
         filter = add_pricing_filter(filter, field, prefix+value)
-    storage_cost = get_s3_pricing(filter)
+    return filter
+
+# Function to retrieve Intelligent-Tiering storage pricing of an access tier
+def get_s3_int_storage_cost(tier, region):
+    storage_cost = get_s3_pricing(build_int_price_filter(tier, region))
     return storage_cost
 
+# Function to retrieve Intelligent-Tiering monitoring and automation cost per 1000 objects
+def get_s3_int_monitoring_cost(region):
+    monitoring_cost = get_s3_pricing(build_int_price_filter('monitoring', region)) * 1000
+    return monitoring_cost
+
 # Function to retrieve get cost
 def get_s3_get_cost(storage_class, region):
-    filter = [{'Type': 'TERM_MATCH', 'Field': 'regionCode', 'Value': region}]
-    for field, value in s3_req_filters[storage_class]['GET'].items():
-        filter = add_pricing_filter(filter, field, value)
-    get_cost = get_s3_pricing(filter) * 1000
+    get_cost = get_s3_pricing(build_price_filter(storage_class, 'GET', region)) * 1000
     return get_cost
 
 # Function to retrieve retrieval gb cost
 def get_s3_retrieval_cost(storage_class, region):
-    filter = [{'Type': 'TERM_MATCH', 'Field': 'regionCode', 'Value': region}]
     if 'retrieval' in s3_req_filters.get(storage_class, {}):
-        print(s3_req_filters[storage_class]['retrieval'].items())
-        for field, value in s3_req_filters[storage_class]['retrieval'].items():
-            filter = add_pricing_filter(filter, field, value)
-        print(filter)
-        retrieval_cost = get_s3_pricing(filter)
+        retrieval_cost = get_s3_pricing(build_price_filter(storage_class, 'retrieval', region))
     else:
         retrieval_cost = float(0.00)
     return retrieval_cost
 
 # Function to retrieve retrieval cost for 1000 requests
 def get_s3_retrieval_req_cost(storage_class, region):
-    filter = [{'Type': 'TERM_MATCH', 'Field': 'regionCode', 'Value': region}]
     if 'retrievalReq' in s3_req_filters.get(storage_class, {}):
-        for field, value in s3_req_filters[storage_class]['retrievalReq'].items():
-            filter = add_pricing_filter(filter, field, value)
-        retrieval_req_cost = get_s3_pricing(filter) * 1000
+        retrieval_req_cost = get_s3_pricing(build_price_filter(storage_class, 'retrievalReq', region)) * 1000
     else :
         retrieval_req_cost = float(0.00)
     return retrieval_req_cost
 
 # Function to retrieve transition cost for 1000 requests
 def get_s3_transition_cost(storage_class, region):
-    filter = [{'Type': 'TERM_MATCH', 'Field': 'regionCode', 'Value': region}]
-    for field, value in s3_req_filters[storage_class]['transition'].items():
-        filter = add_pricing_filter(filter, field, value)
-    storage_cost = get_s3_pricing(filter) * 1000
+    storage_cost = get_s3_pricing(build_price_filter(storage_class, 'transition', region)) * 1000
     return storage_cost
@@ -0,0 +1,149 @@
+# pricing_client.py
+import json
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+
+
+class PricingClient:
+    """
+    Wrapper around the boto3 'pricing' client that follows NextToken through every page
+    and fans independent lookups out over a bounded thread pool.
+
+    Parameters:
+    client: a boto3 (or compatible) pricing client.
+    client_factory (callable): creates the client on first use when no client is given.
+    max_workers (int): maximum number of concurrent Price List calls.
+    timeout (float): seconds to wait for a batch of lookups before giving up.
+    max_results (int): page size requested from get_products.
+    """
+
+    def __init__(self, client=None, client_factory=None, max_workers=8, timeout=30.0, max_results=100):
+        self._client = client
+        self.client_factory = client_factory
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.max_results = max_results
+        self._executor = None
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                self._client = self.client_factory()
+            return self._client
+
+    @client.setter
+    def client(self, client):
+        with self._lock:
+            self._client = client
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='s3-pricing')
+            return self._executor
+
+    def configure(self, max_workers=None, timeout=None):
+        with self._lock:
+            if timeout is not None:
+                self.timeout = timeout
+            if max_workers is not None and max_workers != self.max_workers:
+                self.max_workers = max_workers
+                if self._executor is not None:
+                    self._executor.shutdown(wait=False)
+                    self._executor = None
+                # Rebuild the client so its connection pool matches the new concurrency
+                if self.client_factory is not None:
+                    self._client = None
+
+    def reset_stats(self):
+        with self._lock:
+            self.calls = 0
+            self.pages = 0
+            self.retries = 0
+            self.errors = 0
+            self.latencies = deque(maxlen=10000)
+
+    def _record(self, latency, pages, retries, failed=False):
+        with self._lock:
+            self.calls += 1
+            self.pages += pages
+            self.retries += retries
+            self.errors += int(failed)
+            self.latencies.append(latency)
+
+    def get_products(self, filters, service_code='AmazonS3', max_products=None):
+        """
+        Return every product (parsed JSON) matching the filters, across all pages, or only the
+        first max_products of them, which stops paging as soon as they are fetched.
+        """
+        products = []
+        pages = 0
+        retries = 0
+        start = time.perf_counter()
+        try:
+            page_size = self.max_results if max_products is None else min(self.max_results, max_products)
+            kwargs = {'ServiceCode': service_code, 'Filters': filters, 'MaxResults': page_size}
+            while True:
+                response = self.client.get_products(**kwargs)
+                pages += 1
+                retries += response.get('ResponseMetadata', {}).get('RetryAttempts', 0)
+                products.extend(json.loads(item) if isinstance(item, str) else item for item in response['PriceList'])
+                next_token = response.get('NextToken')
+                if not next_token or (max_products is not None and len(products) >= max_products):
+                    products = products[:max_products]
+                    break
+                kwargs['NextToken'] = next_token
+        except Exception:
+            self._record(time.perf_counter() - start, pages, retries, failed=True)
+            raise
+        self._record(time.perf_counter() - start, pages, retries)
+        return products
+
+    def map(self, fn, items):
+        """
+        Apply fn to every item concurrently and return the results in order.
+        Raises TimeoutError if the batch does not finish within the client timeout.
+        """
+        items = list(items)
+        if len(items) <= 1:
+            return [fn(item) for item in items]
+        futures = [self.executor.submit(fn, item) for item in items]
+        done, not_done = wait(futures, timeout=self.timeout, return_when=FIRST_EXCEPTION)
+        for future in not_done:
+            future.cancel()
+        for future in done:
+            if future.exception() is not None:
+                raise future.exception()
+        if not_done:
+            raise TimeoutError(f"{len(not_done)} of {len(futures)} pricing lookups did not finish within {self.timeout}s")
+        return [future.result() for future in futures]
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self.latencies)
+            return {
+                'calls': self.calls,
+                'pages': self.pages,
+                'retries': self.retries,
+                'errors': self.errors,
+                'max_workers': self.max_workers,
+                'latency_total': sum(latencies),
+                'latency_p50': percentile(latencies, 50),
+                'latency_p95': percentile(latencies, 95),
+                'latency_max': latencies[-1] if latencies else 0.0,
+            }
+
+
+# Function to get the nearest-rank percentile of an already sorted list
+def percentile(values, q):
+    if not values:
+        return 0.0
+    rank = max(0, min(len(values) - 1, math.ceil(q / 100 * len(values)) - 1))
+    return values[rank]
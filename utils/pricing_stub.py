@@ -0,0 +1,176 @@
+# pricing_stub.py
+"""
+Local stand-in for the boto3 'pricing' client, replaying recorded get_products responses.
+
+A recording is a JSON file {"meta": {...}, "responses": [{"filters": [...], "pages": [...]}]}
+where every page is a get_products response body (PriceList items as JSON strings); see
+benchmarks/record_responses.py. Products are re-paginated by the MaxResults of each request,
+unrecorded filters return an empty PriceList like the live API, and every call can be slowed
+down or failed on purpose to measure the pricing code under realistic or worst-case conditions.
+
+Set S3_PRICING_STUB to a recording to use the stub instead of the Price List API, with
+S3_PRICING_STUB_LATENCY / S3_PRICING_STUB_JITTER in milliseconds and S3_PRICING_STUB_ERROR_RATE
+(0 to 1) to inject latency and throttling errors.
+"""
+import json
+import os
+import random
+import threading
+import time
+
+import utils.pricing as pricing
+
+THROTTLING = 'ThrottlingException'
+
+
+class StubClientError(Exception):
+    """
+    Raised for injected errors when botocore is not installed; has the same `response` shape as
+    botocore.exceptions.ClientError.
+    """
+
+    def __init__(self, error_response, operation_name):
+        super().__init__(f"An error occurred ({error_response['Error']['Code']}) when calling the {operation_name} operation: "
+                         f"{error_response['Error']['Message']}")
+        self.response = error_response
+        self.operation_name = operation_name
+
+
+def _client_error(code, message, operation_name='GetProducts'):
+    error_response = {'Error': {'Code': code, 'Message': message}, 'ResponseMetadata': {'HTTPStatusCode': 400}}
+    try:
+        from botocore.exceptions import ClientError
+    except ImportError:
+        return StubClientError(error_response, operation_name)
+    return ClientError(error_response, operation_name)
+
+
+def load_recording(path):
+    with open(path, encoding='utf-8') as fp:
+        return json.load(fp)
+
+
+class StubPricingClient:
+    """
+    botocore-compatible pricing client answering get_products from a recording.
+
+    Parameters:
+    recording (dict): recorded responses, see load_recording.
+    latency (float): seconds added to every attempt.
+    jitter (float): up to this many extra seconds, drawn uniformly per attempt.
+    error_rate (float): probability that an attempt fails with `error_code`.
+    error_code (str): error code of the injected failures.
+    max_attempts (int): attempts per call, like botocore's standard retry mode; a call fails only
+        when every attempt does, and the retries are reported in ResponseMetadata.RetryAttempts.
+    page_size (int): products per page when smaller than the requested MaxResults.
+    seed (int): seed of the latency and error draws, for reproducible runs.
+    """
+
+    def __init__(self, recording, latency=0.0, jitter=0.0, error_rate=0.0, error_code=THROTTLING,
+                 max_attempts=1, page_size=None, seed=None):
+        self.meta = recording.get('meta', {})
+        self.products = {}
+        for response in recording['responses']:
+            items = [item for page in response['pages'] for item in page['PriceList']]
+            self.products[pricing.filter_cache_key(response['filters'])] = items
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_code = error_code
+        self.max_attempts = max(int(max_attempts), 1)
+        self.page_size = page_size
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.attempts = 0
+        self.failures = 0
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        return cls(load_recording(path), **kwargs)
+
+    def with_conditions(self, **kwargs):
+        """
+        A new stub replaying the same responses, with other latency, error or paging settings.
+        """
+        stub = StubPricingClient({'meta': self.meta, 'responses': []}, **kwargs)
+        stub.products = self.products
+        return stub
+
+    def _draw(self):
+        with self._lock:
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+            failed = self.error_rate > 0 and self._random.random() < self.error_rate
+            self.attempts += 1
+            self.failures += int(failed)
+        return delay, failed
+
+    def get_products(self, ServiceCode, Filters=(), FormatVersion='aws_v1', MaxResults=100, NextToken=None):
+        with self._lock:
+            self.calls += 1
+        for attempt in range(self.max_attempts):
+            delay, failed = self._draw()
+            if delay > 0:
+                time.sleep(delay)
+            if not failed:
+                break
+        else:
+            raise _client_error(self.error_code, 'Rate exceeded')
+
+        if ServiceCode != 'AmazonS3':
+            items = []
+        else:
+            items = self.products.get(pricing.filter_cache_key(Filters), [])
+        try:
+            start = int(NextToken) if NextToken else 0
+        except ValueError:
+            raise _client_error('InvalidNextTokenException', 'The pagination token is invalid.')
+        page_size = min(MaxResults, self.page_size) if self.page_size else MaxResults
+        response = {
+            'FormatVersion': FormatVersion,
+            'PriceList': items[start:start + page_size],
+            'ResponseMetadata': {'HTTPStatusCode': 200, 'RetryAttempts': attempt},
+        }
+        if start + page_size < len(items):
+            response['NextToken'] = str(start + page_size)
+        return response
+
+    def stats(self):
+        with self._lock:
+            return {'calls': self.calls, 'attempts': self.attempts, 'injected_errors': self.failures}
+
+
+class RecordingPricingClient:
+    """
+    Wraps a live pricing client and keeps every page it returns, see StubPricingClient.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.responses = {}
+        self._lock = threading.Lock()
+
+    def get_products(self, **kwargs):
+        response = self.client.get_products(**kwargs)
+        key = pricing.filter_cache_key(kwargs['Filters'])
+        with self._lock:
+            entry = self.responses.setdefault(key, {'filters': kwargs['Filters'], 'pages': []})
+            if not kwargs.get('NextToken'):
+                entry['pages'] = []
+            entry['pages'].append({'PriceList': response['PriceList']})
+        return response
+
+    def recording(self, meta=None):
+        return {'meta': meta or {}, 'responses': list(self.responses.values())}
+
+
+# Function to create the stub from the S3_PRICING_STUB* environment variables
+def from_env(max_attempts=1):
+    return StubPricingClient.from_file(
+        os.environ['S3_PRICING_STUB'],
+        latency=float(os.environ.get('S3_PRICING_STUB_LATENCY', 0)) / 1000,
+        jitter=float(os.environ.get('S3_PRICING_STUB_JITTER', 0)) / 1000,
+        error_rate=float(os.environ.get('S3_PRICING_STUB_ERROR_RATE', 0)),
+        max_attempts=max_attempts,
+        seed=int(os.environ['S3_PRICING_STUB_SEED']) if os.environ.get('S3_PRICING_STUB_SEED') else None,
+    )
@@ -0,0 +1,64 @@
+# result_cache.py
+"""
+Process-wide cache of computed page results (cost tables, chart figures), keyed by a hash of
+the normalized inputs that produced them. Identical submissions, from any session, are served
+from the cache instead of rebuilding the DataFrames and figures.
+
+Inputs must include the price version of the PriceSheet used (PriceSheet.version), so results
+are recomputed when prices change. Cached values are shared: callers must not modify them.
+S3_RESULT_CACHE_SIZE bounds the number of cached results; S3_RESULT_CACHE_TTL is in seconds.
+"""
+import hashlib
+import os
+
+import numpy as np
+import utils.telemetry as telemetry
+from utils.cache import TTLCache
+
+results = TTLCache(
+    maxsize=int(os.environ.get('S3_RESULT_CACHE_SIZE', 256)),
+    ttl=float(os.environ.get('S3_RESULT_CACHE_TTL', 3600))
+)
+
+
+def normalize(value):
+    """
+    Canonical, hashable form of an input: sequences become tuples, mappings sorted item tuples,
+    numbers floats (so 1 and 1.0 hit the same entry) and arrays a digest of their contents.
+    """
+    if isinstance(value, dict):
+        return tuple(sorted((str(key), normalize(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(normalize(item) for item in value)
+    if isinstance(value, np.ndarray):
+        return ('ndarray', value.dtype.str, value.shape, hashlib.sha1(np.ascontiguousarray(value).tobytes()).hexdigest())
+    if isinstance(value, (bool, np.bool_)) or value is None:
+        return value
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return float(value)
+    return value
+
+
+def input_key(**inputs):
+    return hashlib.sha256(repr(normalize(inputs)).encode('utf-8')).hexdigest()
+
+
+def get_or_compute(name, compute, **inputs):
+    """
+    Cached result of compute() for the named computation and inputs (keyword arguments).
+    """
+    key = (name, input_key(**inputs))
+    hit = key in results
+    telemetry.count('result_cache_lookups', computation=name, result='hit' if hit else 'miss')
+    return results.get_or_compute(key, compute)
+
+
+def get_result_cache_stats():
+    return results.stats()
+
+
+def configure_result_cache(maxsize=None, ttl=None):
+    results.configure(maxsize=maxsize, ttl=ttl)
+
+
+telemetry.metrics.register_collector(lambda: {f"result_cache_{key}": value for key, value in get_result_cache_stats().items()})
@@ -0,0 +1,241 @@
+# scenarios.py
+"""
+The cost scenarios of the pages as pure functions of their inputs and a PriceSheet, with no
+Streamlit session state, so they can be run headless (see utils/batch.py).
+
+Validation functions return an error message, or None if the input is valid. Costs of a storage
+class the sheet has no price for are NaN (see PriceSheet.unpriced), never 0.0.
+"""
+import numpy as np
+import pandas as pd
+import utils.cost_kernel as cost_kernel
+import utils.lifecycle as lifecycle
+import utils.multipart as multipart
+import utils.object_sizes as object_sizes
+import utils.price_sheet as price_sheet
+import utils.telemetry as telemetry
+
+LARGEST_FILE_SIZE_MB = multipart.MAX_OBJECT_MB
+MAX_PARTS = multipart.MAX_PARTS
+
+# Backup rows
+PUT_PER_FILE = 'PUT Request Cost per Backup File'
+STORAGE_PER_GB_MONTH = 'Storage Cost per GB-month'
+STORAGE_PER_GB_DAY = 'CostGB-Day'
+YEARLY_STORAGE = 'Yearly Total Storage Cost'
+YEARLY_PUT = 'Yearly Total PUT Requests Cost'
+PRORATED_PER_FILE = 'Pro-rated fee per file'
+TOTAL_PRORATED = 'Total pro-rated fee'
+YEARLY_TOTAL = 'Yearly Total Cost'
+BACKUP_PRICE_ROWS = [PUT_PER_FILE, STORAGE_PER_GB_MONTH, STORAGE_PER_GB_DAY]
+# Prices every backup and retrieval scenario needs, see price_sheet.validate_priced
+BACKUP_DIMENSIONS = ['PUT', 'storage']
+RETRIEVAL_DIMENSIONS = ['GET', 'retrieval', 'retrievalReq']
+
+# Retrieval rows
+GET_REQUEST_COST = 'GET Request Cost per 1000 files'
+RETRIEVAL_COST = 'Retrieval Cost per GB'
+RETRIEVAL_REQUEST_COST = 'Retrieval Cost per 1000 Requests'
+TOTAL_GET_REQUEST_COST = 'Total GET Request cost'
+TOTAL_RETRIEVAL_COST = 'Total Data Retrieval cost'
+TOTAL_RETRIEVAL_REQUEST_COST = 'Total Retrieval Requests cost'
+TOTAL_COST = 'Total cost'
+
+
+# Function to validate a backup file size and storage class selection
+def validate_backup(total_size_mb, storage_classes):
+    if total_size_mb > LARGEST_FILE_SIZE_MB:
+        return "File size is too large. Maximum file size allowed for upload to S3 is 5 TB."
+    if not storage_classes:
+        return "Please select at least one storage class"
+    return None
+
+# Function to validate a retrieval file size and storage class selection
+def validate_retrieval(total_size_mb, storage_classes):
+    if total_size_mb > LARGEST_FILE_SIZE_MB:
+        return "File size is too large. Maximum size for each file stored in Amazon S3 is 5 TB."
+    if not storage_classes:
+        return "Please select at least one storage class"
+    return None
+
+# Function to split storage classes into those the sheet prices for the dimensions, and the unpriced rest
+def priced_classes(sheet, storage_classes, dimensions):
+    unpriced = sheet.unpriced(storage_classes, dimensions)
+    return [storage_class for storage_class in storage_classes if storage_class not in unpriced], unpriced
+
+
+# Function to mask the cost rows of storage classes the sheet has no price for
+def _mask_unpriced(sheet, storage_classes, dimensions, rows):
+    priced = sheet.priced(storage_classes, dimensions)
+    return {row: np.where(priced, values, np.nan) for row, values in rows.items()}
+
+# Function to get the number of parts of a multipart upload and the part size actually used
+def backup_parts(total_size_mb, mpu_size_mb):
+    """
+    Uploads are capped at MAX_PARTS parts; beyond that the part size grows to fit the file
+    (see multipart.plan_uploads, which also plans many files of different sizes).
+
+    Returns:
+    (parts, part size in MB)
+    """
+    plan = multipart.plan_uploads(total_size_mb, part_size_mb=mpu_size_mb, threshold_mb=0)
+    if not plan.multipart:
+        return 0, mpu_size_mb
+    return int(plan.parts), int(plan.part_size_mb)
+
+
+# Function to get the parts of the upload of each of an array of backups, planned like backup_parts (0 for a single PUT)
+def upload_parts(size_mb, mpu_size_mb):
+    return multipart.plan_uploads(size_mb, part_size_mb=mpu_size_mb, threshold_mb=0).parts
+
+
+def backup_pricing(sheet, storage_classes, parts):
+    """
+    PUT cost of one backup file uploaded in `parts` parts (a multipart upload, see
+    cost_kernel.multipart_put_cost; a single PUT for 0 parts), and storage price, per storage class.
+    """
+    class_idx = price_sheet.class_indices(storage_classes)
+    df = pd.DataFrame(columns=list(storage_classes), index=[PUT_PER_FILE, STORAGE_PER_GB_MONTH], dtype=float)
+    df.loc[PUT_PER_FILE] = cost_kernel.put_cost(sheet.table, class_idx, 1, put_parts=parts)
+    df.loc[STORAGE_PER_GB_MONTH] = sheet.column('storage', storage_classes)
+    df.loc[:, sheet.unpriced(storage_classes, BACKUP_DIMENSIONS)] = np.nan
+    return df
+
+
+def backup_cost_rows(sheet, storage_classes, size_gb, frequency, retention_days, parts):
+    """
+    The rows of backup_costs as {row: array over storage_classes}. With a stacked PriceSheet
+    (see utils/price_history.py) every array has a leading axis, one entry per price version.
+    """
+    class_idx = price_sheet.class_indices(storage_classes)
+    stored_gb = frequency * retention_days * size_gb / 365
+    storage_rate = sheet.blended_storage_rate(storage_classes, stored_gb)
+
+    # Cost of one backup file kept for the retention period, then deleted
+    costs = cost_kernel.cost_components(sheet.table, class_idx, size_gb=size_gb,
+                                        days=retention_days, objects=1, put_parts=parts,
+                                        removed=True, storage_rate=storage_rate, stored_objects=1)
+    return _mask_unpriced(sheet, storage_classes, BACKUP_DIMENSIONS, {
+        PUT_PER_FILE: cost_kernel.put_cost(sheet.table, class_idx, 1, put_parts=parts),
+        STORAGE_PER_GB_MONTH: sheet.column('storage', storage_classes),
+        STORAGE_PER_GB_DAY: storage_rate / cost_kernel.DAYS_PER_MONTH,
+        YEARLY_STORAGE: costs.storage * frequency,
+        YEARLY_PUT: costs.request * frequency,
+        PRORATED_PER_FILE: costs.early_deletion,
+        TOTAL_PRORATED: costs.early_deletion * frequency,
+        YEARLY_TOTAL: costs.total * frequency,
+    })
+
+
+@telemetry.timed('cost.backup')
+def backup_costs(sheet, storage_classes, size_gb, frequency, retention_days, parts):
+    """
+    Yearly cost of backing up a file `frequency` times a year and deleting each copy after
+    `retention_days`, per storage class. Storage is priced at the blended tier rate of the
+    average retained volume.
+
+    Returns:
+    DataFrame: backup_pricing rows, the daily rate (STORAGE_PER_GB_DAY) and the yearly cost rows.
+    """
+    rows = backup_cost_rows(sheet, storage_classes, size_gb, frequency, retention_days, parts)
+    return pd.DataFrame.from_dict(rows, orient='index', columns=list(storage_classes), dtype=float)
+
+
+def retrieval_pricing(sheet, storage_classes):
+    df = pd.DataFrame(columns=list(storage_classes), index=[GET_REQUEST_COST, RETRIEVAL_COST, RETRIEVAL_REQUEST_COST], dtype=float)
+    df.loc[GET_REQUEST_COST] = sheet.column('GET', storage_classes)
+    df.loc[RETRIEVAL_COST] = sheet.column('retrieval', storage_classes)
+    df.loc[RETRIEVAL_REQUEST_COST] = sheet.column('retrievalReq', storage_classes)
+    df.loc[:, sheet.unpriced(storage_classes, RETRIEVAL_DIMENSIONS)] = np.nan
+    return df
+
+
+def retrieval_cost_rows(sheet, storage_classes, files, retrieved_gb):
+    """
+    The rows of retrieval_costs as {row: array over storage_classes}, see backup_cost_rows.
+    """
+    class_idx = price_sheet.class_indices(storage_classes)
+    rows = {
+        TOTAL_GET_REQUEST_COST: cost_kernel.get_request_cost(sheet.table, class_idx, files),
+        TOTAL_RETRIEVAL_COST: cost_kernel.retrieval_cost(sheet.table, class_idx, retrieved_gb),
+        TOTAL_RETRIEVAL_REQUEST_COST: cost_kernel.restore_request_cost(sheet.table, class_idx, files),
+    }
+    rows[TOTAL_COST] = sum(rows.values())
+    return _mask_unpriced(sheet, storage_classes, RETRIEVAL_DIMENSIONS, rows)
+
+
+@telemetry.timed('cost.retrieval')
+def retrieval_costs(sheet, storage_classes, files, retrieved_gb):
+    """
+    Cost of retrieving `files` files totalling `retrieved_gb`, per storage class.
+    """
+    rows = retrieval_cost_rows(sheet, storage_classes, files, retrieved_gb)
+    return pd.DataFrame.from_dict(rows, orient='index', columns=list(storage_classes), dtype=float)
+
+
+@telemetry.timed('cost.transition')
+def transition_costs(sheet, source, target, objects, size_gb, days, forecast, sizes=None):
+    """
+    Cost of keeping size_gb in `source` for `days`, then transitioning its objects to `target`
+    until `forecast` days, compared to keeping it in `source` for the whole forecast.
+    Storage is priced at the blended tier rate of size_gb, with the per-object minimum billable
+    size and overhead of each class applied to every size bucket (see utils/object_sizes.py).
+    Raises ValueError when the sheet has no storage price for either class, or no transition price for `target`.
+
+    Parameters:
+    sizes (SizeHistogram): size distribution of the objects, scaled to `objects` (size_gb is then
+        its total); by default every object is size_gb / objects.
+
+    Returns:
+    dict with the storage rates and the cost components
+    """
+    error = price_sheet.validate_priced(sheet, [source], ['storage']) or price_sheet.validate_priced(sheet, [target], ['storage', 'transition'])
+    if error is not None:
+        raise ValueError(error)
+    if sizes is None:
+        histogram = object_sizes.SizeHistogram(np.array([float(objects)]), np.array([float(size_gb)]))
+    else:
+        histogram = sizes.scaled(objects)
+        size_gb = histogram.total_gb
+    source_rate, target_rate = sheet.blended_storage_rate([source, target], size_gb)
+    class_idx = price_sheet.class_indices([source, target])
+    # One row per size bucket, summed once every per-object rule is applied
+    bucket_objects = histogram.objects[:, None]
+    costs = cost_kernel.cost_components(sheet.table, class_idx, size_gb=histogram.size_gb[:, None], days=[days, forecast - days],
+                                        transition_requests=bucket_objects * [0, 1], removed=[True, False],
+                                        storage_rate=[source_rate, target_rate], stored_objects=bucket_objects)
+    costs = cost_kernel.CostComponents(*(component.sum(axis=0) for component in costs))
+    original_storage = cost_kernel.storage_cost(sheet.table, class_idx[0], histogram.size_gb, forecast,
+                                                storage_rate=source_rate, objects=histogram.objects)
+    return {
+        'source_rate': float(source_rate),
+        'target_rate': float(target_rate),
+        'transition_price': float(sheet.price(target, 'transition')),
+        'source_storage': float(costs.storage[0]),
+        'target_storage': float(costs.storage[1]),
+        'transition': float(costs.transition[1]),
+        'early_deletion': float(costs.early_deletion[0]),
+        'total': float(costs.total.sum()),
+        'original_storage': float(original_storage.sum()),
+    }
+
+
+@telemetry.timed('cost.lifecycle')
+def lifecycle_costs(sheet, rule_chain, daily_objects, object_size_gb, horizon_days, expiration_days=None, daily_read_fraction=0.0):
+    """
+    Cost components of a continuous-ingestion lifecycle simulation, see lifecycle.simulate_lifecycle
+    (object_size_gb may be a SizeHistogram).
+    """
+    result = lifecycle.simulate_lifecycle(sheet, rule_chain, daily_objects, object_size_gb, horizon_days,
+                                          expiration_days, daily_read_fraction)
+    return dict(result.components(), total=result.total)
+
+
+# Function to flatten a (cost row x storage class) DataFrame into one record per storage class, e.g. for exports
+def as_records(df, **columns):
+    records = []
+    for storage_class in df.columns:
+        record = dict(columns, storage_class=storage_class)
+        record.update({row: float(value) for row, value in df[storage_class].items() if not np.isnan(value)})
+        records.append(record)
+    return records
@@ -0,0 +1,132 @@
+# sweep.py
+"""
+Evaluate one scenario in every region of pricing.region_code.
+
+Price sheets are fetched concurrently on a dedicated background thread pool (each fetch itself
+fans out on the pricing client's pool, so the two must not share one) and cached by
+price_sheet.get_price_sheet. The pool also runs the region warm-ups of utils/warmup.py.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+import utils.price_sheet as price_sheet
+import utils.pricing as pricing
+
+PREFETCH_WORKERS = 8
+CHEAPEST = 'Cheapest storage class'
+CHEAPEST_COST = 'Cheapest cost'
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = {}
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix='s3-sweep')
+        return _executor
+
+
+def pending(key):
+    """
+    The Future of the background task with the key while it is running, else None.
+    """
+    with _executor_lock:
+        return _pending.get(key)
+
+
+def run_in_background(key, fn, *args):
+    """
+    Run fn(*args) on the background pool, unless a task with the same key is still running;
+    returns its Future. Finished tasks are forgotten, so results always come from fn (e.g. a
+    TTL cache) rather than from an old Future.
+    """
+    executor = _get_executor()
+    with _executor_lock:
+        future = _pending.get(key)
+        if future is not None:
+            return future
+        future = _pending[key] = executor.submit(fn, *args)
+
+    def forget(done):
+        with _executor_lock:
+            if _pending.get(key) is done:
+                del _pending[key]
+
+    # Added outside the lock: a task that already finished runs the callback right away
+    future.add_done_callback(forget)
+    return future
+
+
+def prefetch_price_sheets(regions=None):
+    """
+    Start fetching the price sheet of every region in the background; returns {region: Future}.
+    A region already being fetched is not submitted twice; price_sheet.get_price_sheet serves
+    cached sheets and refetches expired ones.
+    """
+    regions = list(pricing.region_code) if regions is None else list(regions)
+    return {region: run_in_background(('price_sheet', region), price_sheet.get_price_sheet, region) for region in regions}
+
+
+def get_price_sheets(regions=None, timeout=None):
+    """
+    Price sheets of the regions, fetched concurrently. Regions whose fetch failed or that have
+    no S3 prices at all are left out and listed in the second return value.
+
+    Returns:
+    ({region: PriceSheet}, {region: error message})
+    """
+    futures = prefetch_price_sheets(regions)
+    wait(futures.values(), timeout=timeout)
+    sheets = {}
+    errors = {}
+    for region, future in futures.items():
+        if not future.done():
+            errors[region] = "Timed out fetching prices"
+        elif future.exception() is not None:
+            errors[region] = str(future.exception())
+        elif not future.result().available.any():
+            errors[region] = "No S3 prices found"
+        else:
+            sheets[region] = future.result()
+    return sheets, errors
+
+
+def sweep(evaluate, storage_classes, regions=None, timeout=None):
+    """
+    Cost matrix of a scenario across regions.
+
+    Parameters:
+    evaluate (callable): evaluate(sheet) -> cost per storage class, in storage_classes order.
+    storage_classes (list): storage class names (columns of the matrix).
+    regions (list): regions to sweep; defaults to every region in pricing.region_code.
+
+    Returns:
+    (DataFrame of region x storage class costs ranked by cheapest option, {region: error message})
+    Cells of classes without a storage price in a region are NaN.
+    """
+    sheets, errors = get_price_sheets(regions, timeout)
+    class_idx = price_sheet.class_indices(storage_classes)
+    rows = {}
+    for region, sheet in sheets.items():
+        costs = np.asarray(evaluate(sheet), dtype=float)
+        available = sheet.available[class_idx, price_sheet.DIMENSION_INDEX['storage']]
+        rows[region] = np.where(available, costs, np.nan)
+
+    matrix = pd.DataFrame.from_dict(rows, orient='index', columns=list(storage_classes))
+    matrix.index.name = 'Region'
+    unpriced = matrix.index[matrix.isna().all(axis=1)]
+    errors.update({region: "No prices for the selected storage classes" for region in unpriced})
+    matrix = matrix.drop(index=unpriced)
+    if matrix.empty:
+        return matrix, errors
+    costs = matrix[list(storage_classes)]
+    matrix[CHEAPEST] = costs.idxmin(axis=1)
+    matrix[CHEAPEST_COST] = costs.min(axis=1)
+    matrix = matrix.sort_values(CHEAPEST_COST)
+    matrix.insert(0, 'Rank', np.arange(1, len(matrix) + 1))
+    return matrix, errors
@@ -0,0 +1,340 @@
+# telemetry.py
+"""
+Instrumentation of the hot paths: leveled logging, timing spans and counters.
+
+Spans time a block of code (price resolution, cost computation, DataFrame building, chart
+rendering) into a process-wide histogram per span name. Spans opened while a page run is traced
+(begin_page / end_page) are also kept in that run's trace, which the in-app debug panel shows.
+Metrics are exported in the Prometheus text format.
+
+Environment:
+S3_LOG_LEVEL: level of the app's log messages on stderr (default WARNING).
+S3_METRICS_FILE: file rewritten with the Prometheus metrics after every page run.
+S3_METRICS_PORT: port serving the Prometheus metrics over HTTP (/metrics).
+S3_DEBUG_PANEL: show the debug panel on every page (also shown with ?debug=1 in the URL).
+"""
+import functools
+import logging
+import math
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+LOGGER_NAME = 's3_cost_sim'
+METRIC_PREFIX = 's3_cost_sim_'
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, math.inf)
+RECENT_TRACES = 20
+
+_configure_lock = threading.Lock()
+_configured = False
+_local = threading.local()
+
+
+# Function to set up the app's stderr log handler once; the level comes from S3_LOG_LEVEL
+def configure_logging(level=None):
+    global _configured
+    with _configure_lock:
+        logger = logging.getLogger(LOGGER_NAME)
+        if not _configured:
+            handler = logging.StreamHandler(sys.stderr)
+            handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+            logger.addHandler(handler)
+            # Streamlit configures the root logger too; don't print every message twice
+            logger.propagate = False
+            _configured = True
+        if level is not None or not logger.level:
+            logger.setLevel((level or os.environ.get('S3_LOG_LEVEL', 'WARNING')).upper())
+    return logger
+
+
+def get_logger(name):
+    configure_logging()
+    return logging.getLogger(f"{LOGGER_NAME}.{name}")
+
+
+def _label_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+class Metrics:
+    """
+    Thread-safe registry of counters and duration histograms, keyed by name and labels.
+    Collectors are callables returning {gauge name: value}, read at export time.
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.collectors = []
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    histogram['buckets'][i] += 1
+            histogram['sum'] += seconds
+            histogram['count'] += 1
+
+    def register_collector(self, collector):
+        with self._lock:
+            self.collectors.append(collector)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def gauges(self):
+        values = {}
+        for collector in list(self.collectors):
+            values.update(collector())
+        return values
+
+    def summary(self):
+        """
+        Count, total and mean seconds of every span name and label set, slowest total first.
+        """
+        with self._lock:
+            rows = [(name, dict(labels), histogram['count'], histogram['sum'])
+                    for (name, labels), histogram in self.histograms.items()]
+        rows = [{'span': labels.pop('span', name), 'labels': labels, 'count': count, 'total_seconds': total,
+                 'mean_seconds': total / count if count else 0.0} for name, labels, count, total in rows]
+        return sorted(rows, key=lambda row: row['total_seconds'], reverse=True)
+
+    def to_prometheus(self):
+        lines = []
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items())
+        typed = set()
+        for (name, labels), value in counters:
+            metric = f"{METRIC_PREFIX}{name}_total"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} counter")
+                typed.add(metric)
+            lines.append(f"{metric}{_format_labels(labels)} {value}")
+        for (name, labels), histogram in histograms:
+            metric = f"{METRIC_PREFIX}{name}"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} histogram")
+                typed.add(metric)
+            for bound, count in zip(self.buckets, histogram['buckets']):
+                le = '+Inf' if math.isinf(bound) else f"{bound:g}"
+                lines.append(f"{metric}_bucket{_format_labels(labels + (('le', le),))} {count}")
+            lines.append(f"{metric}_sum{_format_labels(labels)} {histogram['sum']}")
+            lines.append(f"{metric}_count{_format_labels(labels)} {histogram['count']}")
+        for name, value in sorted(self.gauges().items()):
+            metric = f"{METRIC_PREFIX}{name}"
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {float(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + '}'
+
+
+metrics = Metrics()
+
+
+class Trace:
+    """
+    Spans of one page run, in the order they finished, as (name, depth, start offset, seconds, labels).
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.time()
+        self.start = time.perf_counter()
+        self.spans = []
+        self.depth = 0
+        self.seconds = None
+
+    def frame(self):
+        import pandas as pd
+
+        rows = sorted(self.spans, key=lambda span: span[2])
+        return pd.DataFrame({
+            'Span': ['  ' * depth + name for name, depth, _, _, _ in rows],
+            'Start (ms)': [offset * 1000 for _, _, offset, _, _ in rows],
+            'Duration (ms)': [seconds * 1000 for _, _, _, seconds, _ in rows],
+            'Labels': [', '.join(f"{key}={value}" for key, value in labels.items()) for _, _, _, _, labels in rows],
+        })
+
+
+recent_traces = deque(maxlen=RECENT_TRACES)
+
+
+@contextmanager
+def span(name, **labels):
+    """
+    Time the block as `name` (e.g. 'pricing.lookup') into the span_seconds histogram, and into
+    the trace of the current page run if there is one. Failures are counted in span_errors.
+    """
+    trace = getattr(_local, 'trace', None)
+    if trace is not None:
+        depth = trace.depth
+        trace.depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        metrics.inc('span_errors', span=name)
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        metrics.observe('span_seconds', seconds, span=name, **labels)
+        if trace is not None:
+            trace.depth = depth
+            trace.spans.append((name, depth, start - trace.start, seconds, labels))
+
+
+def timed(name, **labels):
+    """
+    Decorator running the function in a span.
+    """
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name, **labels):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def count(name, value=1, **labels):
+    metrics.inc(name, value, **labels)
+
+
+def begin_page(name):
+    """
+    Start tracing a page run on this thread (one Streamlit script run); finish with end_page.
+    """
+    _start_metrics_server()
+    metrics.inc('page_runs', page=name)
+    trace = _local.trace = Trace(name)
+    return trace
+
+
+def end_page(trace):
+    """
+    Finish the page run: record its duration, export the metrics file and show the debug panel.
+    """
+    trace.seconds = time.perf_counter() - trace.start
+    metrics.observe('span_seconds', trace.seconds, span='page.run', page=trace.name)
+    if getattr(_local, 'trace', None) is trace:
+        _local.trace = None
+    recent_traces.append(trace)
+    if os.environ.get('S3_METRICS_FILE'):
+        write_metrics(os.environ['S3_METRICS_FILE'])
+    debug_panel(trace)
+    return trace
+
+
+def write_metrics(path):
+    # Write to a temporary file first so a scraper never reads a half-written file
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as fp:
+        fp.write(metrics.to_prometheus())
+    os.replace(tmp_path, path)
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def _start_metrics_server():
+    global _server
+    port = os.environ.get('S3_METRICS_PORT')
+    if not port or _server is not None:
+        return
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = start_metrics_server(int(port))
+            except OSError as error:
+                # e.g. the port is taken by another app process; metrics stay available in the debug panel
+                get_logger('telemetry').warning("Could not serve metrics on port %s: %s", port, error)
+                _server = False
+
+
+def start_metrics_server(port, host='0.0.0.0'):
+    """
+    Serve the Prometheus metrics at http://host:port/metrics from a daemon thread.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = metrics.to_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            get_logger('telemetry').debug(format, *args)
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='s3-metrics', daemon=True).start()
+    get_logger('telemetry').info("Serving metrics on port %s", port)
+    return server
+
+
+def debug_panel_enabled():
+    import streamlit as st
+
+    if os.environ.get('S3_DEBUG_PANEL', '').lower() in ('1', 'true', 'yes'):
+        return True
+    return st.query_params.get('debug') in ('1', 'true')
+
+
+# Function to render the debug panel: spans of this run, slowest spans overall, cache and Price List stats
+def debug_panel(trace):
+    import streamlit as st
+
+    if not debug_panel_enabled():
+        return
+    import utils.pricing as pricing
+    import utils.result_cache as result_cache
+
+    with st.sidebar.expander("Debug", expanded=False):
+        st.write(f"**This run:** {trace.seconds * 1000:,.1f} ms")
+        st.dataframe(trace.frame().style.format({'Start (ms)': '{:,.1f}', 'Duration (ms)': '{:,.2f}'}),
+                     use_container_width=True, hide_index=True)
+        st.write("**All runs**")
+        summary = metrics.summary()
+        if summary:
+            import pandas as pd
+
+            st.dataframe(pd.DataFrame(summary).assign(labels=lambda df: df['labels'].map(str)),
+                         use_container_width=True, hide_index=True)
+        st.write("**Price cache**", pricing.get_price_cache_stats())
+        st.write("**Price List client**", pricing.get_pricing_client_stats())
+        st.write("**Result cache**", result_cache.get_result_cache_stats())
+        if os.environ.get('S3_PRICE_STORE'):
+            import utils.price_store as price_store
+
+            st.write("**Price store versions**", price_store.get_price_store().current_versions())
+        st.download_button("Download metrics", metrics.to_prometheus(), file_name='metrics.prom', mime='text/plain')
@@ -0,0 +1,88 @@
+# tiers.py
+import numpy as np
+
+
+class TierLadder:
+    """
+    Tiered rate ladder of one price dimension, e.g. S3 Standard storage:
+    first 50 TB/month, next 450 TB/month, over 500 TB/month.
+
+    begins/ends are in the dimension's unit (GB for storage) and ends[-1] may be inf.
+    """
+
+    def __init__(self, begins, ends, rates):
+        self.begins = np.asarray(begins, dtype=float)
+        self.ends = np.asarray(ends, dtype=float)
+        self.rates = np.asarray(rates, dtype=float)
+
+    def __len__(self):
+        return len(self.rates)
+
+    def __repr__(self):
+        tiers = ', '.join(f"[{b:g}, {e:g}): {r:g}" for b, e, r in zip(self.begins, self.ends, self.rates))
+        return f"TierLadder({tiers})"
+
+    @classmethod
+    def from_dimensions(cls, price_dimensions):
+        """
+        Build a ladder from (begin, end, rate, ...) price dimension tuples as returned by
+        utils/pricing.resolve_price_dimensions.
+        """
+        tiers = sorted((dimension[0], dimension[1], dimension[2]) for dimension in price_dimensions)
+        begins, ends, rates = zip(*tiers)
+        return cls(begins, ends, rates)
+
+    @classmethod
+    def flat(cls, rate):
+        return cls([0.0], [np.inf], [rate])
+
+    def cost(self, volumes):
+        return tiered_cost(volumes, self.begins, self.ends, self.rates)
+
+    def blended_rate(self, volumes):
+        return blended_rate(volumes, self.begins, self.ends, self.rates)
+
+
+def tiered_cost(volumes, begins, ends, rates):
+    """
+    Cost of each volume under a tiered ladder, in one vectorized pass.
+
+    Parameters:
+    volumes (array-like): volumes of any shape (e.g. GB stored per month per scenario).
+    begins, ends, rates (array-like): the ladder, shape (tiers,) or broadcastable to
+        volumes.shape + (tiers,) for per-column ladders (e.g. one per storage class).
+
+    Returns:
+    ndarray: the cost of each volume, same shape as volumes.
+    """
+    volumes = np.asarray(volumes, dtype=float)[..., None]
+    begins = np.asarray(begins, dtype=float)
+    widths = np.asarray(ends, dtype=float) - begins
+    billed = np.clip(volumes - begins, 0.0, widths)
+    return (billed * np.asarray(rates, dtype=float)).sum(axis=-1)
+
+
+def blended_rate(volumes, begins, ends, rates):
+    """
+    Average rate per unit of each volume under a tiered ladder. Zero volumes get the first-tier rate.
+    """
+    volumes = np.asarray(volumes, dtype=float)
+    cost = tiered_cost(volumes, begins, ends, rates)
+    first_rate = np.asarray(rates, dtype=float)[..., 0]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(volumes > 0, cost / np.where(volumes > 0, volumes, 1.0), first_rate)
+
+
+def stack_ladders(ladders):
+    """
+    Pad ladders with zero-width tiers into dense (len(ladders), max_tiers) begin/end/rate arrays.
+    """
+    max_tiers = max(len(ladder) for ladder in ladders)
+    begins = np.zeros((len(ladders), max_tiers))
+    ends = np.zeros((len(ladders), max_tiers))
+    rates = np.zeros((len(ladders), max_tiers))
+    for i, ladder in enumerate(ladders):
+        begins[i, :len(ladder)] = ladder.begins
+        ends[i, :len(ladder)] = ladder.ends
+        rates[i, :len(ladder)] = ladder.rates
+    return begins, ends, rates
@@ -0,0 +1,101 @@
+# warmup.py
+"""
+Background warm-up of a region's prices when it is selected in the sidebar.
+
+The price sheet and the Intelligent-Tiering prices of the region are fetched on the background
+pool of utils/sweep.py, shared by every session, so they are usually cached by the time a form
+is submitted. A region has at most one warm-up in flight; selecting it again while it is being
+fetched, or once it is cached, does not fetch it again.
+"""
+import threading
+
+import utils.intelligent_tiering as intelligent_tiering
+import utils.price_sheet as price_sheet
+import utils.sweep as sweep
+import utils.telemetry as telemetry
+
+# Seconds between refreshes of the sidebar status while the prices are loading
+STATUS_REFRESH = 2
+
+COLD = 'cold'
+WARMING = 'warming'
+WARM = 'warm'
+FAILED = 'failed'
+
+STATUS_LABELS = {
+    COLD: "⚪ Prices not loaded",
+    WARMING: "🟡 Loading prices...",
+    WARM: "🟢 Prices ready",
+    FAILED: "🔴 Could not load prices",
+}
+
+logger = telemetry.get_logger('warmup')
+
+_lock = threading.Lock()
+# Regions whose last warm-up raised
+_failed = set()
+
+
+def _is_cached(region):
+    return region in price_sheet.price_sheets and region in intelligent_tiering.int_prices
+
+
+def _warm(region):
+    try:
+        with telemetry.span('warmup.region', region=region):
+            price_sheet.get_price_sheet(region)
+            intelligent_tiering.get_int_prices(region)
+    except Exception:
+        with _lock:
+            _failed.add(region)
+        raise
+    with _lock:
+        _failed.discard(region)
+    logger.debug("Warmed up prices of %s", region)
+
+
+def warm_region(region):
+    """
+    Start fetching the prices of the region in the background, unless they are cached or
+    already being fetched. Returns the Future of the warm-up, or None if there is nothing to do.
+    """
+    future = sweep.pending(('warmup', region))
+    if future is not None:
+        return future
+    if _is_cached(region):
+        return None
+    telemetry.count('region_warmups', region=region)
+    return sweep.run_in_background(('warmup', region), _warm, region)
+
+
+def region_status(region):
+    """
+    COLD, WARMING, WARM or FAILED (the last warm-up raised and nothing is cached).
+    """
+    if sweep.pending(('warmup', region)) is not None:
+        return WARMING
+    if _is_cached(region):
+        return WARM
+    with _lock:
+        if region in _failed:
+            return FAILED
+    return COLD
+
+
+# Function to warm up the selected region and show its status in the sidebar
+def sidebar_warmup(region):
+    import streamlit as st
+
+    warm_region(region)
+    status = region_status(region)
+    if status != WARMING:
+        st.sidebar.caption(STATUS_LABELS[status])
+        return
+
+    # Only polled while the prices are loading; the next rerun of the page renders a plain caption
+    @st.experimental_fragment(run_every=STATUS_REFRESH)
+    def indicator():
+        st.caption(STATUS_LABELS[region_status(region)])
+
+    with st.sidebar:
+        indicator()